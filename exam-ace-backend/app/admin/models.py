@@ -0,0 +1,61 @@
+"""
+Admin request / response models.
+"""
+from __future__ import annotations
+
+from enum import Enum
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+from app.quiz.models import Difficulty
+
+
+class OutlierFlag(str, Enum):
+    miskeyed = "miskeyed"  # a distractor is picked more often than the keyed answer
+    too_easy = "too_easy"
+    too_hard = "too_hard"
+
+
+class QuestionOutlier(BaseModel):
+    question_hash: str
+    question: str
+    options: list[str] = Field(..., description="Canonical (sorted) order; picks and indexes follow it")
+    correct_index: int
+    subject: str
+    difficulty: Difficulty
+    served: int
+    unanswered: int
+    picks: list[int]
+    p_correct: float
+    top_distractor: int
+    flags: list[OutlierFlag]
+
+
+class OutliersResponse(BaseModel):
+    outliers: list[QuestionOutlier]
+    min_served: int
+
+
+class RescoreRequest(BaseModel):
+    correct_index: int = Field(..., ge=0, le=3, description="The right answer, in the canonical option order of /admin/questions/outliers")
+
+
+class RescoreJobStatus(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, scanning, refreshing, done or failed")
+    question_hash: str
+    question: str
+    old_correct_index: int
+    correct_index: int
+    new_question_hash: str = Field(..., description="The question's id in question_stats once re-keyed")
+    candidates: int = Field(0, description="Attempts containing the question text")
+    scanned: int = 0
+    matched: int = Field(0, description="Attempts that served this question with the old key")
+    rescored: int = Field(0, description="Graded attempts whose score changed")
+    conflicts: int = Field(0, description="Attempts changed while the job ran and left alone — run the job again")
+    reviews_updated: int = 0
+    batches: int = 0
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
@@ -0,0 +1,415 @@
+"""
+Re-scoring attempts after a question's answer key is corrected.
+
+POST /admin/questions/{question_hash}/rescore starts a job that:
+- finds every attempt containing the question's text through the GIN index
+  on quiz_attempts.questions (migration 007) and reads them with one
+  server-side cursor inside a read-only snapshot, RESCORE_BATCH_ROWS at a time
+- keeps the copies that really are this item (same canonical key as in
+  question_stats — shuffled copies included, differently keyed ones not)
+- loads each batch's answers and keys into flat NumPy arrays, substitutes
+  the corrected key and recomputes every score at once
+- writes the batch back with one UPDATE … FROM unnest(), on another
+  connection while the next batch is read: the stored key (in each
+  attempt's own option order) and, for graded attempts, the new score.
+  Rows whose score changed since the snapshot (a submit meanwhile) are left
+  alone and counted as conflicts; running the job again picks them up.
+- then moves the question_stats row to the corrected key and fixes the
+  question's copy in the affected users' review queues
+
+Analytics read scores from quiz_attempts, so they are up to date as soon as
+a batch is written.  Jobs run in the background of the process that
+accepted them, one at a time, through a JobRegistry like bulk jobs: status
+is mirrored to Redis (`rescorejob:{job_id}`), so any worker can report
+progress.  Re-running a finished job finds nothing left to change.
+
+Only one job per question runs at a time across all workers: submit() takes
+the lock `rescorelock:{question_hash}` (SET NX, holding the job id) and the
+job keeps renewing it while queued or running and releases it when it ends.
+A lock whose process died expires after _LOCK_TTL.  Without Redis, only jobs
+in the same process are kept apart.
+"""
+from __future__ import annotations
+
+import json
+import time
+import uuid
+import asyncio
+import logging
+from itertools import chain
+from dataclasses import dataclass, field
+from functools import partial
+
+import numpy as np
+
+from app.core import metrics
+from app.core import redis as redis_mod
+from app.core.jobs import JobRegistry
+from app.quiz.item_stats import canonical
+from app.quiz.models import QuizQuestion
+from app.quiz.search import question_hash as review_id
+
+logger = logging.getLogger(__name__)
+
+_MAX_LOCAL_JOBS = 100
+_LOCK_TTL = 30.0  # seconds a question stays locked after its process stopped renewing it
+
+
+@dataclass
+class RescoreJob:
+    job_id: str
+    admin_id: str
+    question_hash: str
+    question: str
+    old_correct_index: int  # canonical option order, as in question_stats
+    correct_index: int
+    new_question_hash: str
+    status: str = "queued"  # queued → scanning → refreshing → done | failed
+    candidates: int = 0  # attempts containing the question text
+    scanned: int = 0
+    matched: int = 0  # attempts that served this item with the old key
+    rescored: int = 0  # graded attempts whose score changed
+    conflicts: int = 0
+    reviews_updated: int = 0
+    batches: int = 0
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+
+_jobs = JobRegistry(
+    "rescore", RescoreJob, concurrency=1, max_local=_MAX_LOCAL_JOBS,
+    summary=lambda job: (f"{job.matched}/{job.scanned} attempts matched, {job.rescored} rescored, "
+                         f"{job.conflicts} conflicts"),
+)
+_running: dict[str, RescoreJob] = {}  # question_hash -> its unfinished job in this process
+
+# KEYS = lock; ARGV = job id, ms.  Renews (or with ms = 0 releases) the lock if the job still holds it
+_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+if ARGV[2] == '0' then return redis.call('DEL', KEYS[1]) end
+return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+"""
+
+_registered: dict[int, object] = {}
+
+
+async def get_job(job_id: str) -> RescoreJob | None:
+    return await _jobs.get(job_id)
+
+
+class RescoreConflictError(Exception):
+    """A job for this question is already queued or running (message: its id)."""
+
+
+async def find_question(pool, question_hash: str):
+    """The question_stats row for `question_hash`, or None."""
+    return await pool.fetchrow(
+        "SELECT question, options, correct_index FROM question_stats WHERE question_hash = $1", question_hash)
+
+
+async def submit(admin_id: str, question_hash: str, row, correct_index: int) -> RescoreJob:
+    """
+    Register the job for the question in `row` (see find_question) and start
+    it in the background.  Raises RescoreConflictError if any worker has a
+    job for the question already.
+    """
+    if question_hash in _running:
+        raise RescoreConflictError(_running[question_hash].job_id)
+    fixed = QuizQuestion.model_construct(question=row["question"], options=json.loads(row["options"]),
+                                         correct_index=correct_index)
+    job = RescoreJob(job_id=str(uuid.uuid4()), admin_id=admin_id, question_hash=question_hash,
+                     question=row["question"], old_correct_index=row["correct_index"],
+                     correct_index=correct_index, new_question_hash=canonical(fixed)[0])
+    _running[question_hash] = job
+    holder = await _lock(job)
+    if holder is not None:
+        del _running[question_hash]
+        raise RescoreConflictError(holder)
+    keeper = asyncio.get_running_loop().create_task(_keep_lock(job))
+    return _jobs.start(job, partial(_run, job), finalize=partial(_unlock, job, keeper))
+
+
+# ---------------------------------------------------------------------------
+# The per-question lock
+# ---------------------------------------------------------------------------
+
+def _lock_key(question_hash: str) -> str:
+    return f"rescorelock:{question_hash}"
+
+
+def _script(client):
+    script = _registered.get(id(client))
+    if script is None:
+        script = _registered[id(client)] = client.register_script(_LOCK_LUA)
+    return script
+
+
+async def _lock(job: RescoreJob) -> str | None:
+    """Take the question's lock for `job`; None on success, else the id of the job holding it."""
+    client = redis_mod.get_redis()
+    if client is None:
+        return None
+    key = _lock_key(job.question_hash)
+    try:
+        for _ in range(2):
+            if await redis_mod.call("rescore_lock", client.set(key, job.job_id, nx=True,
+                                                               px=int(_LOCK_TTL * 1000))):
+                return None
+            holder = await redis_mod.call("rescore_lock", client.get(key))
+            if holder:
+                return holder
+            # Released between the two calls: try again
+    except Exception as exc:
+        logger.warning("Could not lock question %s for re-scoring (%s) — only this process is checked.",
+                       job.question_hash, exc)
+        return None
+    return None
+
+
+async def _keep_lock(job: RescoreJob) -> None:
+    """Renew the job's lock until _unlock cancels this; a failed renewal is retried."""
+    while True:
+        await asyncio.sleep(_LOCK_TTL / 3)
+        client = redis_mod.get_redis()
+        if client is None:
+            continue
+        try:
+            held = await redis_mod.call("rescore_lock", _script(client)(
+                keys=[_lock_key(job.question_hash)], args=[job.job_id, int(_LOCK_TTL * 1000)]))
+        except Exception as exc:
+            logger.warning("Could not renew the re-scoring lock of job %s: %s", job.job_id, exc)
+            continue
+        if not held:
+            logger.warning("Rescore job %s lost its lock on question %s.", job.job_id, job.question_hash)
+            return
+
+
+async def _unlock(job: RescoreJob, keeper: asyncio.Task) -> None:
+    """Release the job's lock once it has ended (run by the JobRegistry)."""
+    keeper.cancel()
+    try:
+        await keeper
+    except asyncio.CancelledError:
+        pass
+    if _running.get(job.question_hash) is job:
+        del _running[job.question_hash]
+    client = redis_mod.get_redis()
+    if client is not None:
+        await redis_mod.call("rescore_lock", _script(client)(
+            keys=[_lock_key(job.question_hash)], args=[job.job_id, 0]))
+
+
+# ---------------------------------------------------------------------------
+# The job
+# ---------------------------------------------------------------------------
+
+# Keys and answers only for graded attempts with one answer per question;
+# anything else just gets its stored key corrected
+_SCAN = """
+SELECT a.id, a.created_at, a.user_id, a.score, m.positions, m.matched,
+       CASE WHEN g.gradable THEN ARRAY(SELECT (q->>'correct_index')::int FROM jsonb_array_elements(a.questions) q) END AS keys,
+       CASE WHEN g.gradable THEN ARRAY(SELECT coalesce((x #>> '{}')::int, -1) FROM jsonb_array_elements(a.answers) x) END AS answers
+FROM quiz_attempts a
+CROSS JOIN LATERAL (
+    SELECT array_agg((e.ord - 1)::int ORDER BY e.ord) AS positions, jsonb_agg(e.q ORDER BY e.ord)::text AS matched
+    FROM jsonb_array_elements(a.questions) WITH ORDINALITY AS e(q, ord)
+    WHERE e.q->>'question' = $2
+) m
+CROSS JOIN LATERAL (
+    SELECT a.score IS NOT NULL AND jsonb_typeof(a.answers) = 'array'
+           AND jsonb_array_length(a.answers) = jsonb_array_length(a.questions) AS gradable
+) g
+WHERE a.questions @> $1::jsonb
+"""
+
+_UPDATE = """
+UPDATE quiz_attempts q
+SET questions = jsonb_set(q.questions, ARRAY[u.pos::text, 'correct_index'], to_jsonb(u.key)),
+    score = coalesce(u.score, q.score)
+FROM unnest($1::uuid[], $2::timestamptz[], $3::int[], $4::int[], $5::float8[], $6::float8[])
+    AS u(id, created_at, pos, key, score, old_score)
+WHERE q.id = u.id AND q.created_at = u.created_at
+  AND q.score IS NOT DISTINCT FROM u.old_score
+"""
+
+# The question_stats row moves to the corrected key, merging into a row
+# that copies keyed correctly already have
+_REKEY_STATS = """
+WITH old AS (DELETE FROM question_stats WHERE question_hash = $1 RETURNING *)
+INSERT INTO question_stats AS s (question_hash, question, options, correct_index, subject, difficulty,
+                                 served, unanswered, picks_0, picks_1, picks_2, picks_3)
+SELECT $2, question, options, $3, subject, difficulty, served, unanswered, picks_0, picks_1, picks_2, picks_3
+FROM old
+ON CONFLICT (question_hash) DO UPDATE SET
+    served = s.served + EXCLUDED.served,
+    unanswered = s.unanswered + EXCLUDED.unanswered,
+    picks_0 = s.picks_0 + EXCLUDED.picks_0,
+    picks_1 = s.picks_1 + EXCLUDED.picks_1,
+    picks_2 = s.picks_2 + EXCLUDED.picks_2,
+    picks_3 = s.picks_3 + EXCLUDED.picks_3,
+    updated_at = now()
+"""
+
+
+@dataclass(slots=True)
+class _Batch:
+    ids: list
+    created_at: list
+    user_ids: list
+    positions: list[int]  # first copy of the question in each attempt
+    keys: list[int]  # its corrected key in that attempt's option order
+    scores: list[float | None]  # None: not graded, score left as is
+    old_scores: list[float | None]
+    extra: list[tuple[int, int, int]]  # (row, position, key) for further copies in the same attempt
+    changed: int
+
+
+def rescore_batch(rows, old_hash: str, correct_index: int) -> _Batch:
+    """Corrected keys and recomputed scores for one batch of _SCAN rows."""
+    batch = _Batch([], [], [], [], [], [], [], [], 0)
+    key_lists, answer_lists, fix_rows, fix_positions, fix_keys = [], [], [], [], []
+    graded_rows = []
+    # Most attempts carry one of a few identical copies: canonicalise each once
+    new_keys: dict[str, list[int | None]] = {}
+    for row in rows:
+        keyed = new_keys.get(row["matched"])
+        if keyed is None:
+            keyed = new_keys[row["matched"]] = []
+            for m in json.loads(row["matched"]):
+                q = QuizQuestion.model_construct(question=m["question"], options=m["options"],
+                                                 correct_index=m["correct_index"])
+                key, position = canonical(q)
+                keyed.append(position.index(correct_index) if key == old_hash else None)
+        fixes = [(pos, key) for pos, key in zip(row["positions"], keyed) if key is not None]
+        if not fixes:
+            continue
+        i = len(batch.ids)
+        batch.ids.append(row["id"])
+        batch.created_at.append(row["created_at"])
+        batch.user_ids.append(str(row["user_id"]))
+        batch.positions.append(fixes[0][0])
+        batch.keys.append(fixes[0][1])
+        batch.old_scores.append(row["score"])
+        batch.scores.append(None)
+        batch.extra.extend((i, pos, key) for pos, key in fixes[1:])
+        if row["keys"] is not None:
+            graded_rows.append(i)
+            key_lists.append(row["keys"])
+            answer_lists.append(row["answers"])
+            for pos, key in fixes:
+                fix_rows.append(len(graded_rows) - 1)
+                fix_positions.append(pos)
+                fix_keys.append(key)
+
+    if graded_rows:
+        n = len(graded_rows)
+        lengths = np.fromiter(map(len, key_lists), np.int64, n)
+        total = int(lengths.sum())
+        keys = np.fromiter(chain.from_iterable(key_lists), np.int16, total)
+        answers = np.fromiter(chain.from_iterable(answer_lists), np.int16, total)
+        starts = np.zeros(n, np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        keys[starts[fix_rows] + np.asarray(fix_positions, np.int64)] = fix_keys
+        owner = np.repeat(np.arange(n), lengths)
+        correct = np.bincount(owner, weights=keys == answers, minlength=n)
+        scores = np.round(correct / lengths * 100, 2)
+        old = np.fromiter((batch.old_scores[i] for i in graded_rows), np.float64, n)
+        batch.changed = int(np.count_nonzero(~np.isclose(scores, old)))
+        for i, score in zip(graded_rows, scores.tolist()):
+            batch.scores[i] = score
+    return batch
+
+
+async def _write(pool, batch: _Batch) -> int:
+    """Apply the batch; returns how many attempts were updated."""
+    if not batch.ids:
+        return 0
+    status = await pool.execute(_UPDATE, batch.ids, batch.created_at, batch.positions, batch.keys,
+                                batch.scores, batch.old_scores)
+    updated = int(status.split()[-1])
+    # A question served twice in one quiz: its later copies, with the score already written
+    extra = batch.extra
+    while extra:
+        layer, seen, extra_next = [], set(), []
+        for item in extra:
+            (extra_next if item[0] in seen else layer).append(item)
+            seen.add(item[0])
+        scores = [batch.scores[i] if batch.scores[i] is not None else batch.old_scores[i] for i, _, _ in layer]
+        await pool.execute(_UPDATE, [batch.ids[i] for i, _, _ in layer], [batch.created_at[i] for i, _, _ in layer],
+                           [pos for _, pos, _ in layer], [key for _, _, key in layer], [None] * len(layer), scores)
+        extra = extra_next
+    return updated
+
+
+async def _fix_reviews(job: RescoreJob, user_ids: set[str]) -> None:
+    """Correct the question's copy in these users' review queues (failures only logged)."""
+    client = redis_mod.get_redis()
+    if client is None or not user_ids:
+        return
+    users = sorted(user_ids)
+    field_name = review_id(job.question)
+    try:
+        pipe = client.pipeline(transaction=False)
+        for uid in users:
+            pipe.hget(f"review:{uid}:q", field_name)
+        raw = await redis_mod.call("rescore_reviews", pipe.execute())
+        pipe = client.pipeline(transaction=False)
+        updates = 0
+        for uid, item in zip(users, raw):
+            if not item:
+                continue
+            item = json.loads(item)
+            q = QuizQuestion(**item["q"])
+            key, position = canonical(q)
+            if key != job.question_hash:
+                continue
+            item["q"]["correct_index"] = position.index(job.correct_index)
+            pipe.hset(f"review:{uid}:q", field_name, json.dumps(item))
+            updates += 1
+        if updates:
+            await redis_mod.call("rescore_reviews", pipe.execute())
+        job.reviews_updated += updates
+    except Exception as exc:
+        logger.warning("Rescore job %s could not update review queues: %s", job.job_id, exc)
+
+
+async def _run(job: RescoreJob) -> None:
+    from app.core.config import settings
+    from app.core.database import get_pool
+
+    pool = get_pool()
+    job.status = "scanning"
+    await _jobs.publish(job)
+    contains = json.dumps([{"question": job.question}])
+    async with pool.acquire() as conn:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            job.candidates = await conn.fetchval(
+                "SELECT count(*) FROM quiz_attempts WHERE questions @> $1::jsonb", contains)
+            await _jobs.publish(job)
+            cursor = await conn.cursor(_SCAN, contains, job.question)
+            rows = await cursor.fetch(settings.rescore_batch_rows)
+            while rows:
+                batch = await asyncio.to_thread(rescore_batch, rows, job.question_hash, job.correct_index)
+                # The batch is written on another connection while the next one is read
+                updated, next_rows = await asyncio.gather(
+                    _write(pool, batch), cursor.fetch(settings.rescore_batch_rows))
+                job.scanned += len(rows)
+                job.matched += len(batch.ids)
+                job.rescored += batch.changed
+                job.conflicts += len(batch.ids) - updated
+                job.batches += 1
+                metrics.RESCORE_ATTEMPTS.inc("rescored", amount=batch.changed)
+                metrics.RESCORE_ATTEMPTS.inc("conflict", amount=len(batch.ids) - updated)
+                await _fix_reviews(job, set(batch.user_ids))
+                await _jobs.publish(job)
+                rows = next_rows
+
+    job.status = "refreshing"
+    await _jobs.publish(job)
+    await pool.execute(_REKEY_STATS, job.question_hash, job.new_question_hash, job.correct_index)
+
+
+async def close_jobs() -> None:
+    """Cancel running jobs at shutdown; batches already written stay written."""
+    await _jobs.close()
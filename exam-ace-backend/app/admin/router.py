@@ -0,0 +1,122 @@
+"""
+Admin API router (ADMIN_USER_IDS only).
+- GET /admin/questions/outliers — questions whose answer statistics look wrong
+- GET /admin/users/{user_id}/history/export — stream a user's full history (as /quiz/history/export)
+- POST /admin/questions/{question_hash}/rescore — correct a question's answer key and re-score its attempts
+- GET /admin/rescore/{job_id} — progress of a re-scoring job
+"""
+from __future__ import annotations
+
+import uuid
+import logging
+from dataclasses import asdict
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.admin import rescore
+from app.admin.models import (
+    OutlierFlag,
+    OutliersResponse,
+    QuestionOutlier,
+    RescoreJobStatus,
+    RescoreRequest,
+)
+from app.auth.dependencies import require_admin
+from app.core.database import get_pool, get_read_pool
+from app.core.responses import FastJSONResponse
+from app.quiz import export, item_stats
+from app.quiz.models import ExportFormat
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+# --------------------------------------------------------------------------
+# GET /admin/questions/outliers
+# --------------------------------------------------------------------------
+
+@router.get("/questions/outliers", response_model=OutliersResponse)
+async def question_outliers(
+    flag: list[OutlierFlag] = Query(default=list(OutlierFlag), description="Which kinds of outlier to list"),
+    subject: str | None = Query(default=None, max_length=200),
+    min_served: int = Query(default=30, ge=1, description="Ignore questions answered fewer times"),
+    easy: float = Query(default=0.95, gt=0, le=1, description="too_easy at or above this share correct"),
+    hard: float = Query(default=0.25, ge=0, lt=1, description="too_hard at or below this share correct"),
+    limit: int = Query(default=50, ge=1, le=500),
+    admin_id: str = Depends(require_admin),
+):
+    """Most suspicious first.  Counts lag submits by up to QUESTION_STATS_FLUSH_SECONDS."""
+    rows = await item_stats.outliers(await get_read_pool(), min_served, easy, hard, limit, subject,
+                                     tuple(f.value for f in flag))
+    return FastJSONResponse(OutliersResponse(
+        outliers=[QuestionOutlier(**asdict(row)) for row in rows],
+        min_served=min_served,
+    ))
+
+
+# --------------------------------------------------------------------------
+# GET /admin/users/{user_id}/history/export
+# --------------------------------------------------------------------------
+
+@router.get("/users/{user_id}/history/export")
+async def export_user_history(
+    user_id: str,
+    format: ExportFormat = ExportFormat.ndjson,
+    include_questions: bool = Query(default=False),
+    admin_id: str = Depends(require_admin),
+):
+    try:
+        uuid.UUID(user_id)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="user_id must be a UUID.")
+    logger.info("Admin %s exporting the history of user %s", admin_id, user_id)
+    return await export.streaming_response(user_id, format, include_questions)
+
+
+# --------------------------------------------------------------------------
+# POST /admin/questions/{question_hash}/rescore, GET /admin/rescore/{job_id}
+# --------------------------------------------------------------------------
+
+def _job_status(job: rescore.RescoreJob) -> RescoreJobStatus:
+    fields = asdict(job)
+    del fields["admin_id"]
+    fields["created_at"] = datetime.fromtimestamp(job.created_at, timezone.utc)
+    fields["finished_at"] = datetime.fromtimestamp(job.finished_at, timezone.utc) if job.finished_at else None
+    return RescoreJobStatus(**fields)
+
+
+@router.post("/questions/{question_hash}/rescore", response_model=RescoreJobStatus,
+             status_code=status.HTTP_202_ACCEPTED)
+async def rescore_question(
+    question_hash: str,
+    body: RescoreRequest,
+    admin_id: str = Depends(require_admin),
+):
+    """
+    Set the question's right answer to `correct_index` (canonical option
+    order) in every attempt that served it, and re-score the graded ones.
+    Runs in the background; poll GET /admin/rescore/{job_id}.
+    """
+    row = await rescore.find_question(get_pool(), question_hash)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Question not found.")
+    if row["correct_index"] == body.correct_index:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="That is already the keyed answer.")
+    try:
+        job = await rescore.submit(admin_id, question_hash, row, body.correct_index)
+    except rescore.RescoreConflictError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Job {exc} is already re-scoring this question.")
+    logger.info("Admin %s re-keying question %s: %d -> %d (job %s)",
+                admin_id, question_hash, row["correct_index"], body.correct_index, job.job_id)
+    return FastJSONResponse(_job_status(job), status_code=status.HTTP_202_ACCEPTED)
+
+
+@router.get("/rescore/{job_id}", response_model=RescoreJobStatus)
+async def rescore_job_status(job_id: str, admin_id: str = Depends(require_admin)):
+    job = await rescore.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return FastJSONResponse(_job_status(job))
@@ -8,14 +8,15 @@ import uuid
 from fastapi import APIRouter, Depends
 
 from app.auth.dependencies import get_current_user
-from app.core.database import get_pool
+from app.core.database import get_read_pool
+from app.core.responses import FastJSONResponse
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
 
 @router.get("/performance")
 async def get_performance(user_id: str = Depends(get_current_user)):
-    pool = get_pool()
+    pool = await get_read_pool(user_id)
 
     # Overall stats
     overall = await pool.fetchrow(
@@ -73,7 +74,7 @@ async def get_performance(user_id: str = Depends(get_current_user)):
         uuid.UUID(user_id),
     )
 
-    return {
+    return FastJSONResponse({
         "overall": {
             "total_quizzes": overall["total_quizzes"],
             "avg_score": float(overall["avg_score"]),
@@ -97,4 +98,4 @@ async def get_performance(user_id: str = Depends(get_current_user)):
             }
             for r in recent
         ],
-    }
+    })
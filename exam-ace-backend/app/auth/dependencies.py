@@ -1,5 +1,5 @@
 """
-FastAPI dependency to extract the current user from request.state.
+FastAPI dependencies to extract the current user from request.state.
 """
 from __future__ import annotations
 
@@ -12,3 +12,27 @@ def get_current_user(request: Request) -> str:
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated.")
     return user_id
+
+
+def _listed(user_id: str, ids: str) -> bool:
+    return user_id.lower() in {i.strip().lower() for i in ids.split(",") if i.strip()}
+
+
+def require_teacher(request: Request) -> str:
+    """Return the user_id if it is listed in TEACHER_USER_IDS.  Raises 403 otherwise."""
+    from app.core.config import settings
+
+    user_id = get_current_user(request)
+    if not _listed(user_id, settings.teacher_user_ids):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Teacher access required.")
+    return user_id
+
+
+def require_admin(request: Request) -> str:
+    """Return the user_id if it is listed in ADMIN_USER_IDS.  Raises 403 otherwise."""
+    from app.core.config import settings
+
+    user_id = get_current_user(request)
+    if not _listed(user_id, settings.admin_user_ids):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required.")
+    return user_id
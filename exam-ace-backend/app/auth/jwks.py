@@ -0,0 +1,240 @@
+"""
+Supabase JWKS cache with TTL-based refresh.
+
+- Keys are refreshed in the background before they expire; the TTL comes from
+  the response's Cache-Control max-age (JWKS_CACHE_TTL when absent)
+- An unknown `kid` triggers at most one refetch (single-flight — concurrent
+  requests share it), and never more than once per JWKS_MIN_REFRESH_INTERVAL
+- Kids still unknown after a refetch are negative-cached for
+  JWKS_UNKNOWN_KID_TTL, so spraying random kids cannot trigger fetches
+- One pooled httpx client is reused for every fetch
+- On fetch failure the last good key set keeps being served
+"""
+from __future__ import annotations
+
+import re
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+import httpx
+from jose import jwk
+
+logger = logging.getLogger(__name__)
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+_MIN_TTL = 60
+_MAX_TTL = 86400
+_RETRY_DELAY = 30.0
+_MAX_UNKNOWN_KIDS = 1024
+
+
+class JWKSUnavailableError(Exception):
+    """No usable key set could be fetched."""
+
+
+class UnknownKidError(Exception):
+    """The token's kid is not in the current key set."""
+
+
+class JWKSCache:
+    def __init__(
+        self,
+        jwks_url: str,
+        default_ttl: float = 600,
+        min_refresh_interval: float = 30,
+        unknown_kid_ttl: float = 300,
+        timeout: float = 10.0,
+    ):
+        self.jwks_url = jwks_url
+        self.default_ttl = default_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.unknown_kid_ttl = unknown_kid_ttl
+        self.timeout = timeout
+
+        self._jwks: dict[str, dict] = {}           # kid -> JWK
+        self._public_keys: dict[str, object] = {}  # kid -> constructed key
+        self._unknown_kids: OrderedDict[str, float] = OrderedDict()
+        self._fetched_at = 0.0                     # monotonic; 0 = never
+        self._expires_at = 0.0
+        self._inflight: asyncio.Future | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._refresh_task: asyncio.Task | None = None
+
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.key_hits = 0
+        self.key_misses = 0
+        self.unknown_kid_rejections = 0
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    async def get_key(self, kid: str):
+        """Constructed public key for `kid`.  Raises UnknownKidError / JWKSUnavailableError."""
+        public_key = self._public_keys.get(kid)
+        if public_key is not None and time.monotonic() < self._expires_at:
+            self.key_hits += 1
+            return public_key
+
+        self.key_misses += 1
+        now = time.monotonic()
+        fetched_at = self._fetched_at
+        if self._fetched_at == 0.0 or now >= self._expires_at:
+            await self.refresh()
+        elif kid not in self._jwks:
+            negative_until = self._unknown_kids.get(kid)
+            if negative_until is not None and negative_until > now:
+                self.unknown_kid_rejections += 1
+                raise UnknownKidError(kid)
+            if now - self._fetched_at >= self.min_refresh_interval:
+                await self.refresh()  # possibly a key rotation
+
+        jwk_dict = self._jwks.get(kid)
+        if jwk_dict is None:
+            # Only a key set fetched for this lookup proves the kid unknown; when the
+            # refetch was throttled (or failed) the next lookup may refetch
+            if self._fetched_at != fetched_at:
+                self._remember_unknown(kid)
+            raise UnknownKidError(kid)
+
+        public_key = self._public_keys.get(kid)
+        if public_key is None:
+            public_key = jwk.construct(jwk_dict, algorithm=jwk_dict.get("alg", "ES256"))
+            self._public_keys[kid] = public_key
+        return public_key
+
+    def _remember_unknown(self, kid: str) -> None:
+        self._unknown_kids[kid] = time.monotonic() + self.unknown_kid_ttl
+        self._unknown_kids.move_to_end(kid)
+        while len(self._unknown_kids) > _MAX_UNKNOWN_KIDS:
+            self._unknown_kids.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Fetching
+    # ------------------------------------------------------------------
+
+    async def refresh(self) -> None:
+        """Refetch the key set; concurrent callers share one request."""
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+            self._inflight.add_done_callback(self._clear_inflight)
+        await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, _future: asyncio.Future) -> None:
+        self._inflight = None
+
+    async def _fetch(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+
+        self.fetches += 1
+        try:
+            resp = await self._client.get(self.jwks_url)
+            resp.raise_for_status()
+            document = resp.json()
+        except (httpx.HTTPError, ValueError) as exc:
+            self.fetch_errors += 1
+            if self._jwks:
+                # Serve the last good key set and try again shortly
+                self._expires_at = time.monotonic() + _RETRY_DELAY
+                logger.warning("JWKS refresh from %s failed (%s) — keeping %d cached keys.",
+                               self.jwks_url, exc, len(self._jwks))
+                return
+            raise JWKSUnavailableError(str(exc)) from exc
+
+        keys = {k["kid"]: k for k in document.get("keys", []) if k.get("kid")}
+        # Keep constructed keys whose JWK did not change
+        self._public_keys = {
+            kid: key for kid, key in self._public_keys.items()
+            if kid in keys and keys[kid] == self._jwks.get(kid)
+        }
+        self._jwks = keys
+        for kid in keys:
+            self._unknown_kids.pop(kid, None)
+
+        now = time.monotonic()
+        self._fetched_at = now
+        self._expires_at = now + self._ttl(resp.headers.get("cache-control", ""))
+        logger.info("Fetched JWKS from %s (%d keys)", self.jwks_url, len(keys))
+
+    def _ttl(self, cache_control: str) -> float:
+        match = _MAX_AGE_RE.search(cache_control)
+        ttl = float(match.group(1)) if match else self.default_ttl
+        return min(max(ttl, _MIN_TTL), _MAX_TTL)
+
+    # ------------------------------------------------------------------
+    # Background refresh
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Fetch now, then keep the key set fresh in the background."""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except JWKSUnavailableError as exc:
+                logger.warning("JWKS fetch from %s failed: %s", self.jwks_url, exc)
+                self._expires_at = time.monotonic() + _RETRY_DELAY
+            # Refresh at ~90% of the TTL so requests never see an expired set
+            delay = max(1.0, (self._expires_at - time.monotonic()) * 0.9)
+            await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._jwks),
+            "fetches": self.fetches,
+            "fetch_errors": self.fetch_errors,
+            "hits": self.key_hits,
+            "misses": self.key_misses,
+            "unknown_kid_rejections": self.unknown_kid_rejections,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Process-wide instance
+# ---------------------------------------------------------------------------
+
+_cache: JWKSCache | None = None
+
+
+def jwks_url_for(supabase_url: str) -> str:
+    return f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+
+
+def get_jwks_cache(supabase_url: str) -> JWKSCache:
+    """Return the shared cache, creating it from Settings on first use."""
+    global _cache
+    if _cache is None:
+        from app.core.config import settings
+        _cache = JWKSCache(
+            settings.supabase_jwks_url or jwks_url_for(supabase_url),
+            default_ttl=settings.jwks_cache_ttl,
+            min_refresh_interval=settings.jwks_min_refresh_interval,
+            unknown_kid_ttl=settings.jwks_unknown_kid_ttl,
+        )
+    return _cache
+
+
+async def close_jwks() -> None:
+    global _cache
+    if _cache is not None:
+        await _cache.close()
+        _cache = None
@@ -1,105 +1,228 @@
 """
-Supabase JWT verification middleware.
+Supabase JWT verification middleware (pure ASGI — no per-request task or
+body streaming overhead, and streaming responses / background tasks pass
+through untouched).
 - Skips /health, /docs, /openapi.json, /redoc
-- Fetches JWKS from Supabase to verify ES256/HS256 tokens
-- Injects user_id into request.state
-- Returns 401 on any failure
+- /metrics on the main port (see METRICS_TOKEN) takes the metrics token as
+  its bearer instead of a user's JWT
+- Verifies ES256 tokens against Supabase's JWKS (see app.auth.jwks) and HS256
+  tokens against the project secret
+- Injects user_id into request.state (scope["state"])
+- Returns 401 on any failure (503 if the JWKS cannot be fetched at all)
+- WebSocket handshakes may offer the token as a subprotocol instead
+  (`Sec-WebSocket-Protocol: bearer, <token>`), since browsers cannot set
+  Authorization on them and a `?token=` would end up in access logs; a
+  rejected handshake is closed with 1008 (1013 if the JWKS is unavailable)
+  before it is accepted
+- Caches verified tokens (keyed by SHA-256 digest, dropped at `exp`) so repeat
+  requests skip signature verification
 """
 from __future__ import annotations
 
+import hmac
+import time
+import hashlib
 import logging
-import httpx
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.requests import Request
+from collections import OrderedDict
+
 from starlette.responses import JSONResponse
-from jose import jwt, JWTError, jwk
-from jose.utils import base64url_decode
+from starlette.websockets import WebSocketClose
+from starlette.types import ASGIApp, Receive, Scope, Send
+from jose import jwt, JWTError
+
+from app.auth.jwks import JWKSUnavailableError, UnknownKidError, get_jwks_cache
+from app.core.tracing import span
 
 logger = logging.getLogger(__name__)
 
 # Paths that do NOT require authentication
 _PUBLIC_PATHS = frozenset({"/health", "/docs", "/openapi.json", "/redoc"})
 
-# Cache for JWKS keys
-_jwks_cache: dict | None = None
-
+# Subprotocol a WebSocket client offers first, followed by its access token
+WS_AUTH_PROTOCOL = "bearer"
+
+
+class CacheStats:
+    __slots__ = ("hits", "misses")
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+
+_token_stats = CacheStats()
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of tokens that already passed verification.
+    Keyed by SHA-256 digest so raw tokens are never held in memory as keys;
+    an entry is only served until the token's own `exp`.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, tuple[str, float]] = OrderedDict()
+
+    def get(self, token: str) -> str | None:
+        if self.max_size <= 0:
+            return None
+        key = hashlib.sha256(token.encode()).digest()
+        entry = self._entries.get(key)
+        if entry is None:
+            _token_stats.misses += 1
+            return None
+        user_id, exp = entry
+        if exp <= time.time():
+            del self._entries[key]
+            _token_stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        _token_stats.hits += 1
+        return user_id
+
+    def put(self, token: str, user_id: str, exp: float | None) -> None:
+        # Tokens without exp are verified every time rather than cached forever
+        if self.max_size <= 0 or exp is None:
+            return
+        key = hashlib.sha256(token.encode()).digest()
+        self._entries[key] = (user_id, float(exp))
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def auth_cache_stats() -> dict:
+    """Hit/miss counters for the verified-token cache and the JWKS key cache."""
+    from app.auth import jwks as jwks_mod
+
+    return {
+        "token_cache": {"hits": _token_stats.hits, "misses": _token_stats.misses},
+        "key_cache": jwks_mod._cache.stats() if jwks_mod._cache is not None else {},
+    }
+
+
+def _bearer_token(scope: Scope) -> str | None:
+    """Token from the Authorization header, or None if missing / not Bearer."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            header = value.decode("latin-1")
+            return header[7:] if header.startswith("Bearer ") else None
+    return None
 
-async def _fetch_jwks(supabase_url: str) -> dict:
-    """Fetch and cache JWKS from Supabase."""
-    global _jwks_cache
-    if _jwks_cache is not None:
-        return _jwks_cache
 
-    jwks_url = f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.get(jwks_url)
-        resp.raise_for_status()
-        _jwks_cache = resp.json()
-        logger.info("Fetched JWKS from %s (%d keys)", jwks_url, len(_jwks_cache.get("keys", [])))
-        return _jwks_cache
+def _protocol_token(scope: Scope) -> str | None:
+    """Token offered as a WebSocket subprotocol right after "bearer", or None."""
+    protocols = scope.get("subprotocols") or []
+    if len(protocols) >= 2 and protocols[0] == WS_AUTH_PROTOCOL:
+        return protocols[1]
+    return None
 
 
-def _find_jwk_key(jwks: dict, kid: str) -> dict | None:
-    """Find a JWK key by its kid."""
-    for key in jwks.get("keys", []):
-        if key.get("kid") == kid:
-            return key
-    return None
+async def _reject(scope: Scope, receive: Receive, send: Send, status_code: int, detail: str) -> None:
+    if scope["type"] == "websocket":
+        await WebSocketClose(code=1013 if status_code == 503 else 1008, reason=detail)(scope, receive, send)
+    else:
+        await JSONResponse({"detail": detail}, status_code=status_code)(scope, receive, send)
 
 
-class JWTAuthMiddleware(BaseHTTPMiddleware):
+class JWTAuthMiddleware:
     """Reject every request that does not carry a valid Supabase JWT."""
 
-    def __init__(self, app, jwt_secret: str, supabase_url: str = "", algorithms: list[str] | None = None):
-        super().__init__(app)
+    def __init__(
+        self,
+        app: ASGIApp,
+        jwt_secret: str,
+        supabase_url: str = "",
+        algorithms: list[str] | None = None,
+        token_cache_size: int = 10000,
+        metrics_token: str | None = None,
+    ):
+        self.app = app
+        self.metrics_token = metrics_token
         self.jwt_secret = jwt_secret
         self.supabase_url = supabase_url
         self.algorithms = algorithms or ["HS256", "ES256"]
+        self.token_cache = VerifiedTokenCache(token_cache_size)
+        self.jwks = get_jwks_cache(supabase_url) if supabase_url else None
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint):
-        # Allow public paths and CORS preflight
-        if request.url.path in _PUBLIC_PATHS or request.method == "OPTIONS":
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Lifespan and anything else that isn't an HTTP request or WebSocket
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
 
-        auth_header = request.headers.get("authorization", "")
-        if not auth_header.startswith("Bearer "):
-            return JSONResponse({"detail": "Missing or malformed Authorization header."}, status_code=401)
+        # Allow public paths and CORS preflight
+        if scope["type"] == "http" and (scope["path"] in _PUBLIC_PATHS or scope["method"] == "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        token = _bearer_token(scope)
+        if scope["type"] == "http" and scope["path"] == "/metrics" and self.metrics_token:
+            # Scrapers hold the metrics token, not a user session
+            if token is not None and hmac.compare_digest(token.encode(), self.metrics_token.encode()):
+                await self.app(scope, receive, send)
+            else:
+                await _reject(scope, receive, send, 401, "Invalid metrics token.")
+            return
+        if token is None and scope["type"] == "websocket":
+            token = _protocol_token(scope)
+        if token is None:
+            await _reject(scope, receive, send, 401, "Missing or malformed Authorization header.")
+            return
 
-        token = auth_header[7:]
         try:
-            unverified_header = jwt.get_unverified_header(token)
-            alg = unverified_header.get("alg", "HS256")
-            kid = unverified_header.get("kid")
-
-            if alg == "ES256" and kid and self.supabase_url:
-                # Fetch JWKS and verify with matching public key
-                jwks = await _fetch_jwks(self.supabase_url)
-                jwk_key = _find_jwk_key(jwks, kid)
-                if not jwk_key:
-                    raise JWTError(f"No matching JWK found for kid: {kid}")
-                # Construct the public key from the JWK
-                public_key = jwk.construct(jwk_key, algorithm="ES256")
-                payload = jwt.decode(
-                    token,
-                    public_key,
-                    algorithms=["ES256"],
-                    options={"verify_aud": False},
-                )
-            else:
-                # Fallback to symmetric HS256
-                payload = jwt.decode(
-                    token,
-                    self.jwt_secret,
-                    algorithms=["HS256"],
-                    options={"verify_aud": False},
-                )
-
-            user_id = payload.get("sub")
-            if not user_id:
-                raise JWTError("Token missing 'sub' claim.")
-            request.state.user_id = user_id
+            with span("auth"):
+                user_id = await self.authenticate(token)
         except JWTError as exc:
             logger.warning("JWT verification failed: %s", exc)
-            return JSONResponse({"detail": "Invalid or expired token."}, status_code=401)
-
-        return await call_next(request)
+            await _reject(scope, receive, send, 401, "Invalid or expired token.")
+            return
+        except JWKSUnavailableError as exc:
+            logger.error("Cannot verify ES256 token, JWKS unavailable: %s", exc)
+            await _reject(scope, receive, send, 503, "Authentication temporarily unavailable.")
+            return
+
+        scope.setdefault("state", {})["user_id"] = user_id
+        await self.app(scope, receive, send)
+
+    async def authenticate(self, token: str) -> str:
+        """Verify `token` and return its user id.  Raises JWTError / JWKSUnavailableError."""
+        user_id = self.token_cache.get(token)
+        if user_id is not None:
+            return user_id
+
+        unverified_header = jwt.get_unverified_header(token)
+        alg = unverified_header.get("alg", "HS256")
+        kid = unverified_header.get("kid")
+
+        if alg == "ES256" and kid and self.jwks is not None:
+            # Verify with the public key matching the token's kid
+            try:
+                public_key = await self.jwks.get_key(kid)
+            except UnknownKidError:
+                raise JWTError(f"No matching JWK found for kid: {kid}")
+            payload = jwt.decode(
+                token,
+                public_key,
+                algorithms=["ES256"],
+                options={"verify_aud": False},
+            )
+        else:
+            # Fallback to symmetric HS256
+            payload = jwt.decode(
+                token,
+                self.jwt_secret,
+                algorithms=["HS256"],
+                options={"verify_aud": False},
+            )
+
+        user_id = payload.get("sub")
+        if not user_id:
+            raise JWTError("Token missing 'sub' claim.")
+
+        self.token_cache.put(token, user_id, payload.get("exp"))
+        return user_id
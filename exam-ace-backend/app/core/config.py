@@ -3,6 +3,8 @@ Application configuration — reads .env and crashes hard if required vars are m
 """
 from __future__ import annotations
 
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -11,9 +13,29 @@ class Settings(BaseSettings):
     # --- Supabase ---
     supabase_url: str = Field(..., description="Supabase project URL")
     supabase_jwt_secret: str = Field(..., description="Supabase JWT secret for token verification")
+    supabase_jwks_url: str | None = Field(default=None, description="Override the JWKS URL (default: <SUPABASE_URL>/auth/v1/.well-known/jwks.json)")
+    jwks_cache_ttl: int = Field(default=600, description="JWKS TTL in seconds when the response has no Cache-Control max-age")
+    jwks_min_refresh_interval: int = Field(default=30, description="Minimum seconds between refetches triggered by an unknown kid")
+    jwks_unknown_kid_ttl: int = Field(default=300, description="Seconds an unknown kid is rejected without refetching")
+    jwt_cache_size: int = Field(default=10000, ge=0, description="Verified tokens remembered until their exp (0 = off)")
 
     # --- Database ---
     database_url: str = Field(..., description="Postgres connection string (asyncpg format)")
+    db_pool_min_size: int = Field(default=2, ge=0, description="Connections opened at startup and kept warm")
+    db_pool_max_size: int = Field(default=10, ge=1, description="Upper bound on pooled connections")
+    db_acquire_timeout: float = Field(default=10.0, gt=0, description="Seconds to wait for a free pooled connection")
+    db_command_timeout: float | None = Field(default=30.0, description="Per-statement timeout in seconds (null = none)")
+    db_statement_cache_size: int = Field(default=100, ge=0, description="Prepared statements cached per connection")
+    db_max_inactive_connection_lifetime: float = Field(default=300.0, ge=0, description="Seconds before idle connections are closed")
+    db_pgbouncer_mode: bool = Field(default=False, description="Disable statement caching for PgBouncer / Supabase transaction pooler")
+    db_slow_acquire_ms: float = Field(default=100.0, description="Log a warning when acquiring a connection takes longer")
+    database_replica_url: str | None = Field(default=None, description="Optional read-replica connection string")
+    db_replica_pin_seconds: float = Field(default=10.0, ge=0, description="Seconds a user's reads stay on the primary after they write")
+    db_connection_budget: int | None = Field(default=None, ge=1, description="Max connections per pool across all app.server workers; each worker's DB_POOL_MAX_SIZE becomes budget // workers")
+
+    # --- Retention (python -m app.quiz.retention) ---
+    attempt_retention_months: int = Field(default=12, ge=1, description="Months of full question snapshots kept before compaction")
+    attempt_partitions_ahead: int = Field(default=3, ge=1, description="Monthly quiz_attempts partitions created in advance")
 
     # --- Redis ---
     redis_url: str = Field(default="redis://localhost:6379", description="Redis connection URL")
@@ -25,11 +47,82 @@ class Settings(BaseSettings):
     llm_model: str = Field(default="phi-3-mini-4k-instruct", description="Model name as shown in LM Studio")
     llm_health_timeout: int = Field(default=3, description="Seconds to wait when checking model connectivity")
 
+    # --- Server (python -m app.server) ---
+    web_concurrency: int = Field(default=1, ge=1, description="Worker processes forked from the preloaded master")
+
     # --- App ---
     cors_origins: str = Field(default="http://localhost:5173", description="Comma-separated CORS origins")
+    teacher_user_ids: str = Field(default="", description="Comma-separated user ids allowed to generate quizzes for a class (/quiz/bulk)")
+    admin_user_ids: str = Field(default="", description="Comma-separated user ids allowed to use the /admin endpoints")
+    fast_boot: bool = Field(
+        default=False, description="Connect DB/Redis/JWKS concurrently and pre-warm pooled connections at startup"
+    )
 
     # --- Rate Limiting ---
     quiz_rate_limit: int = Field(default=20, description="Max quiz generations per hour per user")
+    rate_limit_algorithm: Literal["sliding_window", "gcra"] = Field(
+        default="sliding_window", description="sliding_window (smoothed hourly counter) or gcra (token bucket)"
+    )
+    rate_limit_sync_interval: float = Field(
+        default=1.0, gt=0, description="Seconds between pushes of locally admitted requests to Redis"
+    )
+
+    # --- Metrics ---
+    metrics_port: int | None = Field(
+        default=None, description="Serve /metrics on this port only (not on the public listener)"
+    )
+    metrics_host: str = Field(default="0.0.0.0", description="Bind address for METRICS_PORT")
+    metrics_token: str | None = Field(
+        default=None, description="Without METRICS_PORT: serve /metrics on the main port to this bearer token"
+    )
+
+    # --- Tracing ---
+    server_timing: bool = Field(default=False, description="Add a Server-Timing phase breakdown to every response")
+    profile_slow_requests_ms: float | None = Field(
+        default=None, gt=0, description="Write a sampled stack profile for requests slower than this"
+    )
+    profile_sample_interval_ms: float = Field(default=5.0, gt=0, description="Profiler sampling interval")
+    profile_dir: str = Field(default="profiles", description="Where slow-request profiles are written")
+
+    # --- Quiz sessions (autosave / resume / auto-submit) ---
+    quiz_session_ttl: int = Field(default=86400, ge=60, description="Seconds an unsubmitted quiz session is kept (plus its time limit)")
+    quiz_session_grace_seconds: float = Field(default=5.0, ge=0, description="Seconds after the time limit that answers are still accepted")
+
+    # --- Live classrooms ---
+    live_question_seconds: int = Field(default=20, ge=5, le=300, description="Default seconds per question in a live quiz")
+    live_reveal_seconds: float = Field(default=5.0, ge=0, description="Seconds the answer and leaderboard are shown before the next question")
+    live_max_players: int = Field(default=500, ge=1, description="Players allowed in one live room")
+    live_send_queue: int = Field(default=32, ge=1, description="Messages buffered per live socket before a slow client is disconnected")
+
+    # --- Review queue (spaced repetition) ---
+    review_max_items: int = Field(default=1000, ge=1, description="Questions kept in one user's review queue")
+    review_ttl_days: int = Field(default=180, ge=1, description="Days a review queue is kept after the user's last graded quiz")
+
+    # --- History export ---
+    export_max_concurrent: int = Field(default=2, ge=1, description="History exports streaming at once per process (each holds a DB connection)")
+    export_fetch_rows: int = Field(default=500, ge=1, description="Rows fetched per round trip by the export cursor")
+
+    # --- Write spool (Postgres outages) ---
+    spool_dir: str | None = Field(default="spool", description="Local directory for quiz_attempts writes made while Postgres is unreachable (empty = off)")
+    spool_fsync: Literal["always", "everysec", "no"] = Field(default="always", description="When spooled writes are fsynced: before acknowledging, once a second, or by the OS")
+    spool_replay_seconds: float = Field(default=5.0, gt=0, description="How often the spool is replayed into Postgres")
+
+    # --- Question statistics ---
+    question_stats_flush_seconds: float = Field(default=10.0, gt=0, description="How often counted answers are upserted into question_stats")
+    question_stats_max_pending: int = Field(default=5000, ge=1, description="Distinct questions waiting that trigger an early flush")
+
+    # --- Re-scoring (POST /admin/questions/{question_hash}/rescore) ---
+    rescore_batch_rows: int = Field(default=5000, ge=1, description="Attempts read, re-scored and written back per batch")
+
+    # --- Question search ---
+    search_index_path: str | None = Field(default=None, description="Search index snapshot (.npz), loaded at startup and written at shutdown")
+    search_refresh_seconds: float = Field(default=30.0, gt=0, description="How often new attempts are added to the search index")
+    search_merge_threshold: int = Field(default=50000, ge=1, description="Pending postings that trigger a merge into the index arrays")
+
+    # --- Profile cache ---
+    profile_cache_size: int = Field(default=10000, description="Max user ids remembered as having a profile row")
+    profile_cache_shared: bool = Field(default=False, description="Also share known profiles across processes via Redis")
+    profile_cache_ttl: int = Field(default=86400, description="Seconds a known profile stays in the Redis tier")
 
     model_config = {
         "env_file": ".env",
@@ -1,32 +1,397 @@
 """
 Async PostgreSQL connection pool via asyncpg.
 Initialised at app startup, torn down at shutdown.
+
+Pool sizing, timeouts and statement caching come from Settings (DB_* vars).
+DB_PGBOUNCER_MODE=true disables prepared-statement caching so the pool works
+behind Supabase's transaction-mode pooler (port 6543).
+
+The pool handed out by get_pool() is instrumented: it records how long
+callers wait to acquire a connection, how many connections are in use, and
+per-query latency keyed by call site (`module.function`).  The same numbers
+feed the /metrics histograms.
+
+Read replica (optional, DATABASE_REPLICA_URL):
+  - get_pool()               → primary, for anything that writes
+  - get_read_pool(user_id)   → replica for read-only endpoints, except for a
+    user who wrote recently (mark_write), who is pinned to the primary for
+    DB_REPLICA_PIN_SECONDS so they always read their own writes.  Pins are
+    kept in this process and in Redis (`dbpin:{user_id}`), so a read served
+    by another worker sees them too; while Redis is down, user reads go to
+    the primary.
 """
 from __future__ import annotations
 
+import sys
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
 import asyncpg
 from asyncpg import Pool
 
-_pool: Pool | None = None
+from app.core import metrics
+from app.core import redis as redis_mod
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Instrumentation
+# ---------------------------------------------------------------------------
+
+class QueryStats:
+    __slots__ = ("count", "errors", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class PoolStats:
+    """Counters for one pool.  Plain attributes — cheap to update per query."""
+
+    def __init__(self, name: str = "primary") -> None:
+        self.name = name
+        self.acquire_count = 0
+        self.acquire_timeouts = 0
+        self.acquire_wait_total = 0.0
+        self.acquire_wait_max = 0.0
+        self.in_use = 0
+        self.in_use_peak = 0
+        self.queries: dict[str, QueryStats] = {}
+
+    def record_acquire(self, wait: float) -> None:
+        metrics.DB_ACQUIRE_SECONDS.observe(wait, self.name)
+        self.acquire_count += 1
+        self.acquire_wait_total += wait
+        if wait > self.acquire_wait_max:
+            self.acquire_wait_max = wait
+        self.in_use += 1
+        if self.in_use > self.in_use_peak:
+            self.in_use_peak = self.in_use
+
+    def record_query(self, site: str, elapsed: float, failed: bool) -> None:
+        metrics.DB_QUERY_SECONDS.observe(elapsed, self.name, site)
+        stats = self.queries.get(site)
+        if stats is None:
+            stats = self.queries[site] = QueryStats()
+        stats.count += 1
+        stats.total += elapsed
+        if elapsed > stats.max:
+            stats.max = elapsed
+        if failed:
+            stats.errors += 1
+            metrics.DB_QUERY_ERRORS.inc(self.name, site)
+
+    def snapshot(self) -> dict:
+        return {
+            "acquire_count": self.acquire_count,
+            "acquire_timeouts": self.acquire_timeouts,
+            "acquire_wait_avg_ms": round(self.acquire_wait_total / self.acquire_count * 1000, 3) if self.acquire_count else 0.0,
+            "acquire_wait_max_ms": round(self.acquire_wait_max * 1000, 3),
+            "in_use": self.in_use,
+            "in_use_peak": self.in_use_peak,
+            "queries": {
+                site: {
+                    "count": s.count,
+                    "errors": s.errors,
+                    "avg_ms": round(s.total / s.count * 1000, 3),
+                    "max_ms": round(s.max * 1000, 3),
+                }
+                for site, s in self.queries.items()
+            },
+        }
+
+
+def _call_site(depth: int = 2) -> str:
+    """`module.function` of the code that issued the query."""
+    frame = sys._getframe(depth)
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+
+class InstrumentedConnection:
+    """Wraps an asyncpg Connection; query methods are timed, everything else passes through."""
+
+    def __init__(self, conn: asyncpg.Connection, stats: PoolStats):
+        self._conn = conn
+        self._stats = stats
+
+    def __getattr__(self, name: str):
+        return getattr(self._conn, name)
+
+    async def _run(self, site: str, method, query: str, args: tuple, kwargs: dict):
+        start = time.perf_counter()
+        failed = False
+        try:
+            with span("db"):
+                return await method(query, *args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._stats.record_query(site, time.perf_counter() - start, failed)
+
+    async def execute(self, query: str, *args, **kwargs):
+        return await self._run(_call_site(), self._conn.execute, query, args, kwargs)
+
+    async def executemany(self, query: str, args, **kwargs):
+        return await self._run(_call_site(), self._conn.executemany, query, (args,), kwargs)
+
+    async def fetch(self, query: str, *args, **kwargs):
+        return await self._run(_call_site(), self._conn.fetch, query, args, kwargs)
+
+    async def fetchrow(self, query: str, *args, **kwargs):
+        return await self._run(_call_site(), self._conn.fetchrow, query, args, kwargs)
+
+    async def fetchval(self, query: str, *args, **kwargs):
+        return await self._run(_call_site(), self._conn.fetchval, query, args, kwargs)
+
+
+class InstrumentedPool:
+    """
+    Drop-in for asyncpg.Pool as used by the routers (execute / fetch* /
+    acquire).  Connection acquisition honours DB_ACQUIRE_TIMEOUT.
+    """
+
+    def __init__(self, pool: Pool, acquire_timeout: float | None, slow_acquire_ms: float, name: str = "primary"):
+        self._pool = pool
+        self._acquire_timeout = acquire_timeout
+        self._slow_acquire = slow_acquire_ms / 1000
+        self.stats = PoolStats(name)
+
+    def __getattr__(self, name: str):
+        return getattr(self._pool, name)
+
+    @asynccontextmanager
+    async def acquire(self):
+        start = time.perf_counter()
+        try:
+            with span("db_acquire"):
+                conn = await self._pool.acquire(timeout=self._acquire_timeout)
+        except asyncio.TimeoutError:
+            self.stats.acquire_timeouts += 1
+            metrics.DB_ACQUIRE_TIMEOUTS.inc(self.stats.name)
+            logger.error("Timed out after %.1fs waiting for a DB connection (%d/%d in use)",
+                         self._acquire_timeout, self.stats.in_use, self._pool.get_max_size())
+            raise
+        wait = time.perf_counter() - start
+        self.stats.record_acquire(wait)
+        if wait > self._slow_acquire:
+            logger.warning("Waited %.0fms for a DB connection (%d/%d in use)",
+                           wait * 1000, self.stats.in_use, self._pool.get_max_size())
+        try:
+            yield InstrumentedConnection(conn, self.stats)
+        finally:
+            self.stats.in_use -= 1
+            await self._pool.release(conn)
+
+    async def _run(self, site: str, name: str, query: str, args: tuple, kwargs: dict):
+        async with self.acquire() as conn:
+            return await conn._run(site, getattr(conn._conn, name), query, args, kwargs)
 
+    async def execute(self, query: str, *args, **kwargs):
+        return await self._run(_call_site(), "execute", query, args, kwargs)
 
-async def init_db(dsn: str) -> Pool:
-    """Create and return a connection pool."""
-    global _pool
-    _pool = await asyncpg.create_pool(dsn=dsn, min_size=2, max_size=10)
+    async def executemany(self, query: str, args, **kwargs):
+        return await self._run(_call_site(), "executemany", query, (args,), kwargs)
+
+    async def fetch(self, query: str, *args, **kwargs):
+        return await self._run(_call_site(), "fetch", query, args, kwargs)
+
+    async def fetchrow(self, query: str, *args, **kwargs):
+        return await self._run(_call_site(), "fetchrow", query, args, kwargs)
+
+    async def fetchval(self, query: str, *args, **kwargs):
+        return await self._run(_call_site(), "fetchval", query, args, kwargs)
+
+    async def close(self) -> None:
+        await self._pool.close()
+
+
+# ---------------------------------------------------------------------------
+# Lifecycle
+# ---------------------------------------------------------------------------
+
+_pool: InstrumentedPool | None = None
+_replica: InstrumentedPool | None = None
+
+# user_id -> monotonic deadline until which that user's reads go to the primary.
+# Every entry uses the same pin window, so insertion order is deadline order.
+_recent_writers: OrderedDict[str, float] = OrderedDict()
+
+
+def _pool_options() -> dict:
+    """asyncpg.create_pool kwargs from Settings (deferred import, like the routers)."""
+    from app.core.config import settings
+
+    statement_cache_size = settings.db_statement_cache_size
+    if settings.db_pgbouncer_mode:
+        # Transaction-mode poolers hand each transaction a different server
+        # connection, so named prepared statements cannot be reused.
+        statement_cache_size = 0
+
+    return {
+        "min_size": settings.db_pool_min_size,
+        "max_size": settings.db_pool_max_size,
+        "command_timeout": settings.db_command_timeout,
+        "statement_cache_size": statement_cache_size,
+        "max_inactive_connection_lifetime": settings.db_max_inactive_connection_lifetime,
+    }
+
+
+async def _create_pool(dsn: str, name: str) -> InstrumentedPool:
+    from app.core.config import settings
+
+    raw = await asyncpg.create_pool(dsn=dsn, **_pool_options())
+    return InstrumentedPool(raw, settings.db_acquire_timeout, settings.db_slow_acquire_ms, name)
+
+
+async def init_db(dsn: str, replica_dsn: str | None = None) -> InstrumentedPool:
+    """Create and return the primary pool, plus the replica pool if configured."""
+    global _pool, _replica
+    options = _pool_options()
+    # Both pools connect concurrently; a replica failure is not fatal
+    if replica_dsn:
+        primary, replica = await asyncio.gather(
+            _create_pool(dsn, "primary"), _create_pool(replica_dsn, "replica"), return_exceptions=True)
+    else:
+        primary, replica = await _create_pool(dsn, "primary"), None
+    if isinstance(primary, BaseException):
+        if isinstance(replica, InstrumentedPool):
+            await replica.close()
+        raise primary
+    _pool = primary
+    logger.info("DB pool ready (min=%d, max=%d, statement_cache=%d)",
+                options["min_size"], options["max_size"], options["statement_cache_size"])
+
+    if isinstance(replica, BaseException):
+        _replica = None
+        logger.warning("Read replica unavailable (%s) — all reads go to the primary.", replica)
+    elif replica is not None:
+        _replica = replica
+        logger.info("Read-replica pool ready.")
     return _pool
 
 
+# Touches the hot tables so each backend has their catalog entries cached
+# before the first request instead of during it.
+_PREWARM_SQL = """
+SELECT FROM profiles LIMIT 0;
+SELECT FROM user_settings LIMIT 0;
+SELECT FROM quiz_attempts LIMIT 0;
+"""
+
+
+async def prewarm_pools() -> int:
+    """Check out every idle pooled connection at once and run a trivial query on it."""
+    warmed = 0
+    for pool in (_pool, _replica):
+        if pool is None:
+            continue
+        raw = pool._pool
+        conns = await asyncio.gather(*(raw.acquire() for _ in range(raw.get_idle_size())),
+                                     return_exceptions=True)
+        try:
+            for result in await asyncio.gather(
+                    *(c.execute(_PREWARM_SQL) for c in conns if not isinstance(c, BaseException)),
+                    return_exceptions=True):
+                if isinstance(result, BaseException):
+                    logger.warning("Connection pre-warm failed: %s", result)
+                else:
+                    warmed += 1
+        finally:
+            for c in conns:
+                if not isinstance(c, BaseException):
+                    await raw.release(c)
+    return warmed
+
+
 async def close_db() -> None:
-    """Close the connection pool."""
-    global _pool
+    """Close the connection pools."""
+    global _pool, _replica
+    if _replica is not None:
+        await _replica.close()
+        _replica = None
     if _pool is not None:
         await _pool.close()
         _pool = None
+    _recent_writers.clear()
 
 
-def get_pool() -> Pool:
-    """Return the active pool.  Raises if not initialised."""
+def get_pool() -> InstrumentedPool:
+    """Return the primary pool.  Raises if not initialised."""
     if _pool is None:
         raise RuntimeError("Database pool is not initialised. Call init_db() first.")
     return _pool
+
+
+def _pin_key(user_id: str) -> str:
+    return f"dbpin:{user_id}"
+
+
+async def mark_write(*user_ids: str) -> None:
+    """Pin these users' reads to the primary for the replica-lag window, in every worker."""
+    from app.core.config import settings
+
+    if _replica is None or not user_ids or settings.db_replica_pin_seconds <= 0:
+        return
+    now = time.monotonic()
+    for user_id in user_ids:
+        _recent_writers.pop(user_id, None)
+        _recent_writers[user_id] = now + settings.db_replica_pin_seconds
+    # Drop expired pins from the front — amortised O(1)
+    while _recent_writers:
+        oldest, deadline = next(iter(_recent_writers.items()))
+        if deadline > now:
+            break
+        del _recent_writers[oldest]
+
+    client = redis_mod.get_redis()
+    if client is None:
+        return
+    pin_ms = max(1, int(settings.db_replica_pin_seconds * 1000))
+    pipe = client.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.set(_pin_key(user_id), 1, px=pin_ms)
+    try:
+        await redis_mod.call("db_pin", pipe.execute())
+    except Exception as exc:
+        logger.warning("Could not share read-your-writes pin for %d user(s): %s", len(user_ids), exc)
+
+
+async def get_read_pool(user_id: str | None = None) -> InstrumentedPool:
+    """
+    Pool for read-only queries: the replica when configured, unless `user_id`
+    wrote within the pin window and could otherwise miss their own write.
+    """
+    if _replica is None:
+        return get_pool()
+    if user_id is None:
+        return _replica
+    deadline = _recent_writers.get(user_id)
+    if deadline is not None and deadline > time.monotonic():
+        return get_pool()
+    # The write may have gone through another worker
+    client = redis_mod.get_redis()
+    if client is None:
+        return get_pool()
+    try:
+        pinned = await redis_mod.call("db_pin", client.exists(_pin_key(user_id)))
+    except Exception:
+        return get_pool()
+    return get_pool() if pinned else _replica
+
+
+def pool_stats() -> dict:
+    """Acquire-wait, in-use and per-call-site query stats for the active pools."""
+    stats = {}
+    for name, pool in (("primary", _pool), ("replica", _replica)):
+        if pool is not None:
+            stats[name] = {"size": pool.get_size(), "idle": pool.get_idle_size(), **pool.stats.snapshot()}
+    return stats
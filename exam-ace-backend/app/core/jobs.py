@@ -0,0 +1,132 @@
+"""
+Background jobs whose status any worker can report.
+
+A JobRegistry runs one kind of job (bulk quiz generation, re-scoring) as
+asyncio tasks in the process that accepted them:
+- at most `concurrency` run at a time; the rest wait as "queued"
+- the newest `max_local` jobs are kept in memory, and every status change is
+  mirrored to Redis (`{name}job:{job_id}`, kept for a day), so a poll that
+  lands on another worker can still answer
+- a job ends "done" when its work returns, "failed" with the error when it
+  raises, and "failed" with "cancelled at shutdown" when close() cancels it,
+  so nobody is left polling a job that stopped
+- an optional `finalize()` is awaited once the job has ended, however it
+  ended (cancelled while still queued included) — e.g. to release a lock
+
+Jobs are dataclasses with at least job_id, status, error and finished_at.
+"""
+from __future__ import annotations
+
+import json
+import time
+import asyncio
+import logging
+from dataclasses import asdict
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from pydantic_core import to_json
+
+from app.core import redis as redis_mod
+
+logger = logging.getLogger(__name__)
+
+J = TypeVar("J")
+
+_JOB_TTL = 86400
+
+
+class JobRegistry(Generic[J]):
+    """Jobs of one kind started by this process, and the status of any job of that kind."""
+
+    def __init__(self, name: str, job_type: type[J], concurrency: int, max_local: int,
+                 summary: Callable[[J], str] | None = None) -> None:
+        self.name = name
+        self.job_type = job_type
+        self.concurrency = concurrency
+        self.max_local = max_local
+        self.summary = summary
+        self._jobs: dict[str, J] = {}
+        self._slots: asyncio.Semaphore | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.name}job:{job_id}"
+
+    async def publish(self, job: J) -> None:
+        """Mirror `job`'s current status to Redis (failures only logged)."""
+        client = redis_mod.get_redis()
+        if client is None:
+            return
+        try:
+            await redis_mod.call(f"{self.name}_job", client.set(self._key(job.job_id), to_json(asdict(job)),
+                                                                ex=_JOB_TTL))
+        except Exception as exc:
+            logger.warning("Could not publish %s job %s status: %s", self.name, job.job_id, exc)
+
+    async def get(self, job_id: str) -> J | None:
+        """The job from this process, else its last status published by any worker."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        client = redis_mod.get_redis()
+        if client is None:
+            return None
+        try:
+            raw = await redis_mod.call(f"{self.name}_job", client.get(self._key(job_id)))
+        except Exception as exc:
+            logger.warning("Could not read %s job %s status: %s", self.name, job_id, exc)
+            return None
+        return self.job_type(**json.loads(raw)) if raw else None
+
+    def start(self, job: J, work: Callable[[], Awaitable[None]],
+              finalize: Callable[[], Awaitable[None]] | None = None) -> J:
+        """Register `job` and run `work()` in the background once a slot is free, then `finalize()`."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.max_local:
+            del self._jobs[next(iter(self._jobs))]  # oldest first; Redis keeps the status for a day
+        task = asyncio.get_running_loop().create_task(self._run(job, work, finalize))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: J, work: Callable[[], Awaitable[None]],
+                   finalize: Callable[[], Awaitable[None]] | None) -> None:
+        try:
+            await self._work(job, work)
+        finally:
+            if finalize is not None:
+                try:
+                    await finalize()
+                except Exception:
+                    logger.exception("Could not finalize %s job %s", self.name, job.job_id)
+
+    async def _work(self, job: J, work: Callable[[], Awaitable[None]]) -> None:
+        await self.publish(job)
+        try:
+            async with self._slots:
+                await work()
+            job.status = "done"
+        except asyncio.CancelledError:
+            # Shutdown or worker restart: record it, or pollers would see the last status for a day
+            job.status = "failed"
+            job.error = "cancelled at shutdown"
+            job.finished_at = time.time()
+            await self.publish(job)
+            raise
+        except Exception as exc:
+            logger.exception("%s job %s failed", self.name.capitalize(), job.job_id)
+            job.status = "failed"
+            job.error = str(exc) or type(exc).__name__
+        job.finished_at = time.time()
+        await self.publish(job)
+        logger.info("%s job %s %s%s", self.name.capitalize(), job.job_id, job.status,
+                    f": {self.summary(job)}" if self.summary else "")
+
+    async def close(self) -> None:
+        """Cancel running and queued jobs at shutdown; each is marked failed."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,316 @@
+"""
+Prometheus metrics — text exposition format, no client library needed.
+
+- GET /metrics: with METRICS_PORT set it is served only on that port, by a
+  small listener inside the app's event loop; otherwise on the main port
+  only if METRICS_TOKEN is set, to requests bearing that token
+- HTTP: request latency histogram per route template, method and status
+- DB: query latency per call site, connection acquire wait, pool gauges
+- Redis: command latency and errors per operation
+- LLM: call latency per operation/outcome, fallbacks to the bank per reason
+- Rate limiting: decisions and rejections per tier
+- Quiz sessions: started, autosaved, resumed, auto-submitted
+- Write spool: entries spooled / replayed, and how much is waiting
+- Startup: seconds spent in each boot phase (import, db, redis, jwks, prewarm)
+
+Recording is a dict lookup plus a few integer adds: each label set gets a
+preallocated bucket array the first time it is seen, and snapshot-style
+values (pool sizes, cache counters) are only read at scrape time.
+"""
+from __future__ import annotations
+
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+_LLM_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+_REGISTRY: list["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        _REGISTRY.append(self)
+
+    def lines(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def lines(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size  # per bucket, not cumulative; last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = _LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        self._le = [f'le="{_number(b)}"' for b in buckets] + ['le="+Inf"']
+        self._children: dict[tuple, _HistogramChild] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = _HistogramChild(len(self.buckets) + 1)
+        child.counts[bisect_left(self.buckets, value)] += 1
+        child.sum += value
+        child.count += 1
+
+    def lines(self) -> Iterable[str]:
+        for labels, child in self._children.items():
+            cumulative = 0
+            for le, count in zip(self._le, child.counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {repr(child.sum)}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {child.count}"
+
+
+class Collected(_Metric):
+    """Values read from elsewhere at scrape time: `collect()` yields (label_values, value)."""
+
+    def __init__(self, name: str, help: str, kind: str, labels: tuple[str, ...],
+                 collect: Callable[[], Iterable[tuple[tuple, float]]]):
+        super().__init__(name, help, labels)
+        self.kind = kind
+        self._collect = collect
+
+    def lines(self) -> Iterable[str]:
+        try:
+            samples = list(self._collect())
+        except Exception as exc:
+            logger.warning("Metric %s could not be collected: %s", self.name, exc)
+            return
+        for labels, value in samples:
+            yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+def render() -> str:
+    out: list[str] = []
+    for metric in _REGISTRY:
+        out.append(f"# HELP {metric.name} {metric.help}")
+        out.append(f"# TYPE {metric.name} {metric.kind}")
+        out.extend(metric.lines())
+    return "\n".join(out) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Metrics recorded by the app
+# ---------------------------------------------------------------------------
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "examace_http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status"))
+
+DB_QUERY_SECONDS = Histogram(
+    "examace_db_query_duration_seconds", "Query latency per call site.", ("pool", "site"), _FAST_BUCKETS)
+DB_QUERY_ERRORS = Counter(
+    "examace_db_query_errors_total", "Queries that raised.", ("pool", "site"))
+DB_ACQUIRE_SECONDS = Histogram(
+    "examace_db_acquire_wait_seconds", "Time spent waiting for a pooled connection.", ("pool",), _FAST_BUCKETS)
+DB_ACQUIRE_TIMEOUTS = Counter(
+    "examace_db_acquire_timeouts_total", "Connection acquisitions that hit DB_ACQUIRE_TIMEOUT.", ("pool",))
+
+REDIS_SECONDS = Histogram(
+    "examace_redis_command_duration_seconds", "Redis call latency per operation.", ("operation",), _FAST_BUCKETS)
+REDIS_ERRORS = Counter(
+    "examace_redis_errors_total", "Redis calls that raised.", ("operation",))
+
+LLM_SECONDS = Histogram(
+    "examace_llm_duration_seconds", "LLM call latency.", ("operation", "outcome"), _LLM_BUCKETS)
+QUIZ_FALLBACKS = Counter(
+    "examace_quiz_fallbacks_total", "Quizzes served from the question bank instead of the LLM.", ("reason",))
+
+RATE_LIMIT_DECISIONS = Counter(
+    "examace_rate_limit_decisions_total", "Rate limit checks, by the tier that decided.", ("bucket", "tier"))
+RATE_LIMIT_REJECTIONS = Counter(
+    "examace_rate_limit_rejections_total", "Requests rejected with 429.", ("bucket", "tier"))
+
+QUIZ_SESSION_EVENTS = Counter(
+    "examace_quiz_session_events_total", "In-progress quiz session events.", ("event",))
+
+LIVE_EVENTS = Counter(
+    "examace_live_events_total", "Live classroom events.", ("event",))
+
+EXPORT_EVENTS = Counter(
+    "examace_export_events_total", "History exports started, completed or aborted.", ("event",))
+
+ITEM_STATS_ROWS = Counter(
+    "examace_item_stats_rows_total", "question_stats rows upserted, or failed and retried.", ("outcome",))
+
+REVIEW_EVENTS = Counter(
+    "examace_review_events_total", "Review queue questions scheduled, dropped over the cap, or served.", ("event",))
+
+RESCORE_ATTEMPTS = Counter(
+    "examace_rescore_attempts_total", "Attempts re-scored after an answer key fix, or skipped as changed meanwhile.", ("outcome",))
+
+SPOOL_EVENTS = Counter(
+    "examace_spool_entries_total", "Write spool entries spooled, replayed, rejected on replay or corrupt.", ("op", "outcome"))
+
+STARTUP_PHASES: dict[str, float] = {}  # filled once by the lifespan
+
+
+def _pool_gauges():
+    from app.core.database import pool_stats
+    for name, stats in pool_stats().items():
+        yield (name, "total"), stats["size"]
+        yield (name, "idle"), stats["idle"]
+        yield (name, "in_use"), stats["in_use"]
+
+
+def _rate_limit_buckets():
+    from app.core import rate_limiter
+    if rate_limiter._limiter is not None:
+        yield (), rate_limiter._limiter.stats()["buckets"]
+
+
+def _live_connections() -> dict[str, int]:
+    from app.live import hub
+    return hub._hub.connections() if hub._hub is not None else {}
+
+
+def _spool_depth():
+    from app.quiz import spool
+    stats = spool.stats()
+    if stats is not None:
+        yield ("entries",), stats["entries"]
+        yield ("bytes",), stats["bytes"]
+
+
+def _auth_cache():
+    from app.auth.middleware import auth_cache_stats
+    stats = auth_cache_stats()
+    for cache in ("token_cache", "key_cache"):
+        if stats[cache]:
+            yield (cache, "hit"), stats[cache]["hits"]
+            yield (cache, "miss"), stats[cache]["misses"]
+
+
+Collected("examace_db_pool_connections", "Pooled connections by state.", "gauge", ("pool", "state"), _pool_gauges)
+Collected("examace_rate_limit_local_buckets", "Users with an in-process token bucket.", "gauge", (), _rate_limit_buckets)
+Collected("examace_auth_cache_lookups_total", "Auth cache lookups.", "counter", ("cache", "result"), _auth_cache)
+Collected("examace_live_connections", "Open live classroom sockets in this process.", "gauge", ("role",),
+          lambda: (((role,), count) for role, count in _live_connections().items()))
+Collected("examace_spool_depth", "Spooled writes waiting to be replayed into Postgres.", "gauge", ("unit",), _spool_depth)
+Collected("examace_startup_phase_seconds", "Time spent in each startup phase.", "gauge", ("phase",),
+          lambda: (((phase,), seconds) for phase, seconds in STARTUP_PHASES.items()))
+
+
+# ---------------------------------------------------------------------------
+# HTTP middleware + exposition
+# ---------------------------------------------------------------------------
+
+_UNMATCHED = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Pure ASGI; labels by route template (scope["route"]) to keep cardinality bounded."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                route.path if route is not None else _UNMATCHED,
+                status_code,
+            )
+
+
+async def metrics_endpoint(request):
+    from starlette.responses import Response
+    return Response(render(), media_type=CONTENT_TYPE)
+
+
+async def _serve_scrape(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass  # headers are irrelevant
+        parts = request_line.split()
+        if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+            status_line, body = "200 OK", render().encode()
+        else:
+            status_line, body = "404 Not Found", b"Not Found\n"
+        writer.write(
+            f"HTTP/1.1 {status_line}\r\nContent-Type: {CONTENT_TYPE}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int) -> asyncio.AbstractServer:
+    """Serve GET /metrics on a separate port (kept off the public listener)."""
+    server = await asyncio.start_server(_serve_scrape, host, port)
+    logger.info("Metrics listening on http://%s:%d/metrics", host, port)
+    return server
@@ -1,46 +1,373 @@
 """
-Redis-backed sliding-window rate limiter.
+Two-tier rate limiter.
 Default: 20 quiz generations per hour per user.  Returns 429 on breach.
+
+Local tier — an in-process token bucket per user (capacity `limit`, refilling
+at limit/window).  Requests are admitted without a network hop.  The first
+request a process sees for a user is checked against Redis and seeds the
+bucket with the shared remaining quota.
+
+Redis tier — one atomic Lua script per call (single round trip).  A background
+task pushes the quota consumed locally to Redis every RATE_LIMIT_SYNC_INTERVAL
+seconds and clamps each local bucket to what Redis says is left, so workers
+converge on the shared limit.  While Redis is down, the local buckets keep
+enforcing the limit per process.
+
+Redis algorithms (RATE_LIMIT_ALGORITHM):
+  - sliding_window — sliding-window counter: current + previous fixed window,
+    the previous one weighted by how much of it still overlaps the window.
+    One small hash per user.
+  - gcra — generic cell rate algorithm (token bucket equivalent): allows a
+    burst of `limit`, then one request per window/limit.  One string per user.
+
+Both use O(1) memory per user, never count rejected requests, and report the
+remaining quota and reset time for the RateLimit-* response headers.
 """
 from __future__ import annotations
 
+import math
 import time
+import asyncio
 import logging
+from dataclasses import dataclass
 from fastapi import HTTPException, status
 
-from app.core import redis as redis_mod
+from app.core import metrics, redis as redis_mod
+from app.core.tracing import span
 
 logger = logging.getLogger(__name__)
 
 
-async def check_rate_limit(user_id: str, limit: int, window_seconds: int = 3600) -> None:
+# KEYS[1] = bucket   ARGV = limit, window_seconds, cost, force
+# force=1 records the cost even past the limit (reconciling already-admitted requests).
+# Returns {allowed, remaining, reset_seconds, retry_after_seconds}
+_SLIDING_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local force = ARGV[4] == '1'
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local current = math.floor(now / window)
+local data = redis.call('HMGET', KEYS[1], 'w', 'c', 'p')
+local w = tonumber(data[1])
+local c = tonumber(data[2]) or 0
+local p = tonumber(data[3]) or 0
+if w ~= current then
+    if w == current - 1 then p = c else p = 0 end
+    c = 0
+end
+
+local elapsed = now - current * window
+local estimated = p * (window - elapsed) / window + c
+local allowed = 0
+local retry_after = 0
+if estimated + cost <= limit then
+    allowed = 1
+elseif c + cost <= limit and p > 0 then
+    -- frees up as the previous window slides out
+    retry_after = window - (limit - c - cost) * window / p - elapsed
+else
+    -- only once this window becomes the (decaying) previous one
+    local next_elapsed = 0
+    if c > 0 then next_elapsed = math.max(0, window - (limit - cost) * window / c) end
+    retry_after = (window - elapsed) + next_elapsed
+end
+if allowed == 1 or force then
+    c = c + cost
+    estimated = estimated + cost
+    redis.call('HSET', KEYS[1], 'w', current, 'c', c, 'p', p)
+    redis.call('EXPIRE', KEYS[1], window * 2)
+end
+
+return {allowed, math.max(0, math.floor(limit - estimated)), math.ceil(window - elapsed), math.ceil(retry_after)}
+"""
+
+# KEYS[1] = bucket   ARGV = limit, window_seconds, cost, force
+# Stores the theoretical arrival time (TAT); burst tolerance = one full window.
+_GCRA_LUA = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local force = ARGV[4] == '1'
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local interval = window / limit
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+
+local new_tat = tat + interval * cost
+local allow_at = new_tat - window
+if allow_at > now and not force then
+    local remaining = math.floor((window - (tat - now)) / interval)
+    return {0, math.max(0, remaining), math.ceil(tat - now), math.ceil(allow_at - now)}
+end
+
+redis.call('SET', KEYS[1], string.format('%.6f', new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+if allow_at > now then
+    return {0, 0, math.ceil(new_tat - now), math.ceil(allow_at - now)}
+end
+return {1, math.floor((window - (new_tat - now)) / interval), math.ceil(new_tat - now), 0}
+"""
+
+_SCRIPTS = {"sliding_window": _SLIDING_WINDOW_LUA, "gcra": _GCRA_LUA}
+
+# Registered script objects, per Redis client (EVALSHA with automatic EVAL fallback)
+_registered: dict[tuple[int, str], object] = {}
+
+
+@dataclass(slots=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int          # seconds until the quota is fully available again
+    retry_after: int    # seconds until the next request would be allowed (0 if allowed)
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, self.retry_after))
+        return headers
+
+
+def _script(client, algorithm: str):
+    key = (id(client), algorithm)
+    script = _registered.get(key)
+    if script is None:
+        script = _registered[key] = client.register_script(_SCRIPTS[algorithm])
+    return script
+
+
+def _redis_key(bucket: str, user_id: str) -> str:
+    from app.core.config import settings
+    return f"ratelimit:{settings.rate_limit_algorithm}:{bucket}:{user_id}"
+
+
+async def consume(
+    user_id: str,
+    limit: int,
+    window_seconds: int = 3600,
+    cost: int = 1,
+    bucket: str = "quiz",
+    force: bool = False,
+) -> RateLimitResult | None:
     """
-    Raise 429 if the user has exceeded `limit` requests in the rolling `window_seconds`.
-    If Redis is unavailable, silently allow the request (graceful degradation).
+    Atomically take `cost` units from the user's shared quota in Redis.
+    Returns None if Redis is unavailable (caller decides how to degrade).
     """
+    from app.core.config import settings
+
     client = redis_mod.get_redis()
     if client is None:
-        return  # Redis down → skip limiting
-
-    key = f"rate:quiz:{user_id}"
-    now = time.time()
-    window_start = now - window_seconds
-
-    pipe = client.pipeline()
-    # Remove entries older than the window
-    pipe.zremrangebyscore(key, 0, window_start)
-    # Count remaining entries
-    pipe.zcard(key)
-    # Add current request
-    pipe.zadd(key, {str(now): now})
-    # Set expiry on the key so it auto-cleans
-    pipe.expire(key, window_seconds)
-    results = await pipe.execute()
-
-    current_count = results[1]
-    if current_count >= limit:
-        logger.warning("Rate limit hit for user %s (%d/%d)", user_id, current_count, limit)
+        return None
+
+    script = _script(client, settings.rate_limit_algorithm)
+    try:
+        allowed, remaining, reset, retry_after = await redis_mod.call("ratelimit", script(
+            keys=[_redis_key(bucket, user_id)], args=[limit, window_seconds, cost, int(force)]
+        ))
+    except Exception as exc:
+        logger.warning("Rate limit check in Redis failed for user %s: %s", user_id, exc)
+        return None
+
+    return RateLimitResult(
+        allowed=bool(allowed),
+        limit=limit,
+        remaining=int(remaining),
+        reset=int(reset),
+        retry_after=int(retry_after),
+    )
+
+
+def _record(bucket: str, tier: str, result: RateLimitResult) -> None:
+    metrics.RATE_LIMIT_DECISIONS.inc(bucket, tier)
+    if not result.allowed:
+        metrics.RATE_LIMIT_REJECTIONS.inc(bucket, tier)
+
+
+# ---------------------------------------------------------------------------
+# Local tier
+# ---------------------------------------------------------------------------
+
+class _LocalBucket:
+    __slots__ = ("limit", "window", "tokens", "updated", "pending")
+
+    def __init__(self, limit: int, window: int, tokens: float):
+        self.limit = limit
+        self.window = window
+        self.tokens = tokens
+        self.updated = time.monotonic()
+        self.pending = 0  # admitted locally, not yet reported to Redis
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.window
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> RateLimitResult:
+        self.refill(now)
+        allowed = self.tokens >= 1
+        if allowed:
+            self.tokens -= 1
+            self.pending += 1
+        return self.result(allowed)
+
+    def clamp(self, remaining: int) -> None:
+        """Never hold more tokens than the shared quota has left."""
+        self.refill(time.monotonic())
+        self.tokens = min(self.tokens, remaining)
+
+    def result(self, allowed: bool) -> RateLimitResult:
+        return RateLimitResult(
+            allowed=allowed,
+            limit=self.limit,
+            remaining=int(self.tokens),
+            reset=math.ceil((self.limit - self.tokens) / self.rate),
+            retry_after=0 if allowed else math.ceil((1 - self.tokens) / self.rate),
+        )
+
+
+class LocalRateLimiter:
+    def __init__(self, sync_interval: float = 1.0):
+        self.sync_interval = sync_interval
+        self._buckets: dict[tuple[str, str], _LocalBucket] = {}
+        self._sync_task: asyncio.Task | None = None
+
+        self.local_decisions = 0
+        self.redis_checks = 0
+        self.syncs = 0
+        self.sync_errors = 0
+
+    async def check(self, user_id: str, limit: int, window_seconds: int, bucket: str = "quiz") -> RateLimitResult:
+        self._ensure_sync_task()
+        key = (bucket, user_id)
+        local = self._buckets.get(key)
+        if local is None or local.limit != limit or local.window != window_seconds:
+            # First sighting in this process: ask Redis and seed from the shared quota
+            self.redis_checks += 1
+            shared = await consume(user_id, limit, window_seconds, bucket=bucket)
+            if shared is not None:
+                self._buckets[key] = _LocalBucket(limit, window_seconds, tokens=shared.remaining)
+                _record(bucket, "redis", shared)
+                return shared
+            local = self._buckets[key] = _LocalBucket(limit, window_seconds, tokens=limit)
+
+        self.local_decisions += 1
+        result = local.take(time.monotonic())
+        _record(bucket, "local", result)
+        return result
+
+    # ------------------------------------------------------------------
+    # Reconciliation with Redis
+    # ------------------------------------------------------------------
+
+    def _ensure_sync_task(self) -> None:
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.get_running_loop().create_task(self._sync_loop())
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as exc:
+                self.sync_errors += 1
+                logger.warning("Rate limit reconciliation failed: %s", exc)
+
+    async def sync(self) -> None:
+        """Report locally consumed quota to Redis and clamp buckets to the shared remainder."""
+        now = time.monotonic()
+        # Drop buckets idle for a whole window; a later request re-seeds from Redis
+        for key, local in list(self._buckets.items()):
+            if now - local.updated > local.window:
+                del self._buckets[key]
+
+        client = redis_mod.get_redis()
+        if client is None:
+            return
+        dirty = [(key, local, local.pending) for key, local in self._buckets.items() if local.pending]
+        if not dirty:
+            return
+
+        from app.core.config import settings
+        script = _script(client, settings.rate_limit_algorithm)
+        pipe = client.pipeline(transaction=False)
+        for (bucket, user_id), local, pending in dirty:
+            await script(keys=[_redis_key(bucket, user_id)],
+                         args=[local.limit, local.window, pending, 1], client=pipe)
+        results = await redis_mod.call("ratelimit_sync", pipe.execute())
+
+        self.syncs += 1
+        for (_key, local, pending), (_allowed, remaining, _reset, _retry) in zip(dirty, results):
+            local.pending -= pending
+            local.clamp(int(remaining))
+
+    async def close(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        try:
+            await self.sync()  # don't lose the last interval's consumption
+        except Exception as exc:
+            logger.warning("Final rate limit reconciliation failed: %s", exc)
+
+    def stats(self) -> dict:
+        return {
+            "buckets": len(self._buckets),
+            "local_decisions": self.local_decisions,
+            "redis_checks": self.redis_checks,
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors,
+        }
+
+
+_limiter: LocalRateLimiter | None = None
+
+
+def get_rate_limiter() -> LocalRateLimiter:
+    global _limiter
+    if _limiter is None:
+        from app.core.config import settings
+        _limiter = LocalRateLimiter(sync_interval=settings.rate_limit_sync_interval)
+    return _limiter
+
+
+async def close_rate_limiter() -> None:
+    global _limiter
+    if _limiter is not None:
+        await _limiter.close()
+        _limiter = None
+
+
+async def check_rate_limit(user_id: str, limit: int, window_seconds: int = 3600) -> RateLimitResult:
+    """
+    Raise 429 (with RateLimit-* and Retry-After headers) if the user has used up
+    `limit` requests in the rolling `window_seconds`.
+    If Redis is unavailable, the per-process bucket still enforces the limit.
+    """
+    with span("ratelimit"):
+        result = await get_rate_limiter().check(user_id, limit, window_seconds)
+
+    if not result.allowed:
+        logger.warning("Rate limit hit for user %s (limit %d, retry in %ds)", user_id, limit, result.retry_after)
+        window_label = "hour" if window_seconds == 3600 else f"{window_seconds} seconds"
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"Rate limit exceeded. Max {limit} quiz generations per hour.",
+            detail=f"Rate limit exceeded. Max {limit} quiz generations per {window_label}.",
+            headers=result.headers(),
         )
+    return result
@@ -1,33 +1,63 @@
 """
 Async Redis client wrapper.
 Gracefully degrades if Redis is not available (logs warning, skips operations).
+
+If Redis is unreachable at startup, or a connection error is reported later,
+a background task keeps pinging it (exponential backoff) and puts the client
+back into service once it answers.
 """
 from __future__ import annotations
 
+import time
+import asyncio
 import logging
+from typing import Awaitable, TypeVar
+
 import redis.asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+from app.core import metrics
+from app.core.tracing import span
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+_RECONNECT_MIN_DELAY = 1.0
+_RECONNECT_MAX_DELAY = 30.0
+
 _redis: aioredis.Redis | None = None
 _available: bool = False
+_reconnect_task: asyncio.Task | None = None
 
 
 async def init_redis(url: str) -> None:
-    """Connect to Redis.  If connection fails, log and continue (graceful degradation)."""
+    """Connect to Redis.  If connection fails, log and keep retrying in the background."""
     global _redis, _available
     try:
         _redis = aioredis.from_url(url, decode_responses=True)
+    except ValueError as exc:
+        logger.warning("Invalid REDIS_URL (%s) — Redis disabled.", exc)
+        return
+    try:
         await _redis.ping()
         _available = True
         logger.info("Redis connected at %s", url)
     except Exception as exc:
         _available = False
-        logger.warning("Redis unavailable (%s) — rate limiting disabled.", exc)
+        logger.warning("Redis unavailable (%s) — retrying in the background.", exc)
+        _start_reconnect()
 
 
 async def close_redis() -> None:
-    global _redis, _available
+    global _redis, _available, _reconnect_task
+    if _reconnect_task is not None:
+        _reconnect_task.cancel()
+        try:
+            await _reconnect_task
+        except asyncio.CancelledError:
+            pass
+        _reconnect_task = None
     if _redis is not None:
         await _redis.aclose()
         _redis = None
@@ -40,3 +70,58 @@ def get_redis() -> aioredis.Redis | None:
 
 def is_available() -> bool:
     return _available
+
+
+def report_error(exc: BaseException) -> None:
+    """
+    Callers report failed Redis commands here.  Connection-level errors take the
+    client out of service until the reconnect loop gets a PONG again.
+    """
+    global _available
+    if not isinstance(exc, (RedisConnectionError, RedisTimeoutError, OSError)):
+        return
+    if _available:
+        logger.warning("Redis connection lost (%s) — reconnecting in the background.", exc)
+    _available = False
+    _start_reconnect()
+
+
+async def call(operation: str, awaitable: Awaitable[T]) -> T:
+    """Await a Redis command, timing it per `operation` and reporting failures."""
+    start = time.perf_counter()
+    try:
+        with span("redis"):
+            return await awaitable
+    except Exception as exc:
+        metrics.REDIS_ERRORS.inc(operation)
+        report_error(exc)
+        raise
+    finally:
+        metrics.REDIS_SECONDS.observe(time.perf_counter() - start, operation)
+
+
+# ---------------------------------------------------------------------------
+# Reconnect loop
+# ---------------------------------------------------------------------------
+
+def _start_reconnect() -> None:
+    global _reconnect_task
+    if _redis is None or (_reconnect_task is not None and not _reconnect_task.done()):
+        return
+    _reconnect_task = asyncio.get_running_loop().create_task(_reconnect_loop())
+
+
+async def _reconnect_loop() -> None:
+    global _available
+    delay = _RECONNECT_MIN_DELAY
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            await _redis.ping()
+        except Exception as exc:
+            logger.debug("Redis still unavailable (%s); next attempt in %.0fs", exc, delay)
+            delay = min(delay * 2, _RECONNECT_MAX_DELAY)
+            continue
+        _available = True
+        logger.info("Redis reconnected.")
+        return
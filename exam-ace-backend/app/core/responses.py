@@ -0,0 +1,24 @@
+"""
+Fast JSON responses.
+
+Returning a plain model or dict from an endpoint makes FastAPI validate it
+against `response_model` again, walk it with `jsonable_encoder` and then
+`json.dumps` the result.  For models the handler just built that is pure
+overhead: `FastJSONResponse` serializes models, lists and dicts straight to
+bytes with pydantic-core's encoder.  Endpoints keep `response_model=` for the
+OpenAPI schema; FastAPI passes a returned Response through untouched.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from pydantic_core import to_json
+from starlette.responses import Response
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
@@ -0,0 +1,257 @@
+"""
+Opt-in per-request instrumentation.
+
+Server-Timing (SERVER_TIMING=true)
+  Code marks phases with `with span("db"):`.  Durations are summed per name
+  for the current request (a ContextVar, so concurrent requests never mix) and
+  returned as `Server-Timing: auth;dur=0.4, ratelimit;dur=0.3, db;dur=5.1;desc="4 calls", ...`.
+  Spans may nest (ratelimit includes its redis call); `total` is the whole request.
+
+Slow-request profiler (PROFILE_SLOW_REQUESTS_MS=<threshold>)
+  While requests are in flight a sampler thread records, every
+  PROFILE_SAMPLE_INTERVAL_MS, what each request is doing: the thread's Python
+  stack if the request is running on the loop, otherwise its coroutine await
+  chain (i.e. what it is waiting on — the LLM, a DB query ...).  Requests that
+  end up slower than the threshold get their samples written to PROFILE_DIR in
+  collapsed-stack format (`frame;frame;frame count`), ready for flamegraph.pl
+  or speedscope.  Faster requests' samples are discarded.
+
+Outside a traced request `span()` is a ContextVar lookup returning a shared no-op.
+"""
+from __future__ import annotations
+
+import re
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Spans
+# ---------------------------------------------------------------------------
+
+class RequestSpans:
+    __slots__ = ("totals",)
+
+    def __init__(self) -> None:
+        self.totals: dict[str, list] = {}  # name -> [seconds, count]
+
+    def add(self, name: str, elapsed: float) -> None:
+        entry = self.totals.get(name)
+        if entry is None:
+            self.totals[name] = [elapsed, 1]
+        else:
+            entry[0] += elapsed
+            entry[1] += 1
+
+    def header(self, total: float) -> str:
+        parts = []
+        for name, (elapsed, count) in self.totals.items():
+            part = f"{name};dur={elapsed * 1000:.2f}"
+            if count > 1:
+                part += f';desc="{count} calls"'
+            parts.append(part)
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[RequestSpans | None] = ContextVar("request_spans", default=None)
+
+
+class _Span:
+    __slots__ = ("name", "spans", "start")
+
+    def __init__(self, name: str, spans: RequestSpans):
+        self.name = name
+        self.spans = spans
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.spans.add(self.name, time.perf_counter() - self.start)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str):
+    """Time a phase of the current request (no-op outside a traced request)."""
+    spans = _current.get()
+    if spans is None:
+        return _NOOP
+    return _Span(name, spans)
+
+
+# ---------------------------------------------------------------------------
+# Sampling profiler
+# ---------------------------------------------------------------------------
+
+def _frame_name(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_qualname}"
+
+
+class _Tracked:
+    __slots__ = ("task", "root_frame", "samples")
+
+    def __init__(self, task: asyncio.Task, root_frame):
+        self.task = task
+        self.root_frame = root_frame  # the middleware's frame — stacks are trimmed above it
+        self.samples: Counter = Counter()
+
+
+class SamplingProfiler:
+    """Samples in-flight requests from a daemon thread; see module docstring."""
+
+    def __init__(self, interval: float, loop_thread_id: int):
+        self.interval = interval
+        self.loop_thread_id = loop_thread_id
+        self._inflight: dict[int, _Tracked] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+        self._thread.start()
+
+    def begin(self, task: asyncio.Task, root_frame) -> _Tracked:
+        tracked = _Tracked(task, root_frame)
+        with self._lock:
+            self._inflight[id(tracked)] = tracked
+        self._wake.set()
+        return tracked
+
+    def end(self, tracked: _Tracked) -> Counter:
+        with self._lock:
+            self._inflight.pop(id(tracked), None)
+        return tracked.samples
+
+    def _run(self) -> None:
+        while True:
+            if not self._inflight:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            time.sleep(self.interval)
+            with self._lock:
+                tracked = list(self._inflight.values())
+            try:
+                top = sys._current_frames().get(self.loop_thread_id)
+                running = []
+                while top is not None:
+                    running.append(top)
+                    top = top.f_back
+                for t in tracked:
+                    stack = self._running_stack(t, running) or self._await_chain(t)
+                    if stack:
+                        t.samples[stack] += 1
+            except Exception:  # never let a racy read kill the sampler
+                logger.debug("Profiler sample failed", exc_info=True)
+
+    @staticmethod
+    def _running_stack(t: _Tracked, running: list) -> str | None:
+        """The loop thread's stack, if it is currently executing this request."""
+        for depth, frame in enumerate(running):
+            if frame is t.root_frame:
+                return ";".join(_frame_name(f) for f in reversed(running[:depth + 1]))
+        return None
+
+    @staticmethod
+    def _await_chain(t: _Tracked) -> str | None:
+        """Where a suspended request is waiting: follow cr_await from the task's coroutine."""
+        names: list[str] = []
+        recording = False
+        awaitable = t.task.get_coro()
+        for _ in range(200):
+            frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) \
+                or getattr(awaitable, "ag_frame", None)
+            if frame is None:
+                if recording and awaitable is not None:
+                    names.append(f"[await {type(awaitable).__name__}]")
+                break
+            recording = recording or frame is t.root_frame
+            if recording:
+                names.append(_frame_name(frame))
+            awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) \
+                or getattr(awaitable, "ag_await", None)
+        return ";".join(names) if recording else None
+
+
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _write_profile(directory: Path, method: str, path: str, elapsed: float, samples: Counter) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = _UNSAFE_FILENAME.sub("_", path.strip("/")) or "root"
+    out = directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{slug}-{elapsed * 1000:.0f}ms.collapsed"
+    out.write_text("".join(f"{stack} {count}\n" for stack, count in samples.most_common()))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+
+class TimingMiddleware:
+    """Pure ASGI.  Added only when SERVER_TIMING or PROFILE_SLOW_REQUESTS_MS is set."""
+
+    def __init__(self, app, server_timing: bool = True, slow_ms: float | None = None,
+                 sample_interval_ms: float = 5.0, profile_dir: str = "profiles"):
+        self.app = app
+        self.server_timing = server_timing
+        self.slow = slow_ms / 1000 if slow_ms else None
+        self.sample_interval = sample_interval_ms / 1000
+        self.profile_dir = Path(profile_dir)
+        self._profiler: SamplingProfiler | None = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans = RequestSpans()
+        token = _current.set(spans)
+        start = time.perf_counter()
+        tracked = None
+        if self.slow is not None:
+            if self._profiler is None:
+                self._profiler = SamplingProfiler(self.sample_interval, threading.get_ident())
+            tracked = self._profiler.begin(asyncio.current_task(), sys._getframe())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.server_timing:
+                header = spans.header(time.perf_counter() - start).encode("latin-1")
+                message["headers"] = [*message.get("headers", []), (b"server-timing", header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if tracked is not None:
+                samples = self._profiler.end(tracked)
+                elapsed = time.perf_counter() - start
+                if elapsed >= self.slow and samples:
+                    route = scope.get("route")
+                    path = route.path if route is not None else scope["path"]
+                    out = await asyncio.to_thread(
+                        _write_profile, self.profile_dir, scope["method"], path, elapsed, samples)
+                    logger.warning("Slow request %s %s took %.0fms (%s) — profile written to %s",
+                                   scope["method"], path, elapsed * 1000,
+                                   spans.header(elapsed), out)
@@ -0,0 +1,203 @@
+"""
+WebSocket fan-out for live classrooms.
+
+Every broadcast goes through Redis pub/sub (`live:{code}:events`, or
+`live:{code}:hosts` for messages only the host needs), so a room works across
+all worker processes: each process holds one pattern subscription and hands
+every message to its own sockets in that room.  A
+message is serialized once and queued on each socket; per-socket writer
+tasks do the sending, so one slow client never holds up the others.  A
+client whose queue fills up (LIVE_SEND_QUEUE messages behind) is
+disconnected instead of buffering without bound.
+
+`{"type": "_control", ...}` messages carry host commands to whichever
+process runs the room's controller and are never sent to clients.
+"""
+from __future__ import annotations
+
+import json
+import asyncio
+import logging
+
+from pydantic_core import to_json
+from starlette.websockets import WebSocket
+
+from app.core import metrics
+from app.core import redis as redis_mod
+
+logger = logging.getLogger(__name__)
+
+_PATTERNS = ("live:*:events", "live:*:hosts")
+_CONTROL_PREFIX = '{"type":"_control"'
+_RESUBSCRIBE_DELAY = 1.0
+_READY_TIMEOUT = 5.0
+
+
+class LiveUnavailableError(Exception):
+    """Redis is down: rooms cannot be created, joined or broadcast to."""
+
+
+def channel(code: str, hosts_only: bool = False) -> str:
+    return f"live:{code}:{'hosts' if hosts_only else 'events'}"
+
+
+class Connection:
+    """One accepted socket and the queue of messages waiting to be sent to it."""
+
+    __slots__ = ("websocket", "user_id", "is_host", "_queue", "_task", "closed")
+
+    def __init__(self, websocket: WebSocket, user_id: str, is_host: bool, queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.is_host = is_host
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self._task = asyncio.get_running_loop().create_task(self._writer())
+        self.closed = False
+
+    def push(self, data: str) -> None:
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            logger.info("Live client %s is too slow — disconnecting.", self.user_id)
+            metrics.LIVE_EVENTS.inc("dropped_slow")
+            self.close()
+            asyncio.get_running_loop().create_task(self._close_socket(1013))
+
+    async def _writer(self) -> None:
+        try:
+            while True:
+                await self.websocket.send_text(await self._queue.get())
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.closed = True  # the receive loop sees the disconnect and cleans up
+
+    async def _close_socket(self, code: int) -> None:
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        self.closed = True
+        self._task.cancel()
+
+
+class Hub:
+    def __init__(self) -> None:
+        self.rooms: dict[str, set[Connection]] = {}
+        self.controllers: dict[str, object] = {}  # code -> RoomController running here
+        self.ready = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            client = redis_mod.get_redis()
+            if client is None:
+                await asyncio.sleep(_RESUBSCRIBE_DELAY)
+                continue
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(*_PATTERNS)
+                self.ready.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        _, code, audience = message["channel"].split(":", 2)
+                        self._deliver(code, message["data"], hosts_only=audience == "hosts")
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.ready.clear()
+                logger.warning("Live classroom subscription lost (%s) — resubscribing.", exc)
+                await asyncio.sleep(_RESUBSCRIBE_DELAY)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def _deliver(self, code: str, data: str, hosts_only: bool = False) -> None:
+        if data.startswith(_CONTROL_PREFIX):
+            controller = self.controllers.get(code)
+            if controller is not None:
+                controller.command(json.loads(data)["command"])
+            return
+        for conn in list(self.rooms.get(code, ())):
+            if conn.is_host or not hosts_only:
+                conn.push(data)
+
+    async def wait_ready(self) -> bool:
+        try:
+            await asyncio.wait_for(self.ready.wait(), _READY_TIMEOUT)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def publish(self, code: str, message: dict, hosts_only: bool = False) -> None:
+        client = redis_mod.get_redis()
+        if client is None:
+            raise LiveUnavailableError("Redis unavailable")
+        await redis_mod.call("live_publish", client.publish(channel(code, hosts_only), to_json(message).decode()))
+
+    def add(self, code: str, conn: Connection) -> None:
+        self.rooms.setdefault(code, set()).add(conn)
+
+    def remove(self, code: str, conn: Connection) -> None:
+        conn.close()
+        members = self.rooms.get(code)
+        if members is not None:
+            members.discard(conn)
+            if not members:
+                del self.rooms[code]
+
+    def send(self, conn: Connection, message: dict) -> None:
+        """A message for one client, queued behind its broadcasts."""
+        conn.push(to_json(message).decode())
+
+    def connections(self) -> dict[str, int]:
+        counts = {"host": 0, "player": 0}
+        for members in self.rooms.values():
+            for conn in members:
+                counts["host" if conn.is_host else "player"] += 1
+        return counts
+
+    async def close(self) -> None:
+        # Controllers end their rooms (final write and broadcast) before anything closes
+        await asyncio.gather(*(controller.stop() for controller in list(self.controllers.values())),
+                             return_exceptions=True)
+        for members in list(self.rooms.values()):
+            for conn in members:
+                conn.close()
+        self.rooms.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_hub: Hub | None = None
+
+
+def get_hub() -> Hub:
+    """The process's hub, subscribing on first use."""
+    global _hub
+    if _hub is None:
+        _hub = Hub()
+        _hub.start()
+    return _hub
+
+
+async def close_hub() -> None:
+    global _hub
+    if _hub is not None:
+        await _hub.close()
+        _hub = None
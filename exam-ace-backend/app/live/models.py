@@ -0,0 +1,42 @@
+"""
+Live classroom request / response models.  WebSocket messages are plain
+JSON objects with a "type" field, documented in app.live.router.
+"""
+from __future__ import annotations
+
+from pydantic import BaseModel, Field
+from app.quiz.models import Difficulty
+
+
+class CreateRoomRequest(BaseModel):
+    subject: str = Field(..., min_length=1, max_length=200)
+    difficulty: Difficulty
+    count: int = Field(default=10, ge=3, le=30)
+    question_seconds: int | None = Field(default=None, ge=5, le=300, description="Default: LIVE_QUESTION_SECONDS")
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: str
+    name: str | None = None
+    points: int
+
+
+class PlayerStanding(BaseModel):
+    rank: int
+    points: int
+
+
+class RoomResponse(BaseModel):
+    code: str
+    subject: str
+    difficulty: Difficulty
+    source: str
+    total: int
+    question_seconds: int
+    phase: str = Field(..., description="lobby, question, reveal or ended")
+    index: int = Field(..., description="Current question, -1 before the start")
+    players: int
+    leaderboard: list[LeaderboardEntry] = Field(default_factory=list)
+    you: PlayerStanding | None = Field(default=None, description="The caller's own rank, if they joined")
+    socket_path: str = Field(..., description='Connect offering the subprotocols ["bearer", <access token>]')
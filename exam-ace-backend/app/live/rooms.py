@@ -0,0 +1,516 @@
+"""
+Live classroom rooms: one quiz, generated once, played by a whole class at
+the same pace.
+
+State lives in Redis so every worker process can serve the room's sockets:
+- `live:{code}`          hash: host, subject, difficulty, questions, phase,
+                         current index, deadline, answered count
+- `live:{code}:players`  hash: user_id -> 1, for everyone who joined
+- `live:{code}:answers`  hash: "<user_id>:<index>" -> answer, first one wins
+- `live:{code}:board`    sorted set: user_id -> points
+
+Answers are recorded by one Lua call each (membership, phase, deadline and
+first-answer checks included) — no Postgres involved while the quiz runs.
+A correct answer earns 500–1000 points, more the faster it came.
+
+The RoomController runs in the process that received the host's "start":
+it opens each question, broadcasts progress and the leaderboard, reveals
+the answer and moves on when everyone has answered, time is up or the host
+says "next".  When the last question closes it grades every player's
+answers and writes all their quiz_attempts rows in one statement.
+
+A running controller holds the lease `live:{code}:controller` and renews it
+while it paces the room.  If its process dies, the lease runs out and the
+next socket to connect to the room (or the host's next command) resumes it
+from the current question in that process.  A controller cancelled at
+shutdown ends the quiz with the answers given so far instead of leaving
+players waiting.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import secrets
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from app.core import metrics
+from app.core import redis as redis_mod
+from app.live.hub import LiveUnavailableError, get_hub
+from app.quiz.models import QuizQuestion, QuizQuestionList
+
+logger = logging.getLogger(__name__)
+
+_CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"  # no 0/O, 1/I
+_CODE_LENGTH = 6
+_ROOM_TTL = 4 * 3600
+_ENDED_TTL = 3600  # results stay readable for an hour after the last question
+_PROGRESS_INTERVAL = 1.0
+_CONTROLLER_LEASE = 10.0  # seconds a controller that stopped renewing keeps the room
+_LEADERBOARD_SIZE = 10
+
+# KEYS = room, players, answers, board
+# ARGV = user_id, index, answer, now
+# Returns points earned (0 if wrong), or -1 not joined, -2 question not open, -3 too late, -4 already answered
+_ANSWER_LUA = """
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 0 then return -1 end
+local m = redis.call('HMGET', KEYS[1], 'phase', 'i', 'd', 'ci', 'qs')
+if m[1] ~= 'question' or m[2] ~= ARGV[2] then return -2 end
+local now = tonumber(ARGV[4])
+local deadline = tonumber(m[3])
+if now > deadline then return -3 end
+if redis.call('HSETNX', KEYS[3], ARGV[1] .. ':' .. ARGV[2], ARGV[3]) == 0 then return -4 end
+redis.call('HINCRBY', KEYS[1], 'c', 1)
+if ARGV[3] ~= m[4] then return 0 end
+local points = 500 + math.floor(500 * (deadline - now) / tonumber(m[5]))
+redis.call('ZINCRBY', KEYS[4], points, ARGV[1])
+return points
+"""
+
+# KEYS = lease; ARGV = token, lease ms.  Renews (or with ms = 0 drops) the lease if it is still ours
+_LEASE_LUA = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+if ARGV[2] == '0' then return redis.call('DEL', KEYS[1]) end
+return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+"""
+
+_ANSWER_ERRORS = {
+    -1: "Join the room first.",
+    -2: "That question is not open.",
+    -3: "Time is up for that question.",
+    -4: "Already answered.",
+}
+
+_registered: dict[tuple[int, str], object] = {}
+
+
+class RoomFullError(Exception):
+    """The room has LIVE_MAX_PLAYERS players already."""
+
+
+class AnswerRejectedError(Exception):
+    """The answer was not recorded; the message says why."""
+
+
+@dataclass(slots=True)
+class Room:
+    code: str
+    host: str
+    subject: str
+    difficulty: str
+    source: str
+    questions: list[QuizQuestion]
+    question_seconds: int
+    phase: str  # lobby → question ⇄ reveal → ended
+    index: int  # current question, -1 in the lobby
+    deadline: float | None
+
+    def question_message(self) -> dict:
+        """The current question as broadcast to players — no answer in it."""
+        q = self.questions[self.index]
+        return {
+            "type": "question",
+            "index": self.index,
+            "total": len(self.questions),
+            "question": q.question,
+            "options": q.options,
+            "deadline": self.deadline,
+            "seconds": self.question_seconds,
+            "ts": time.time(),
+        }
+
+
+def _settings():
+    from app.core.config import settings
+    return settings
+
+
+def _keys(code: str) -> tuple[str, str, str, str]:
+    base = f"live:{code}"
+    return base, f"{base}:players", f"{base}:answers", f"{base}:board"
+
+
+def _client():
+    client = redis_mod.get_redis()
+    if client is None:
+        raise LiveUnavailableError("Redis unavailable")
+    return client
+
+
+def _lease_key(code: str) -> str:
+    return f"live:{code}:controller"
+
+
+def _script(client, lua: str = _ANSWER_LUA):
+    script = _registered.get((id(client), lua))
+    if script is None:
+        script = _registered[(id(client), lua)] = client.register_script(lua)
+    return script
+
+
+async def create(host_id: str, subject: str, difficulty: str, questions: list[QuizQuestion],
+                 source: str, question_seconds: int) -> Room:
+    client = _client()
+    for _ in range(5):
+        code = "".join(secrets.choice(_CODE_ALPHABET) for _ in range(_CODE_LENGTH))
+        room_key = _keys(code)[0]
+        if await redis_mod.call("live_create", client.hsetnx(room_key, "host", host_id)):
+            break
+    else:
+        raise RuntimeError("Could not allocate a room code.")
+
+    pipe = client.pipeline(transaction=True)
+    pipe.hset(room_key, mapping={
+        "subject": subject, "difficulty": difficulty, "source": source,
+        "questions": QuizQuestionList.dump_json(questions).decode(),
+        "qs": question_seconds, "phase": "lobby", "i": -1, "d": "", "ci": "", "c": 0,
+    })
+    pipe.expire(room_key, _ROOM_TTL)
+    await redis_mod.call("live_create", pipe.execute())
+    metrics.LIVE_EVENTS.inc("room_created")
+    return Room(code, host_id, subject, difficulty, source, questions, question_seconds, "lobby", -1, None)
+
+
+async def load(code: str) -> Room | None:
+    fields = await redis_mod.call("live_load", _client().hgetall(_keys(code)[0]))
+    if not fields or "questions" not in fields:
+        return None
+    return Room(
+        code=code,
+        host=fields["host"],
+        subject=fields["subject"],
+        difficulty=fields["difficulty"],
+        source=fields["source"],
+        questions=QuizQuestionList.validate_json(fields["questions"]),
+        question_seconds=int(fields["qs"]),
+        phase=fields["phase"],
+        index=int(fields["i"]),
+        deadline=float(fields["d"]) if fields["d"] else None,
+    )
+
+
+async def join(code: str, user_id: str) -> int:
+    """Add a player (idempotent, so reconnecting is fine); returns the player count."""
+    client = _client()
+    _, players_key, _, board_key = _keys(code)
+    pipe = client.pipeline(transaction=True)
+    pipe.hsetnx(players_key, user_id, 1)
+    pipe.hlen(players_key)
+    added, count = await redis_mod.call("live_join", pipe.execute())
+    if added and count > _settings().live_max_players:
+        await redis_mod.call("live_join", client.hdel(players_key, user_id))
+        raise RoomFullError(code)
+    if added:
+        pipe = client.pipeline(transaction=True)
+        pipe.zadd(board_key, {user_id: 0}, nx=True)
+        pipe.expire(players_key, _ROOM_TTL)
+        pipe.expire(board_key, _ROOM_TTL)
+        await redis_mod.call("live_join", pipe.execute())
+        metrics.LIVE_EVENTS.inc("joined")
+    return count
+
+
+async def answer(code: str, user_id: str, index: int, choice: int) -> None:
+    client = _client()
+    result = await redis_mod.call("live_answer", _script(client)(
+        keys=list(_keys(code)), args=[user_id, index, choice, repr(time.time())]))
+    if result < 0:
+        raise AnswerRejectedError(_ANSWER_ERRORS[result])
+    metrics.LIVE_EVENTS.inc("answered")
+
+
+async def player_count(code: str) -> int:
+    return await redis_mod.call("live_players", _client().hlen(_keys(code)[1]))
+
+
+async def standing(code: str, user_id: str) -> dict | None:
+    """One player's rank and points, or None if they did not join."""
+    pipe = _client().pipeline(transaction=False)
+    pipe.zrevrank(_keys(code)[3], user_id)
+    pipe.zscore(_keys(code)[3], user_id)
+    rank, points = await redis_mod.call("live_board", pipe.execute())
+    return None if rank is None else {"rank": rank + 1, "points": int(points)}
+
+
+async def leaderboard(code: str, limit: int | None = _LEADERBOARD_SIZE) -> list[dict]:
+    """Top players by points, display names included."""
+    client = _client()
+    rows = await redis_mod.call("live_board", client.zrevrange(
+        _keys(code)[3], 0, -1 if limit is None else limit - 1, withscores=True))
+    names = await _display_names([user_id for user_id, _ in rows])
+    return [
+        {"rank": rank, "user_id": user_id, "name": names.get(user_id), "points": int(points)}
+        for rank, (user_id, points) in enumerate(rows, start=1)
+    ]
+
+
+_names: dict[str, str | None] = {}
+
+
+async def _display_names(user_ids: list[str]) -> dict[str, str | None]:
+    """Profile display names, looked up once per user and remembered."""
+    from app.core.database import get_read_pool
+
+    missing = [uid for uid in user_ids if uid not in _names]
+    if missing:
+        rows = await (await get_read_pool()).fetch(
+            "SELECT id, display_name FROM profiles WHERE id = ANY($1::uuid[])",
+            [uuid.UUID(uid) for uid in missing],
+        )
+        found = {str(row["id"]): row["display_name"] for row in rows}
+        if len(_names) > 100_000:
+            _names.clear()
+        for uid in missing:
+            _names[uid] = found.get(uid)
+    return {uid: _names[uid] for uid in user_ids}
+
+
+async def control(code: str, command: str) -> None:
+    """Pass a host command to the room's controller, wherever it runs."""
+    await get_hub().publish(code, {"type": "_control", "command": command})
+
+
+async def start(code: str) -> bool:
+    """Start the room's controller here, unless one is running (anywhere) or the room has ended."""
+    return await _take_over(code, ("lobby", "question", "reveal"))
+
+
+async def resume(code: str) -> bool:
+    """Resume a started room here if its controller is gone (its process died)."""
+    return await _take_over(code, ("question", "reveal"))
+
+
+async def _take_over(code: str, phases: tuple[str, ...]) -> bool:
+    client = _client()
+    if await redis_mod.call("live_lease", client.exists(_lease_key(code))):
+        return False
+    room = await load(code)
+    if room is None or room.phase not in phases:
+        return False
+    token = f"{os.getpid()}:{uuid.uuid4().hex}"
+    if not await redis_mod.call("live_lease", client.set(
+            _lease_key(code), token, nx=True, px=int(_CONTROLLER_LEASE * 1000))):
+        return False
+    if room.phase != "lobby":
+        logger.warning("Live room %s lost its controller — resuming at question %d.", code, room.index + 1)
+        metrics.LIVE_EVENTS.inc("resumed")
+    RoomController(room, token).start()
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Controller
+# ---------------------------------------------------------------------------
+
+class _LeaseLost(Exception):
+    """Another process took the room over (this one stopped renewing in time)."""
+
+
+class RoomController:
+    """Paces one room from its first (or current) question to the final write."""
+
+    def __init__(self, room: Room, token: str):
+        self.room = room
+        self.token = token
+        self._advance = asyncio.Event()
+        self._ending = False
+        self._finishing = False
+        self._renewed = time.monotonic()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        hub = get_hub()
+        hub.controllers[self.room.code] = self
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        self._task.add_done_callback(lambda _: hub.controllers.pop(self.room.code, None))
+
+    async def stop(self) -> None:
+        """Cancel at shutdown and wait while the quiz is ended with the answers so far."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def command(self, command: str) -> None:
+        if command == "end":
+            self._ending = True
+        if command in ("next", "end"):
+            self._advance.set()
+
+    async def _run(self) -> None:
+        room, hub = self.room, get_hub()
+        room_key = _keys(room.code)[0]
+        reveal_seconds = _settings().live_reveal_seconds
+        # A resumed room re-opens the question that was open, or moves past the one revealed
+        first = max(room.index, 0) if room.phase != "reveal" else room.index + 1
+        reopen = room.phase == "question"
+        try:
+            for index in range(first, len(room.questions)):
+                if self._ending:
+                    break
+                question = room.questions[index]
+                room.phase, room.index = "question", index
+                room.deadline = time.time() + room.question_seconds
+                fields = {"phase": "question", "i": index, "d": repr(room.deadline), "ci": question.correct_index}
+                if not (reopen and index == first):
+                    fields["c"] = 0  # a re-opened question keeps the answers already counted
+                pipe = _client().pipeline(transaction=True)
+                pipe.hset(room_key, mapping=fields)
+                pipe.expire(_keys(room.code)[2], _ROOM_TTL)
+                await redis_mod.call("live_phase", pipe.execute())
+                await hub.publish(room.code, room.question_message())
+                await self._wait(room.deadline, progress=True)
+
+                room.phase = "reveal"
+                await redis_mod.call("live_phase", _client().hset(room_key, "phase", "reveal"))
+                await hub.publish(room.code, {
+                    "type": "reveal",
+                    "index": index,
+                    "correct_index": question.correct_index,
+                    "explanation": question.explanation,
+                    "leaderboard": await leaderboard(room.code),
+                    "ts": time.time(),
+                })
+                if index < len(room.questions) - 1 and not self._ending:
+                    await self._wait(time.time() + reveal_seconds, progress=False)
+            await self._finish()
+        except _LeaseLost:
+            logger.warning("Live room %s was taken over by another process.", room.code)
+            return
+        except asyncio.CancelledError:
+            if not self._finishing:
+                logger.warning("Live room %s stopped at shutdown — ending it with the answers so far.", room.code)
+                await self._end_on_error()
+            raise
+        except Exception:
+            logger.exception("Live room %s failed", room.code)
+            await self._end_on_error()
+        finally:
+            try:
+                await redis_mod.call("live_lease", _script(_client(), _LEASE_LUA)(
+                    keys=[_lease_key(room.code)], args=[self.token, 0]))
+            except Exception:
+                pass  # it runs out on its own
+
+    async def _end_on_error(self) -> None:
+        """Write what was answered and tell everyone the quiz is over; failing that, that it stopped."""
+        if not self._finishing:
+            try:
+                await self._finish()
+                return
+            except Exception:
+                logger.exception("Live room %s could not be finished", self.room.code)
+        try:
+            await get_hub().publish(self.room.code, {"type": "error", "detail": "The live quiz stopped unexpectedly."})
+        except Exception:
+            pass
+
+    async def _renew(self) -> None:
+        if time.monotonic() - self._renewed < _CONTROLLER_LEASE / 3:
+            return
+        renewed = await redis_mod.call("live_lease", _script(_client(), _LEASE_LUA)(
+            keys=[_lease_key(self.room.code)], args=[self.token, int(_CONTROLLER_LEASE * 1000)]))
+        if not renewed:
+            raise _LeaseLost(self.room.code)
+        self._renewed = time.monotonic()
+
+    async def _wait(self, until: float, progress: bool) -> None:
+        """Until `until`, a host "next" / "end", or — with progress — every player has answered."""
+        room = self.room
+        while True:
+            await self._renew()
+            remaining = until - time.time()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._advance.wait(), min(remaining, _PROGRESS_INTERVAL))
+                self._advance.clear()
+                return
+            except asyncio.TimeoutError:
+                pass
+            if progress:
+                pipe = _client().pipeline(transaction=False)
+                pipe.hget(_keys(room.code)[0], "c")
+                pipe.hlen(_keys(room.code)[1])
+                answered, players = await redis_mod.call("live_progress", pipe.execute())
+                answered = int(answered or 0)
+                if players and answered >= players:
+                    return
+                await get_hub().publish(room.code, {
+                    "type": "progress", "index": room.index, "answered": answered, "players": players,
+                    "ts": time.time(),
+                })
+
+    async def _finish(self) -> None:
+        """Grade everyone, write all attempts in one statement, announce the results."""
+        from app.core.database import get_pool, mark_write
+        from app.quiz import item_stats
+        from app.quiz.scoring import grade
+
+        room = self.room
+        room_key, players_key, answers_key, board_key = _keys(room.code)
+        self._finishing = True
+        room.phase = "ended"
+        client = _client()
+        pipe = client.pipeline(transaction=True)
+        pipe.hset(room_key, "phase", "ended")
+        pipe.hkeys(players_key)
+        pipe.hgetall(answers_key)
+        _, players, saved = await redis_mod.call("live_finish", pipe.execute())
+
+        total = len(room.questions)
+        ids, user_ids, answer_lists, scores, correct = [], [], [], [], {}
+        for user_id in players:
+            answers = [saved.get(f"{user_id}:{i}") for i in range(total)]
+            answers = [int(a) if a is not None else None for a in answers]
+            graded = grade(room.questions, answers)
+            item_stats.record(room.subject, room.difficulty, room.questions, answers)
+            correct[user_id] = graded.correct
+            ids.append(uuid.uuid4())
+            user_ids.append(uuid.UUID(user_id))
+            answer_lists.append(json.dumps(answers))
+            scores.append(graded.score)
+
+        stored = 0
+        if ids:
+            rows = await get_pool().fetch(
+                """
+                INSERT INTO quiz_attempts (id, user_id, subject, difficulty, questions, answers, score)
+                SELECT a.id, a.user_id, $1, $2, $3::jsonb, a.answers::jsonb, a.score
+                FROM unnest($4::uuid[], $5::uuid[], $6::text[], $7::float8[]) AS a(id, user_id, answers, score)
+                JOIN profiles p ON p.id = a.user_id
+                RETURNING user_id
+                """,
+                room.subject,
+                room.difficulty,
+                QuizQuestionList.dump_json(room.questions).decode(),
+                ids,
+                user_ids,
+                answer_lists,
+                scores,
+            )
+            stored = len(rows)
+            await mark_write(*(str(row["user_id"]) for row in rows))
+        metrics.LIVE_EVENTS.inc("finished")
+        logger.info("Live room %s ended: %d players, %d attempts stored", room.code, len(players), stored)
+
+        # Everyone gets the top of the board; only the host gets every player's result
+        standings = await leaderboard(room.code, limit=None)
+        for entry in standings:
+            entry["correct"] = correct.get(entry["user_id"], 0)
+            entry["total"] = total
+        hub = get_hub()
+        await hub.publish(room.code, {"type": "results", "standings": standings, "ts": time.time()}, hosts_only=True)
+        await hub.publish(room.code, {
+            "type": "ended", "leaderboard": standings[:_LEADERBOARD_SIZE], "players": len(players), "ts": time.time(),
+        })
+
+        pipe = client.pipeline(transaction=False)
+        for key in (room_key, players_key, answers_key, board_key):
+            pipe.expire(key, _ENDED_TTL)
+        await redis_mod.call("live_finish", pipe.execute())
@@ -0,0 +1,207 @@
+"""
+Live classroom API router.
+- POST /live              — (teachers) generate one quiz and open a room for it
+- GET  /live/{code}       — room status and leaderboard
+- WS   /live/{code}/ws    — the room itself, for the host and every player
+
+Socket messages are JSON objects with a "type":
+- client → server: host sends {"type": "start"}, {"type": "next"} (close the
+  question / move on now) or {"type": "end"}; players send
+  {"type": "answer", "index": 0, "answer": 2} — the first answer counts
+- server → client: "welcome" (current state, on connect), "joined" (host
+  only), "question" (no answer in it), "progress", "reveal" (correct answer
+  and leaderboard), "ended" (final leaderboard), "results" (host only: every
+  player's points and correct count), "answer_ack", "error"
+
+Sockets authenticate with the subprotocols ["bearer", <access token>]
+(`new WebSocket(url, ["bearer", token])` in a browser); the server picks
+"bearer".
+
+Broadcasts carry "ts", the server time they were sent.
+"""
+from __future__ import annotations
+
+import json
+import time
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+
+from app.auth.dependencies import get_current_user, require_teacher
+from app.auth.middleware import WS_AUTH_PROTOCOL
+from app.core.rate_limiter import check_rate_limit
+from app.core.responses import FastJSONResponse
+from app.live import rooms
+from app.live.hub import Connection, LiveUnavailableError, get_hub
+from app.live.models import CreateRoomRequest, RoomResponse
+from app.quiz.generator import generate_quiz
+from app.quiz.llm_gateway import provider_from_settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/live", tags=["Live"])
+
+
+async def _room_response(room: rooms.Room, user_id: str) -> RoomResponse:
+    return RoomResponse(
+        code=room.code,
+        subject=room.subject,
+        difficulty=room.difficulty,
+        source=room.source,
+        total=len(room.questions),
+        question_seconds=room.question_seconds,
+        phase=room.phase,
+        index=room.index,
+        players=await rooms.player_count(room.code),
+        leaderboard=await rooms.leaderboard(room.code) if room.phase != "lobby" else [],
+        you=await rooms.standing(room.code, user_id),
+        socket_path=f"/live/{room.code}/ws",
+    )
+
+
+# --------------------------------------------------------------------------
+# POST /live
+# --------------------------------------------------------------------------
+
+@router.post("", response_model=RoomResponse, status_code=status.HTTP_201_CREATED)
+async def create_room_endpoint(
+    body: CreateRoomRequest,
+    host_id: str = Depends(require_teacher),
+):
+    """Generate the quiz once for the whole class; players join with the returned code."""
+    from app.core.config import settings
+    quota = await check_rate_limit(host_id, limit=settings.quiz_rate_limit)
+
+    try:
+        questions, source = await generate_quiz(provider_from_settings(), body.subject, body.difficulty, body.count)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc))
+    try:
+        room = await rooms.create(host_id, body.subject, body.difficulty.value, questions, source,
+                                  body.question_seconds or settings.live_question_seconds)
+        response = await _room_response(room, host_id)
+    except LiveUnavailableError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Live classrooms are temporarily unavailable.")
+    return FastJSONResponse(response, status_code=status.HTTP_201_CREATED, headers=quota.headers())
+
+
+# --------------------------------------------------------------------------
+# GET /live/{code}
+# --------------------------------------------------------------------------
+
+@router.get("/{code}", response_model=RoomResponse)
+async def room_status_endpoint(code: str, user_id: str = Depends(get_current_user)):
+    try:
+        room = await rooms.load(code.upper())
+        if room is None:
+            raise HTTPException(status_code=404, detail="Live quiz not found.")
+        return FastJSONResponse(await _room_response(room, user_id))
+    except LiveUnavailableError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Live classrooms are temporarily unavailable.")
+
+
+# --------------------------------------------------------------------------
+# WS /live/{code}/ws
+# --------------------------------------------------------------------------
+
+@router.websocket("/{code}/ws")
+async def room_socket(websocket: WebSocket, code: str):
+    from app.core.config import settings
+
+    user_id: str = websocket.state.user_id  # set by JWTAuthMiddleware
+    code = code.upper()
+    hub = get_hub()
+    try:
+        room = await rooms.load(code)
+        if room is None:
+            await websocket.close(code=1008, reason="Live quiz not found.")
+            return
+        if room.phase == "ended":
+            await websocket.close(code=1008, reason="This live quiz has ended.")
+            return
+        is_host = user_id == room.host
+        players = await rooms.player_count(code) if is_host else await rooms.join(code, user_id)
+    except rooms.RoomFullError:
+        await websocket.close(code=1013, reason="This live quiz is full.")
+        return
+    except LiveUnavailableError:
+        await websocket.close(code=1013, reason="Live classrooms are temporarily unavailable.")
+        return
+    if not await hub.wait_ready():
+        await websocket.close(code=1013, reason="Live classrooms are temporarily unavailable.")
+        return
+
+    # Browsers drop a socket whose handshake does not pick one of the offered subprotocols
+    offered = websocket.scope.get("subprotocols") or []
+    await websocket.accept(subprotocol=WS_AUTH_PROTOCOL if WS_AUTH_PROTOCOL in offered else None)
+    conn = Connection(websocket, user_id, is_host, settings.live_send_queue)
+    hub.add(code, conn)
+    hub.send(conn, {
+        "type": "welcome",
+        "code": code,
+        "role": "host" if is_host else "player",
+        "phase": room.phase,
+        "index": room.index,
+        "total": len(room.questions),
+        "players": players,
+        "question": room.question_message() if room.phase == "question" else None,
+        "ts": time.time(),
+    })
+    if not is_host:
+        await hub.publish(code, {"type": "joined", "players": players, "ts": time.time()}, hosts_only=True)
+    if room.phase in ("question", "reveal"):
+        # Reconnecting after the controller's process died: carry on here
+        try:
+            await rooms.resume(code)
+        except LiveUnavailableError:
+            pass
+
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                kind = message["type"]
+            except (ValueError, TypeError, KeyError):
+                hub.send(conn, {"type": "error", "detail": "Expected a JSON object with a \"type\"."})
+                continue
+            try:
+                if is_host:
+                    await _host_command(conn, room, kind)
+                elif kind == "answer":
+                    await _player_answer(conn, code, message)
+                else:
+                    hub.send(conn, {"type": "error", "detail": f"Unknown message type {kind!r}."})
+            except LiveUnavailableError:
+                hub.send(conn, {"type": "error", "detail": "Live classrooms are temporarily unavailable."})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.remove(code, conn)
+
+
+async def _host_command(conn: Connection, room: rooms.Room, kind: str) -> None:
+    hub = get_hub()
+    if kind == "start":
+        if not await rooms.start(room.code):
+            hub.send(conn, {"type": "error", "detail": "Already started."})
+    elif kind in ("next", "end"):
+        await rooms.resume(room.code)
+        await rooms.control(room.code, kind)
+    else:
+        hub.send(conn, {"type": "error", "detail": f"Unknown message type {kind!r}."})
+
+
+async def _player_answer(conn: Connection, code: str, message: dict) -> None:
+    hub = get_hub()
+    index, choice = message.get("index"), message.get("answer")
+    if type(index) is not int or type(choice) is not int or not 0 <= choice <= 3:
+        hub.send(conn, {"type": "error", "detail": "An answer needs an integer index and an answer in [0, 3]."})
+        return
+    try:
+        await rooms.answer(code, conn.user_id, index, choice)
+    except rooms.AnswerRejectedError as exc:
+        hub.send(conn, {"type": "answer_ack", "index": index, "accepted": False, "detail": str(exc)})
+        return
+    hub.send(conn, {"type": "answer_ack", "index": index, "accepted": True})
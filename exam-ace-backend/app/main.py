@@ -4,11 +4,24 @@ ExamAce Backend — FastAPI application entry point.
 Registers:
   - JWT auth middleware (rejects unauthenticated requests globally)
   - CORS
-  - Lifespan events (DB pool, Redis connection)
+  - Prometheus metrics middleware + /metrics
+  - Optional Server-Timing spans and slow-request profiler
+  - Lifespan events (DB pool, Redis connection, JWKS refresh, quiz session auto-submit,
+    search index refresh, question stats flush, write spool replay)
   - All API routers
+
+FAST_BOOT=true (scale-to-zero hosting) connects the DB, Redis and the JWKS
+concurrently, waits for the first key set, and runs a query on every pooled
+connection before accepting traffic.  Either way the time spent in each
+startup phase is logged and exported as examace_startup_phase_seconds.
 """
 from __future__ import annotations
 
+import time
+
+_IMPORT_START = time.perf_counter()
+
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
@@ -24,12 +37,76 @@ async def lifespan(app: FastAPI):
     from app.core.config import settings
     from app.core.database import init_db, close_db
     from app.core.redis import init_redis, close_redis
+    from app.auth.jwks import get_jwks_cache, close_jwks
+    from app.core.rate_limiter import close_rate_limiter
+    from app.quiz.sessions import start_expiry_worker, close_expiry_worker
+    from app.quiz.bulk import close_jobs
+    from app.admin.rescore import close_jobs as close_rescore_jobs
+    from app.live.hub import close_hub
+    from app.quiz.search import start_search_index, close_search_index
+    from app.quiz.item_stats import start_item_stats, close_item_stats
+    from app.quiz.spool import start_spool, close_spool
+
+    from app.core.metrics import STARTUP_PHASES
 
     logger.info("Starting ExamAce backend …")
-    await init_db(settings.database_url)
-    await init_redis(settings.redis_url)
-    logger.info("Database and Redis ready.")
+    start = time.perf_counter()
+    STARTUP_PHASES["import"] = _IMPORT_END - _IMPORT_START
+
+    async def timed(phase: str, coro) -> None:
+        phase_start = time.perf_counter()
+        try:
+            await coro
+        finally:
+            STARTUP_PHASES[phase] = time.perf_counter() - phase_start
+
+    if settings.fast_boot:
+        from app.core.database import prewarm_pools
+        from app.auth.jwks import JWKSUnavailableError
+
+        async def db_and_prewarm() -> None:
+            await timed("db", init_db(settings.database_url, replica_dsn=settings.database_replica_url))
+            await timed("prewarm", prewarm_pools())
+
+        async def first_jwks() -> None:
+            cache = get_jwks_cache(settings.supabase_url)
+            cache.start()  # the refresh loop joins the fetch below instead of repeating it
+            try:
+                await cache.refresh()
+            except JWKSUnavailableError:
+                pass  # the refresh loop logs and retries
+
+        # JWKS first: building its HTTP client is CPU-bound, the rest is mostly waiting
+        await asyncio.gather(timed("jwks", first_jwks()), db_and_prewarm(),
+                             timed("redis", init_redis(settings.redis_url)))
+    else:
+        await timed("db", init_db(settings.database_url, replica_dsn=settings.database_replica_url))
+        await timed("redis", init_redis(settings.redis_url))
+        get_jwks_cache(settings.supabase_url).start()
+    STARTUP_PHASES["total"] = STARTUP_PHASES["import"] + time.perf_counter() - start
+    logger.info("Database and Redis ready (%s).",
+                ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in STARTUP_PHASES.items()))
+    start_expiry_worker()
+    start_search_index()
+    start_item_stats()
+    start_spool()
+    metrics_server = None
+    if settings.metrics_port is not None:
+        from app.core.metrics import start_metrics_server
+        metrics_server = await start_metrics_server(settings.metrics_host, settings.metrics_port)
     yield
+    if metrics_server is not None:
+        metrics_server.close()
+        await metrics_server.wait_closed()
+    await close_jwks()
+    await close_expiry_worker()
+    await close_jobs()
+    await close_rescore_jobs()
+    await close_hub()
+    await close_search_index()
+    await close_item_stats()
+    await close_spool()
+    await close_rate_limiter()
     await close_db()
     await close_redis()
     logger.info("Shutdown complete.")
@@ -57,18 +134,45 @@ def create_app() -> FastAPI:
 
     # --- Auth middleware ---
     from app.auth.middleware import JWTAuthMiddleware
-    app.add_middleware(JWTAuthMiddleware, jwt_secret=settings.supabase_jwt_secret, supabase_url=settings.supabase_url)
+    app.add_middleware(
+        JWTAuthMiddleware,
+        jwt_secret=settings.supabase_jwt_secret,
+        supabase_url=settings.supabase_url,
+        token_cache_size=settings.jwt_cache_size,
+        metrics_token=settings.metrics_token,
+    )
+
+    # --- Server-Timing spans / slow-request profiler (opt-in) ---
+    if settings.server_timing or settings.profile_slow_requests_ms:
+        from app.core.tracing import TimingMiddleware
+        app.add_middleware(
+            TimingMiddleware,
+            server_timing=settings.server_timing,
+            slow_ms=settings.profile_slow_requests_ms,
+            sample_interval_ms=settings.profile_sample_interval_ms,
+            profile_dir=settings.profile_dir,
+        )
+
+    # --- Metrics (outermost, so auth rejections are timed too) ---
+    from app.core.metrics import MetricsMiddleware, metrics_endpoint
+    app.add_middleware(MetricsMiddleware)
+    if settings.metrics_port is None and settings.metrics_token:
+        app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
 
     # --- Routers ---
     from app.quiz.router import router as quiz_router
     from app.settings.router import router as settings_router
     from app.users.router import router as users_router
     from app.analytics.router import router as analytics_router
+    from app.live.router import router as live_router
+    from app.admin.router import router as admin_router
 
     app.include_router(quiz_router)
     app.include_router(settings_router)
     app.include_router(users_router)
     app.include_router(analytics_router)
+    app.include_router(live_router)
+    app.include_router(admin_router)
 
     # --- Health check (public) ---
     @app.get("/health", tags=["Health"])
@@ -79,3 +183,4 @@ def create_app() -> FastAPI:
 
 
 app = create_app()
+_IMPORT_END = time.perf_counter()
@@ -0,0 +1,184 @@
+"""
+Bulk quiz generation — one variant per student for a class or cohort.
+
+A job generates a shared question pool once (concurrent LLM calls of up to
+30 questions, topped up from the fallback bank), then builds each student's
+variant from it: a seeded sample of `count` questions in shuffled order,
+with shuffled options.  Every variant is inserted as that student's
+quiz_attempts row in one INSERT … SELECT FROM unnest(); students without a
+profile row are skipped and reported.  Students open their quiz through
+GET /quiz/{quiz_id}/session.
+
+Jobs run as background tasks in the process that accepted them (at most
+_MAX_CONCURRENT_JOBS at a time) through a JobRegistry, which mirrors their
+status to Redis (`bulkjob:{job_id}`) so any worker can answer
+GET /quiz/bulk/{job_id}.
+"""
+from __future__ import annotations
+
+import re
+import time
+import uuid
+import random
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from functools import partial
+
+from pydantic_core import to_json
+
+from app.core.jobs import JobRegistry
+from app.quiz.fallback_questions import get_fallback_questions
+from app.quiz.generator import generate_quiz
+from app.quiz.llm_gateway import LLMProvider
+from app.quiz.models import Difficulty, QuizQuestion
+
+logger = logging.getLogger(__name__)
+
+_MAX_CONCURRENT_JOBS = 2
+_MAX_LLM_BATCH = 30  # GenerateRequest's upper bound, which the prompt is tuned for
+_MAX_LOCAL_JOBS = 1000
+
+# "All of the above" and friends only make sense in their original position
+_ORDER_SENSITIVE = re.compile(r"\b(all|none|both|neither) of the (above|options)\b", re.IGNORECASE)
+
+
+@dataclass
+class BulkJob:
+    job_id: str
+    teacher_id: str
+    subject: str
+    difficulty: str
+    count: int
+    pool_size: int
+    students_total: int
+    status: str = "queued"  # queued → generating → assembling → storing → done | failed
+    pool_generated: int = 0
+    source: str | None = None
+    variants_built: int = 0
+    stored: int = 0
+    missing_students: list[str] = field(default_factory=list)
+    quizzes: dict[str, str] = field(default_factory=dict)  # student_id -> quiz_id
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+
+_jobs = JobRegistry(
+    "bulk", BulkJob, concurrency=_MAX_CONCURRENT_JOBS, max_local=_MAX_LOCAL_JOBS,
+    summary=lambda job: (f"{job.stored}/{job.students_total} quizzes stored "
+                         f"({job.source} pool of {job.pool_generated})"),
+)
+
+
+async def get_job(job_id: str) -> BulkJob | None:
+    return await _jobs.get(job_id)
+
+
+def submit(provider: LLMProvider, teacher_id: str, subject: str, difficulty: Difficulty, count: int,
+           pool_size: int, student_ids: list[str]) -> BulkJob:
+    """Register the job and start it in the background."""
+    job = BulkJob(job_id=str(uuid.uuid4()), teacher_id=teacher_id, subject=subject,
+                  difficulty=difficulty.value, count=count, pool_size=pool_size,
+                  students_total=len(student_ids))
+    return _jobs.start(job, partial(_run, job, provider, student_ids))
+
+
+async def _run(job: BulkJob, provider: LLMProvider, student_ids: list[str]) -> None:
+    job.status = "generating"
+    await _jobs.publish(job)
+    pool = await _question_pool(job, provider)
+
+    job.status = "assembling"
+    await _jobs.publish(job)
+    quiz_ids = {sid: uuid.uuid4() for sid in student_ids}
+    variants = []
+    for sid in student_ids:
+        variants.append(to_json(build_variant(pool, job.count, f"{job.job_id}:{sid}")).decode())
+        job.variants_built += 1
+
+    job.status = "storing"
+    await _jobs.publish(job)
+    await _store(job, student_ids, quiz_ids, variants)
+
+
+async def _question_pool(job: BulkJob, provider: LLMProvider) -> list[QuizQuestion]:
+    """`pool_size` distinct questions: concurrent LLM batches, then the fallback bank."""
+    difficulty = Difficulty(job.difficulty)
+    batches = [_MAX_LLM_BATCH] * (job.pool_size // _MAX_LLM_BATCH)
+    if job.pool_size % _MAX_LLM_BATCH:
+        batches.append(max(3, job.pool_size % _MAX_LLM_BATCH))
+
+    pool: dict[str, QuizQuestion] = {}
+    sources = set()
+
+    async def batch(size: int) -> None:
+        questions, source = await generate_quiz(provider, job.subject, difficulty, size)
+        sources.add(source)
+        for q in questions:
+            pool.setdefault(q.question.strip().lower(), q)
+        job.pool_generated = len(pool)
+
+    await asyncio.gather(*(batch(size) for size in batches))
+
+    if len(pool) < job.pool_size:
+        try:
+            for q in get_fallback_questions(job.subject, difficulty, job.pool_size):
+                if len(pool) >= job.pool_size:
+                    break
+                if pool.setdefault(q.question.strip().lower(), q) is q:
+                    sources.add("practice_bank")
+        except RuntimeError:
+            pass
+    job.pool_generated = len(pool)
+    job.source = "+".join(sorted(sources))
+    if len(pool) < job.count:
+        raise RuntimeError(f"Only {len(pool)} distinct questions available, {job.count} needed per quiz.")
+    return list(pool.values())
+
+
+def build_variant(pool: list[QuizQuestion], count: int, seed: str) -> list[dict]:
+    """A reproducible per-student quiz: sampled, reordered, options shuffled."""
+    rng = random.Random(seed)
+    variant = []
+    for q in rng.sample(pool, count):
+        order = list(range(4))
+        if not any(_ORDER_SENSITIVE.search(option) for option in q.options):
+            rng.shuffle(order)
+        variant.append({
+            "question": q.question,
+            "options": [q.options[i] for i in order],
+            "correct_index": order.index(q.correct_index),
+            "explanation": q.explanation,
+        })
+    return variant
+
+
+async def _store(job: BulkJob, student_ids: list[str], quiz_ids: dict[str, uuid.UUID],
+                 variants: list[str]) -> None:
+    """All variants in one statement; rows for students without a profile are dropped."""
+    from app.core.database import get_pool, mark_write
+
+    rows = await get_pool().fetch(
+        """
+        INSERT INTO quiz_attempts (id, user_id, subject, difficulty, questions)
+        SELECT a.id, a.user_id, $1, $2, a.questions::jsonb
+        FROM unnest($3::uuid[], $4::uuid[], $5::text[]) AS a(id, user_id, questions)
+        JOIN profiles p ON p.id = a.user_id
+        RETURNING id, user_id
+        """,
+        job.subject,
+        job.difficulty,
+        [quiz_ids[sid] for sid in student_ids],
+        [uuid.UUID(sid) for sid in student_ids],
+        variants,
+    )
+    job.quizzes = {str(row["user_id"]): str(row["id"]) for row in rows}
+    job.stored = len(rows)
+    job.missing_students = [sid for sid in student_ids if sid not in job.quizzes]
+    await mark_write(*job.quizzes)
+
+
+async def close_jobs() -> None:
+    """Cancel running jobs at shutdown."""
+    await _jobs.close()
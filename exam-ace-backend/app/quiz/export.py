@@ -0,0 +1,172 @@
+"""
+Streaming export of a user's complete quiz history, as NDJSON or CSV.
+
+- Rows come from a server-side cursor inside a read-only REPEATABLE READ
+  transaction: one consistent snapshot, fetched EXPORT_FETCH_ROWS at a time,
+  so memory stays flat however many attempts the user has
+- Rows are encoded into chunks of about _CHUNK_BYTES and yielded to the
+  StreamingResponse.  Each chunk is only produced once the previous one has
+  been sent, and the ASGI server's send() waits while the client is not
+  reading — a slow download slows the cursor down instead of piling up
+- With include_questions, each attempt carries its stored questions and
+  answers, copied from Postgres's JSON text without being parsed
+- The connection is taken when streaming starts and given back when it ends
+  or the client goes away.  At most EXPORT_MAX_CONCURRENT exports run per
+  process, since each holds a pool connection for its whole duration; the
+  slot is taken when the request is accepted, before the response starts,
+  and given back when the stream ends or the response finishes unread.
+"""
+from __future__ import annotations
+
+import io
+import csv
+import uuid
+import logging
+from datetime import datetime, timezone
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from starlette.background import BackgroundTask
+
+from app.core import metrics
+from app.quiz.models import ExportFormat
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_BYTES = 64 * 1024
+
+_COLUMNS = ("id", "subject", "difficulty", "score", "created_at")
+
+_QUERY = """
+SELECT id, subject, difficulty, score, created_at{extra}
+FROM quiz_attempts
+WHERE user_id = $1::uuid
+ORDER BY created_at, id
+"""
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+_active = 0  # exports accepted and not yet finished in this process
+
+
+class _Slot:
+    """One of the EXPORT_MAX_CONCURRENT places, given back once by whichever path ends the export."""
+
+    __slots__ = ("held",)
+
+    def __init__(self) -> None:
+        global _active
+        _active += 1
+        self.held = True
+
+    def release(self) -> None:
+        global _active
+        if self.held:
+            self.held = False
+            _active -= 1
+
+
+def _base(row) -> dict:
+    return {
+        "id": str(row["id"]),
+        "subject": row["subject"],
+        "difficulty": row["difficulty"],
+        "score": row["score"],
+        "created_at": row["created_at"].isoformat(),
+    }
+
+
+def _ndjson(row, include_questions: bool) -> bytes:
+    line = to_json(_base(row))
+    if include_questions:
+        # Splice the stored JSON in as-is rather than parsing and re-encoding it
+        line = b"".join((line[:-1], b',"questions":', row["questions"].encode(),
+                         b',"answers":', (row["answers"] or "null").encode(), b"}"))
+    return line + b"\n"
+
+
+class _CSVRows:
+    def __init__(self, include_questions: bool):
+        self.include_questions = include_questions
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def header(self) -> bytes:
+        self.writer.writerow(_COLUMNS + (("questions", "answers") if self.include_questions else ()))
+        return self._take()
+
+    def encode(self, row) -> bytes:
+        values = [row["id"], row["subject"], row["difficulty"], row["score"], row["created_at"].isoformat()]
+        if self.include_questions:
+            values += [row["questions"], row["answers"]]
+        self.writer.writerow(values)
+        return self._take()
+
+    def _take(self) -> bytes:
+        data = self.buffer.getvalue().encode()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+async def stream_history(pool, user_id: str, fmt: str, include_questions: bool, slot: _Slot | None = None):
+    """Async iterator of encoded chunks: every attempt of `user_id`, oldest first; releases `slot` at the end."""
+    from app.core.config import settings
+
+    metrics.EXPORT_EVENTS.inc("started")
+    query = _QUERY.format(extra=", questions, answers" if include_questions else "")
+    encoder = _CSVRows(include_questions) if fmt == "csv" else None
+    rows = 0
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                chunk = [encoder.header()] if encoder else []
+                size = sum(map(len, chunk))
+                async for row in conn.cursor(query, uuid.UUID(user_id), prefetch=settings.export_fetch_rows):
+                    data = encoder.encode(row) if encoder else _ndjson(row, include_questions)
+                    chunk.append(data)
+                    size += len(data)
+                    rows += 1
+                    if size >= _CHUNK_BYTES:
+                        yield b"".join(chunk)
+                        chunk, size = [], 0
+                if chunk:
+                    yield b"".join(chunk)
+        metrics.EXPORT_EVENTS.inc("completed")
+        logger.info("Exported %d attempts for user %s as %s", rows, user_id, fmt)
+    except BaseException:
+        # Usually the client went away; the transaction is rolled back and the
+        # connection released on the way out
+        metrics.EXPORT_EVENTS.inc("aborted")
+        logger.info("Export for user %s stopped after %d attempts", user_id, rows)
+        raise
+    finally:
+        if slot is not None:
+            slot.release()
+
+
+async def streaming_response(user_id: str, fmt: ExportFormat, include_questions: bool) -> StreamingResponse:
+    """The export as a download; 429 while EXPORT_MAX_CONCURRENT exports are already running."""
+    from app.core.config import settings
+    from app.core.database import get_read_pool
+
+    if _active >= settings.export_max_concurrent:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail="Too many exports running — try again shortly.",
+                            headers={"Retry-After": "5"})
+    # Reserved now, not when the body starts streaming, so a burst cannot get past the check
+    slot = _Slot()
+    try:
+        pool = await get_read_pool(user_id)
+    except BaseException:
+        slot.release()
+        raise
+    filename = f"examace-history-{datetime.now(timezone.utc):%Y%m%d}.{fmt.value}"
+    return StreamingResponse(
+        stream_history(pool, user_id, fmt.value, include_questions, slot),
+        media_type=MEDIA_TYPES[fmt.value],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        # Also runs when the client left before the body was read
+        background=BackgroundTask(slot.release),
+    )
@@ -1,6 +1,10 @@
 """
 Fallback question bank — curated questions used when the local LLM is unreachable.
 Organized by subject × difficulty. Randomly samples `count` questions.
+
+Importing this module only stores the raw dicts (constants from the compiled
+.pyc); QuizQuestion models for a subject × difficulty are built the first time
+that group is served, so the bank costs nothing at boot.
 """
 from __future__ import annotations
 
@@ -14,12 +18,28 @@ logger = logging.getLogger(__name__)
 # Question Bank — keyed by (subject_lowercase, difficulty)
 # ---------------------------------------------------------------------------
 
-_BANK: dict[tuple[str, Difficulty], list[QuizQuestion]] = {}
+_RAW: dict[tuple[str, Difficulty], list[dict]] = {}
+_BANK: dict[tuple[str, Difficulty], list[QuizQuestion]] = {}  # materialized on demand
 
 
 def _add(subject: str, difficulty: Difficulty, questions: list[dict]) -> None:
-    key = (subject.lower(), difficulty)
-    _BANK[key] = [QuizQuestion(**q) for q in questions]
+    _RAW[(subject.lower(), difficulty)] = questions
+
+
+def _questions(key: tuple[str, Difficulty]) -> list[QuizQuestion]:
+    questions = _BANK.get(key)
+    if questions is None:
+        raw = _RAW.get(key)
+        if not raw:
+            return []
+        questions = _BANK[key] = [QuizQuestion(**q) for q in raw]
+    return questions
+
+
+def preload() -> None:
+    """Materialize every group now (app.server does this before forking workers)."""
+    for key in _RAW:
+        _questions(key)
 
 
 # ===== COMPUTER SCIENCE =====
@@ -158,31 +178,39 @@ _add("general knowledge", Difficulty.advanced, [
 # Public API
 # ---------------------------------------------------------------------------
 
+def all_questions():
+    """Every question in the bank, as (subject, difficulty, question)."""
+    for key in _RAW:
+        subject, difficulty = key
+        for q in _questions(key):
+            yield subject.title(), difficulty, q
+
+
 def get_fallback_questions(subject: str, difficulty: Difficulty, count: int) -> list[QuizQuestion]:
     """
     Return `count` randomly sampled questions from the bank.
     Falls back to a broader search if the exact subject isn't found.
     """
     key = (subject.lower(), difficulty)
-    pool = _BANK.get(key)
+    pool = _questions(key)
 
     # If exact subject not found, try a loose match
     if not pool:
-        for (s, d), qs in _BANK.items():
+        for s, d in _RAW:
             if d == difficulty and subject.lower() in s:
-                pool = qs
+                pool = _questions((s, d))
                 break
 
     # Last resort: use general knowledge for the difficulty
     if not pool:
-        pool = _BANK.get(("general knowledge", difficulty), [])
+        pool = _questions(("general knowledge", difficulty))
 
     if not pool:
         # Absolute last resort: grab everything for the difficulty
         pool = []
-        for (_, d), qs in _BANK.items():
+        for s, d in _RAW:
             if d == difficulty:
-                pool.extend(qs)
+                pool.extend(_questions((s, d)))
 
     if len(pool) < count:
         logger.warning("Only %d fallback questions available for %s/%s, requested %d", len(pool), subject, difficulty.value, count)
@@ -5,7 +5,10 @@ Returns (questions, source) where source is "ai" or "practice_bank".
 """
 from __future__ import annotations
 
+import time
 import logging
+from app.core import metrics
+from app.core.tracing import span
 from app.quiz.models import Difficulty, QuizQuestion
 from app.quiz.prompts import SYSTEM_PROMPT, build_user_prompt, TEMPERATURE_MAP
 from app.quiz.llm_gateway import LLMProvider
@@ -35,9 +38,13 @@ async def generate_quiz(
     """
 
     # --- Health check ---
-    is_healthy = await provider.check_health()
+    start = time.perf_counter()
+    with span("llm_health"):
+        is_healthy = await provider.check_health()
+    metrics.LLM_SECONDS.observe(time.perf_counter() - start, "health", "ok" if is_healthy else "unreachable")
     if not is_healthy:
         logger.warning("LLM provider is unreachable — using fallback question bank.")
+        metrics.QUIZ_FALLBACKS.inc("llm_unreachable")
         return get_fallback_questions(subject, difficulty, count), "practice_bank"
 
     # --- LLM generation with retries ---
@@ -46,19 +53,28 @@ async def generate_quiz(
     last_error: Exception | None = None
 
     for attempt in range(1, _MAX_ATTEMPTS + 1):
+        start = time.perf_counter()
+        outcome = "error"
         try:
             logger.info("LLM attempt %d/%d for %s/%s/%d", attempt, _MAX_ATTEMPTS, subject, difficulty.value, count)
-            raw_output = await provider.generate(SYSTEM_PROMPT, user_prompt, temperature)
-            questions = validate_quiz_output(raw_output, count)
+            with span("llm"):
+                raw_output = await provider.generate(SYSTEM_PROMPT, user_prompt, temperature)
+            outcome = "invalid_output"
+            with span("validate"):
+                questions = validate_quiz_output(raw_output, count)
+            outcome = "ok"
             logger.info("LLM attempt %d succeeded — %d valid questions.", attempt, len(questions))
             return questions, "ai"
         except (ValueError, Exception) as exc:
             last_error = exc
             logger.warning("LLM attempt %d failed: %s", attempt, exc)
+        finally:
+            metrics.LLM_SECONDS.observe(time.perf_counter() - start, "generate", outcome)
 
     # --- All LLM attempts exhausted — fall back ---
     logger.error(
         "Quiz generation failed after %d attempts (last error: %s). Falling back to question bank.",
         _MAX_ATTEMPTS, last_error,
     )
+    metrics.QUIZ_FALLBACKS.inc("llm_" + outcome)
     return get_fallback_questions(subject, difficulty, count), "practice_bank"
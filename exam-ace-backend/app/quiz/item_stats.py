@@ -0,0 +1,297 @@
+"""
+Per-question item statistics across all users, kept incrementally.
+
+- Every graded quiz (POST /quiz/submit, session auto-submit, live rooms)
+  adds its questions to an in-process tally: times served, unanswered, and
+  how often each option was picked.  No I/O on the submit path.
+- Every QUESTION_STATS_FLUSH_SECONDS — sooner once QUESTION_STATS_MAX_PENDING
+  questions are waiting — the tally is written with ONE upsert that adds the
+  counts to the question_stats rows.  Rows are sorted by key so concurrent
+  flushes from several workers cannot deadlock; a failed flush is folded
+  back into the tally and retried.
+- A question's row is keyed by its text, its options as a set and its keyed
+  answer (see canonical), so shuffled copies (bulk variants) share a row and
+  pick counts follow the options' canonical, sorted order
+- GET /admin/questions/outliers reads the table (see outliers())
+
+Counts still in the tally when a process dies are lost; the table is for
+spotting bad questions, not an audit log.
+"""
+from __future__ import annotations
+
+import json
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass, field
+
+from app.core import metrics
+from app.quiz.models import QuizQuestion
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def canonical(q: QuizQuestion) -> tuple[str, list[int]]:
+    """
+    The question's item key, and the canonical position of each of its
+    options (position[i] is where option i sits once sorted by text).
+    """
+    order = sorted(range(len(q.options)), key=lambda i: (_normalize(q.options[i]), i))
+    position = [0] * len(order)
+    for pos, i in enumerate(order):
+        position[i] = pos
+    parts = [_normalize(q.question), *(_normalize(q.options[i]) for i in order), str(position[q.correct_index])]
+    return hashlib.sha1("\x1f".join(parts).encode()).hexdigest()[:16], position
+
+
+@dataclass(slots=True)
+class _Tally:
+    question: str
+    options: list[str]  # canonical order
+    correct_index: int  # canonical
+    subject: str
+    difficulty: str
+    served: int = 0
+    unanswered: int = 0
+    picks: list[int] = field(default_factory=lambda: [0, 0, 0, 0])
+
+    def add(self, other: _Tally) -> None:
+        self.served += other.served
+        self.unanswered += other.unanswered
+        for i, n in enumerate(other.picks):
+            self.picks[i] += n
+
+
+_UPSERT = """
+INSERT INTO question_stats AS s (question_hash, question, options, correct_index, subject, difficulty,
+                                 served, unanswered, picks_0, picks_1, picks_2, picks_3)
+SELECT t.key, t.question, t.options::jsonb, t.correct_index, t.subject, t.difficulty,
+       t.served, t.unanswered, t.p0, t.p1, t.p2, t.p3
+FROM unnest($1::text[], $2::text[], $3::text[], $4::int2[], $5::text[], $6::text[],
+            $7::int8[], $8::int8[], $9::int8[], $10::int8[], $11::int8[], $12::int8[])
+     AS t(key, question, options, correct_index, subject, difficulty, served, unanswered, p0, p1, p2, p3)
+ON CONFLICT (question_hash) DO UPDATE SET
+    served = s.served + EXCLUDED.served,
+    unanswered = s.unanswered + EXCLUDED.unanswered,
+    picks_0 = s.picks_0 + EXCLUDED.picks_0,
+    picks_1 = s.picks_1 + EXCLUDED.picks_1,
+    picks_2 = s.picks_2 + EXCLUDED.picks_2,
+    picks_3 = s.picks_3 + EXCLUDED.picks_3,
+    updated_at = now()
+"""
+
+
+class ItemStats:
+    """In-process tally plus the task that flushes it."""
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending: dict[str, _Tally] = {}
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def record(self, subject: str, difficulty: str, questions: list[QuizQuestion],
+               answers: list[int | None]) -> None:
+        for q, answer in zip(questions, answers):
+            key, position = canonical(q)
+            tally = self.pending.get(key)
+            if tally is None:
+                tally = self.pending[key] = _Tally(
+                    question=q.question,
+                    options=[q.options[i] for i in sorted(range(len(q.options)), key=position.__getitem__)],
+                    correct_index=position[q.correct_index],
+                    subject=subject,
+                    difficulty=difficulty,
+                )
+            tally.served += 1
+            if answer is None:
+                tally.unanswered += 1
+            else:
+                tally.picks[position[answer]] += 1
+        if len(self.pending) >= self.max_pending:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        """Write the tally in one statement; returns the number of rows upserted."""
+        from app.core.database import get_pool
+
+        if not self.pending:
+            return 0
+        batch, self.pending = self.pending, {}
+        keys = sorted(batch)
+        rows = [batch[k] for k in keys]
+        try:
+            await get_pool().execute(
+                _UPSERT,
+                keys,
+                [t.question for t in rows],
+                [json.dumps(t.options) for t in rows],
+                [t.correct_index for t in rows],
+                [t.subject for t in rows],
+                [t.difficulty for t in rows],
+                [t.served for t in rows],
+                [t.unanswered for t in rows],
+                *([t.picks[i] for t in rows] for i in range(4)),
+            )
+        except BaseException:
+            # Fold the batch back in; anything recorded meanwhile is added on top
+            for key, tally in batch.items():
+                current = self.pending.get(key)
+                if current is None:
+                    self.pending[key] = tally
+                else:
+                    tally.add(current)
+                    self.pending[key] = tally
+            metrics.ITEM_STATS_ROWS.inc("failed", amount=len(rows))
+            raise
+        metrics.ITEM_STATS_ROWS.inc("flushed", amount=len(rows))
+        return len(rows)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as exc:
+                logger.warning("Question stats flush failed (%d pending): %s", len(self.pending), exc)
+
+    async def close(self) -> None:
+        """Stop the loop and write what is left."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as exc:
+            logger.warning("Final question stats flush failed, %d questions dropped: %s", len(self.pending), exc)
+
+
+_stats: ItemStats | None = None
+
+
+def record(subject: str, difficulty: str, questions: list[QuizQuestion], answers: list[int | None]) -> None:
+    """Count a graded quiz.  A no-op until start_item_stats() (e.g. in CLI tools)."""
+    if _stats is not None:
+        _stats.record(subject, difficulty, questions, answers)
+
+
+def start_item_stats() -> ItemStats:
+    from app.core.config import settings
+
+    global _stats
+    if _stats is None:
+        _stats = ItemStats(settings.question_stats_flush_seconds, settings.question_stats_max_pending)
+        _stats.start()
+    return _stats
+
+
+async def close_item_stats() -> None:
+    global _stats
+    if _stats is not None:
+        await _stats.close()
+        _stats = None
+
+
+# ---------------------------------------------------------------------------
+# Outliers
+# ---------------------------------------------------------------------------
+
+_OUTLIERS = """
+SELECT s.question_hash, s.question, s.options, s.correct_index, s.subject, s.difficulty,
+       s.served, s.unanswered, ARRAY[s.picks_0, s.picks_1, s.picks_2, s.picks_3] AS picks,
+       k.picks AS correct, d.idx AS top_distractor, d.picks AS top_distractor_picks
+FROM question_stats s
+CROSS JOIN LATERAL (
+    SELECT idx, picks FROM (VALUES (0, s.picks_0), (1, s.picks_1), (2, s.picks_2), (3, s.picks_3)) AS o(idx, picks)
+    WHERE idx = s.correct_index
+) k
+CROSS JOIN LATERAL (
+    SELECT idx, picks FROM (VALUES (0, s.picks_0), (1, s.picks_1), (2, s.picks_2), (3, s.picks_3)) AS o(idx, picks)
+    WHERE idx <> s.correct_index
+    ORDER BY picks DESC, idx
+    LIMIT 1
+) d
+WHERE s.served >= $1
+  AND ($5::text IS NULL OR lower(s.subject) = lower($5))
+  AND (
+      ($6::bool AND d.picks > k.picks)
+   OR ($7 AND k.picks >= $2::float8 * s.served)
+   OR ($8 AND k.picks <= $3::float8 * s.served)
+  )
+ORDER BY (d.picks::float8 - k.picks) / s.served DESC, s.served DESC
+LIMIT $4
+"""
+
+FLAGS = ("miskeyed", "too_easy", "too_hard")
+
+
+@dataclass(slots=True)
+class Outlier:
+    question_hash: str
+    question: str
+    options: list[str]
+    correct_index: int
+    subject: str
+    difficulty: str
+    served: int
+    unanswered: int
+    picks: list[int]
+    p_correct: float
+    top_distractor: int
+    flags: list[str]
+
+
+async def outliers(pool, min_served: int, easy: float, hard: float, limit: int,
+                   subject: str | None = None, flags: tuple[str, ...] = FLAGS) -> list[Outlier]:
+    """
+    Questions served at least `min_served` times that look wrong:
+    - miskeyed: a distractor was picked more often than the keyed answer
+    - too_easy: at least `easy` of the answers were right
+    - too_hard: at most `hard` of the answers were right (chance is 0.25)
+    Most suspicious first: by how far the top distractor leads the answer.
+    """
+    rows = await pool.fetch(_OUTLIERS, min_served, easy, hard, limit, subject,
+                            "miskeyed" in flags, "too_easy" in flags, "too_hard" in flags)
+    result = []
+    for row in rows:
+        served, correct = row["served"], row["correct"]
+        p_correct = correct / served
+        found = []
+        if row["top_distractor_picks"] > correct:
+            found.append("miskeyed")
+        if p_correct >= easy:
+            found.append("too_easy")
+        if p_correct <= hard:
+            found.append("too_hard")
+        result.append(Outlier(
+            question_hash=row["question_hash"],
+            question=row["question"],
+            options=json.loads(row["options"]),
+            correct_index=row["correct_index"],
+            subject=row["subject"],
+            difficulty=row["difficulty"],
+            served=served,
+            unanswered=row["unanswered"],
+            picks=list(row["picks"]),
+            p_correct=round(p_correct, 4),
+            top_distractor=row["top_distractor"],
+            flags=found,
+        ))
+    return result
@@ -156,3 +156,15 @@ def get_provider(provider_name: str, api_key: str, base_url: str = "", model: st
         )
     else:
         raise ValueError(f"Unknown LLM provider: {provider_name!r}. Must be 'openai', 'mistral', or 'local'.")
+
+
+def provider_from_settings() -> LLMProvider:
+    """Build the provider from config (deferred import to avoid startup crash during tests)."""
+    from app.core.config import settings
+    return get_provider(
+        settings.llm_provider,
+        settings.llm_api_key,
+        settings.llm_base_url,
+        model=settings.llm_model,
+        health_timeout=settings.llm_health_timeout,
+    )
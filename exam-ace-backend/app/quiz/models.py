@@ -7,7 +7,7 @@ from __future__ import annotations
 import uuid
 from enum import Enum
 from datetime import datetime
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, TypeAdapter, field_validator, model_validator
 
 
 # ---------------------------------------------------------------------------
@@ -20,6 +20,16 @@ class Difficulty(str, Enum):
     advanced = "advanced"
 
 
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class QuizMode(str, Enum):
+    standard = "standard"
+    review = "review"  # questions due in the user's spaced-repetition queue
+
+
 # ---------------------------------------------------------------------------
 # Quiz question (canonical shape returned by LLM and stored in DB)
 # ---------------------------------------------------------------------------
@@ -38,14 +48,26 @@ class QuizQuestion(BaseModel):
         return v
 
 
+# The stored `quiz_attempts.questions` column: one encoder/decoder pass for the
+# whole list instead of model_dump + json.dumps / json.loads + model_validate.
+QuizQuestionList = TypeAdapter(list[QuizQuestion])
+
+
 # ---------------------------------------------------------------------------
 # API request / response models
 # ---------------------------------------------------------------------------
 
 class GenerateRequest(BaseModel):
-    subject: str = Field(..., min_length=1, max_length=200)
-    difficulty: Difficulty
-    count: int = Field(default=10, ge=3, le=30)
+    subject: str | None = Field(default=None, min_length=1, max_length=200)
+    difficulty: Difficulty | None = None
+    count: int = Field(default=10, ge=3, le=30, description="At most this many in review mode")
+    mode: QuizMode = QuizMode.standard
+
+    @model_validator(mode="after")
+    def standard_needs_topic(self) -> GenerateRequest:
+        if self.mode is QuizMode.standard and (self.subject is None or self.difficulty is None):
+            raise ValueError("subject and difficulty are required unless mode is 'review'.")
+        return self
 
 
 class QuizQuestionPublic(BaseModel):
@@ -60,7 +82,47 @@ class GenerateResponse(BaseModel):
     questions: list[QuizQuestionPublic]
     subject: str
     difficulty: Difficulty
-    source: str = Field(default="ai", description="'ai' or 'practice_bank'")
+    source: str = Field(default="ai", description="'ai', 'practice_bank' or 'review'")
+    time_limit: int | None = Field(default=None, description="Minutes, from the user's settings")
+    auto_submit: bool = False
+    expires_at: datetime | None = Field(default=None, description="When the time limit runs out")
+    resumable: bool = Field(default=False, description="Answers can be autosaved and resumed")
+
+
+class ReviewQueueResponse(BaseModel):
+    due: int = Field(..., description="Questions due now — what a review quiz would draw from")
+    scheduled: int = Field(..., description="Questions in the queue, due or not")
+    next_due_at: datetime | None = None
+
+
+class SaveAnswersRequest(BaseModel):
+    """Changed answers by question index; null clears an answer."""
+    answers: dict[int, int | None] = Field(..., min_length=1, max_length=30)
+
+    @field_validator("answers")
+    @classmethod
+    def answers_in_range(cls, v: dict[int, int | None]) -> dict[int, int | None]:
+        for index, answer in v.items():
+            if index < 0 or (answer is not None and not 0 <= answer <= 3):
+                raise ValueError(f"Answer {answer} for question {index} is out of range [0, 3].")
+        return v
+
+
+class SaveAnswersResponse(BaseModel):
+    answered: int
+
+
+class QuizSessionResponse(BaseModel):
+    quiz_id: str
+    questions: list[QuizQuestionPublic]
+    subject: str
+    difficulty: Difficulty
+    answers: list[int | None]
+    elapsed_seconds: float
+    remaining_seconds: float | None = None
+    time_limit: int | None = None
+    auto_submit: bool = False
+    expires_at: datetime | None = None
 
 
 class SubmitRequest(BaseModel):
@@ -85,6 +147,58 @@ class SubmitResponse(BaseModel):
     results: list[QuestionResult]
 
 
+class BulkGenerateRequest(BaseModel):
+    subject: str = Field(..., min_length=1, max_length=200)
+    difficulty: Difficulty
+    count: int = Field(default=10, ge=3, le=30, description="Questions per student")
+    pool_size: int | None = Field(default=None, ge=3, le=120, description="Shared pool the variants draw from (default 2 × count, up to 60; max 120)")
+    student_ids: list[uuid.UUID] = Field(..., min_length=1, max_length=200)
+
+    @field_validator("student_ids")
+    @classmethod
+    def distinct_students(cls, v: list[uuid.UUID]) -> list[uuid.UUID]:
+        return list(dict.fromkeys(v))
+
+    @property
+    def effective_pool_size(self) -> int:
+        return max(self.count, self.pool_size or min(2 * self.count, 60))
+
+
+class BulkJobStatus(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, generating, assembling, storing, done or failed")
+    subject: str
+    difficulty: Difficulty
+    count: int
+    pool_size: int
+    students_total: int
+    pool_generated: int = 0
+    source: str | None = None
+    variants_built: int = 0
+    stored: int = 0
+    missing_students: list[str] = Field(default_factory=list, description="Ids without a profile row — no quiz created")
+    quizzes: dict[str, str] = Field(default_factory=dict, description="student_id → quiz_id, once stored")
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
+
+
+class SearchHit(BaseModel):
+    """A stored question — like QuizQuestionPublic, never the answer or explanation."""
+    question_id: str = Field(..., description="Stable id; pass to /quiz/search/similar/{question_id}")
+    question: str
+    options: list[str]
+    subject: str
+    difficulty: Difficulty
+    score: float = Field(..., description="Cosine similarity to the query, 0–1")
+
+
+class SearchResponse(BaseModel):
+    results: list[SearchHit]
+    indexed: int = Field(..., description="Questions in the index")
+    took_ms: float
+
+
 # ---------------------------------------------------------------------------
 # Quiz attempt (DB record shape)
 # ---------------------------------------------------------------------------
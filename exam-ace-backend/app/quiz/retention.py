@@ -0,0 +1,118 @@
+"""
+Retention job for the partitioned quiz_attempts table (migrations/004).
+
+- Creates monthly partitions ATTEMPT_PARTITIONS_AHEAD months in advance so
+  inserts never land in the default partition
+- Compacts partitions older than ATTEMPT_RETENTION_MONTHS: question bodies are
+  stripped (questions → []) while scores, answers and metadata are kept, so
+  history and analytics are unchanged
+- Rewrites each compacted partition (VACUUM FULL by default) so the freed
+  JSONB/TOAST space is actually returned — old partitions never receive new
+  rows, so plain VACUUM alone would not shrink them
+
+Run it from cron (e.g. a daily Render cron job):
+    python -m app.quiz.retention [--dry-run] [--vacuum full|plain|none]
+"""
+from __future__ import annotations
+
+import re
+import asyncio
+import logging
+import argparse
+from datetime import date
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_RE = re.compile(r"^quiz_attempts_p(\d{4})_(\d{2})$")
+
+
+def _add_months(d: date, months: int) -> date:
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+async def ensure_partitions(conn: asyncpg.Connection, months_ahead: int) -> int:
+    """Create any missing partitions from this month to `months_ahead` months out."""
+    this_month = date.today().replace(day=1)
+    return await conn.fetchval(
+        "SELECT create_quiz_attempt_partitions($1, $2)",
+        this_month,
+        _add_months(this_month, months_ahead),
+    )
+
+
+async def expired_partitions(conn: asyncpg.Connection, retention_months: int) -> list[str]:
+    """Monthly partitions whose whole range is older than the retention window."""
+    cutoff = _add_months(date.today().replace(day=1), -retention_months)
+    rows = await conn.fetch(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'quiz_attempts'::regclass
+        ORDER BY c.relname
+        """
+    )
+    expired = []
+    for row in rows:
+        match = _PARTITION_RE.match(row["relname"])
+        if match and date(int(match.group(1)), int(match.group(2)), 1) < cutoff:
+            expired.append(row["relname"])
+    return expired
+
+
+async def compact_partition(conn: asyncpg.Connection, partition: str, vacuum: str) -> int:
+    """Strip question bodies from one partition; returns the number of rows compacted."""
+    if not _PARTITION_RE.match(partition):
+        raise ValueError(f"Not a monthly quiz_attempts partition: {partition!r}")
+    table = f'"{partition}"'
+    status = await conn.execute(
+        f"UPDATE {table} SET questions = '[]'::jsonb WHERE questions <> '[]'::jsonb"
+    )
+    compacted = int(status.split()[-1])
+    if compacted and vacuum == "full":
+        await conn.execute(f"VACUUM (FULL, ANALYZE) {table}")
+    elif compacted and vacuum == "plain":
+        await conn.execute(f"VACUUM (ANALYZE) {table}")
+    return compacted
+
+
+async def run(dsn: str, retention_months: int, months_ahead: int, vacuum: str, dry_run: bool) -> None:
+    conn = await asyncpg.connect(dsn)
+    try:
+        created = 0 if dry_run else await ensure_partitions(conn, months_ahead)
+        logger.info("Created %d new quiz_attempts partition(s).", created)
+
+        for partition in await expired_partitions(conn, retention_months):
+            if dry_run:
+                logger.info("Would compact %s", partition)
+                continue
+            compacted = await compact_partition(conn, partition, vacuum)
+            logger.info("Compacted %s (%d rows).", partition, compacted)
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Create upcoming quiz_attempts partitions and compact old ones.")
+    parser.add_argument("--dry-run", action="store_true", help="List partitions that would be compacted, change nothing")
+    parser.add_argument("--vacuum", choices=("full", "plain", "none"), default="full",
+                        help="How to reclaim space after compacting (full locks only the old partition)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(name)s | %(levelname)s | %(message)s")
+    asyncio.run(run(
+        settings.database_url,
+        retention_months=settings.attempt_retention_months,
+        months_ahead=settings.attempt_partitions_ahead,
+        vacuum=args.vacuum,
+        dry_run=args.dry_run,
+    ))
+
+
+if __name__ == "__main__":
+    main()
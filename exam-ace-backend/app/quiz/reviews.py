@@ -0,0 +1,186 @@
+"""
+Spaced-repetition review queues in Redis, kept up to date from graded quizzes.
+
+- Every graded quiz (POST /quiz/submit and session auto-submit) updates the
+  user's schedule with one Lua call: a question answered wrong enters the
+  queue, and every question already in it moves along an SM-2 schedule —
+  a wrong answer resets it to tomorrow, a right one stretches the interval
+  (1 day, 6 days, then interval × easiness factor)
+- Per user: `review:{user_id}:due`, a sorted set of question ids (see
+  app.quiz.search.question_hash) scored by due time, plus hashes with each
+  question's SM-2 state (`:state`) and the question itself (`:q`), so a
+  review quiz never reads quiz_attempts
+- POST /quiz/generate with mode "review" takes the most overdue questions
+  with one ZRANGEBYSCORE — O(log n + count) however long the history
+- Queues are capped at REVIEW_MAX_ITEMS (the questions due furthest out
+  are dropped) and expire REVIEW_TTL_DAYS after the user's last graded quiz
+
+Without Redis, quizzes are still graded and stored; they just are not
+scheduled, and review quizzes are unavailable.
+"""
+from __future__ import annotations
+
+import json
+import time
+import logging
+from collections import Counter
+from dataclasses import dataclass
+
+from app.core import metrics
+from app.core import redis as redis_mod
+from app.quiz.models import Difficulty, QuizQuestion
+from app.quiz.search import question_hash
+
+logger = logging.getLogger(__name__)
+
+_DAY = 86400
+
+# SM-2 with binary grading: a right answer is quality 4, a wrong one 1.
+# KEYS = due zset, state hash, question hash
+# ARGV = now, day seconds, max items, ttl, then id/correct/question triples
+# ("" for a question not worth storing: answered right and not in the queue)
+# Returns {scheduled, dropped}
+_RECORD_LUA = """
+local now, day, max_items, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local scheduled = 0
+for i = 5, #ARGV, 3 do
+  local id, correct = ARGV[i], ARGV[i + 1] == '1'
+  local state = redis.call('HGET', KEYS[2], id)
+  if state or not correct then
+    local ef, interval, reps = 2.5, 0, 0
+    if state then
+      local a, b, c = string.match(state, '([^,]+),([^,]+),([^,]+)')
+      ef, interval, reps = tonumber(a), tonumber(b), tonumber(c)
+    else
+      redis.call('HSET', KEYS[3], id, ARGV[i + 2])
+    end
+    local q = correct and 4 or 1
+    if q >= 3 then
+      if reps == 0 then interval = 1 elseif reps == 1 then interval = 6 else interval = math.ceil(interval * ef) end
+      reps = reps + 1
+    else
+      interval, reps = 1, 0
+    end
+    ef = math.max(1.3, ef + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+    redis.call('HSET', KEYS[2], id, string.format('%.2f,%d,%d', ef, interval, reps))
+    redis.call('ZADD', KEYS[1], now + interval * day, id)
+    scheduled = scheduled + 1
+  end
+end
+local dropped = 0
+local excess = redis.call('ZCARD', KEYS[1]) - max_items
+if excess > 0 then
+  local far = redis.call('ZRANGE', KEYS[1], -excess, -1)
+  redis.call('ZREM', KEYS[1], unpack(far))
+  redis.call('HDEL', KEYS[2], unpack(far))
+  redis.call('HDEL', KEYS[3], unpack(far))
+  dropped = #far
+end
+if scheduled > 0 then
+  for k = 1, 3 do redis.call('EXPIRE', KEYS[k], ttl) end
+end
+return {scheduled, dropped}
+"""
+
+_registered: dict[int, object] = {}
+
+
+class ReviewsUnavailableError(Exception):
+    """Redis is down, so the review queue cannot be read."""
+
+
+@dataclass(slots=True)
+class ReviewQuiz:
+    questions: list[QuizQuestion]
+    subject: str  # the questions' subject, or "Review" if they are mixed
+    difficulty: Difficulty  # the most common one among the questions
+
+
+@dataclass(slots=True)
+class QueueStatus:
+    due: int
+    scheduled: int
+    next_due_at: float | None
+
+
+def _settings():
+    from app.core.config import settings
+    return settings
+
+
+def _keys(user_id: str) -> list[str]:
+    return [f"review:{user_id}:due", f"review:{user_id}:state", f"review:{user_id}:q"]
+
+
+def _script(client):
+    script = _registered.get(id(client))
+    if script is None:
+        script = _registered[id(client)] = client.register_script(_RECORD_LUA)
+    return script
+
+
+async def record(user_id: str, subject: str, difficulty: str, questions: list[QuizQuestion],
+                 answers: list[int | None]) -> None:
+    """Reschedule the questions of a graded quiz; failures are logged, never raised."""
+    client = redis_mod.get_redis()
+    if client is None:
+        return
+    cfg = _settings()
+    args: list = [repr(time.time()), _DAY, cfg.review_max_items, cfg.review_ttl_days * _DAY]
+    for q, answer in zip(questions, answers):
+        correct = q.correct_index == answer
+        # The question body is only written when it first enters the queue
+        payload = "" if correct else json.dumps({"s": subject, "d": difficulty, "q": q.model_dump()})
+        args += [question_hash(q.question), int(correct), payload]
+    try:
+        scheduled, dropped = await redis_mod.call(
+            "review_record", _script(client)(keys=_keys(user_id), args=args))
+    except Exception as exc:
+        logger.warning("Could not update the review queue of user %s: %s", user_id, exc)
+        return
+    metrics.REVIEW_EVENTS.inc("scheduled", amount=scheduled)
+    if dropped:
+        metrics.REVIEW_EVENTS.inc("dropped", amount=dropped)
+
+
+async def due_quiz(user_id: str, count: int) -> ReviewQuiz | None:
+    """Up to `count` due questions, most overdue first; None if nothing is due."""
+    client = redis_mod.get_redis()
+    if client is None:
+        raise ReviewsUnavailableError("Redis unavailable")
+    due_key, _, questions_key = _keys(user_id)
+    try:
+        ids = await redis_mod.call("review_due", client.zrangebyscore(
+            due_key, "-inf", repr(time.time()), start=0, num=count))
+        if not ids:
+            return None
+        raw = await redis_mod.call("review_questions", client.hmget(questions_key, ids))
+    except Exception as exc:
+        raise ReviewsUnavailableError(str(exc)) from exc
+
+    items = [json.loads(item) for item in raw if item]
+    if not items:
+        return None
+    subjects = {item["s"] for item in items}
+    metrics.REVIEW_EVENTS.inc("served", amount=len(items))
+    return ReviewQuiz(
+        questions=[QuizQuestion(**item["q"]) for item in items],
+        subject=subjects.pop() if len(subjects) == 1 else "Review",
+        difficulty=Difficulty(Counter(item["d"] for item in items).most_common(1)[0][0]),
+    )
+
+
+async def queue_status(user_id: str) -> QueueStatus:
+    client = redis_mod.get_redis()
+    if client is None:
+        raise ReviewsUnavailableError("Redis unavailable")
+    due_key = _keys(user_id)[0]
+    pipe = client.pipeline(transaction=False)
+    pipe.zcount(due_key, "-inf", repr(time.time()))
+    pipe.zcard(due_key)
+    pipe.zrange(due_key, 0, 0, withscores=True)
+    try:
+        due, scheduled, first = await redis_mod.call("review_status", pipe.execute())
+    except Exception as exc:
+        raise ReviewsUnavailableError(str(exc)) from exc
+    return QueueStatus(due=due, scheduled=scheduled, next_due_at=first[0][1] if first else None)
@@ -1,47 +1,106 @@
 """
 Quiz API router.
-- POST /quiz/generate  — validate, call LLM, store, return questions (no answers)
-- POST /quiz/submit    — recompute score server-side, detect tampering, save attempt
+- POST /quiz/generate  — validate, call LLM (or, in review mode, take due questions
+                         from the review queue), store, return questions (no answers)
+- POST /quiz/submit    — recompute score server-side, detect tampering, save attempt,
+                         reschedule the questions in the user's review queue
+- GET  /quiz/review    — how many questions are due in the user's review queue
+- POST /quiz/bulk      — (teachers) generate one quiz variant per student, as a background job
+- GET  /quiz/bulk/{job_id} — progress and result of a bulk job
+- PATCH /quiz/{quiz_id}/answers — autosave changed answers to the Redis session
+- GET  /quiz/{quiz_id}/session  — resume an in-progress quiz (questions, answers, time left)
 - GET  /quiz/history   — list past attempts for current user
+- GET  /quiz/history/export — stream every attempt as NDJSON or CSV
+- GET  /quiz/search    — full-text search over every stored question
+- GET  /quiz/search/similar/{question_id} — questions most like a given one
+- POST /quiz/record    — persist a locally-scored attempt
+- POST /quiz/record/batch — persist many locally-scored attempts in one write
+
+While Postgres is unreachable, attempt inserts and score updates go to the
+local write spool (app.quiz.spool) and are written once it is back.
 """
 from __future__ import annotations
 
 import json
+import time
 import uuid
+import asyncio
 import hashlib
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timezone
+import asyncpg
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 
-from app.auth.dependencies import get_current_user
-from app.core.database import get_pool
+from app.auth.dependencies import get_current_user, require_teacher
+from app.core import metrics
+from app.core.database import get_pool, get_read_pool, mark_write
 from app.core.rate_limiter import check_rate_limit
+from app.core.responses import FastJSONResponse
 from app.quiz.models import (
+    BulkGenerateRequest,
+    BulkJobStatus,
     Difficulty,
+    ExportFormat,
     GenerateRequest,
     GenerateResponse,
+    QuizMode,
     QuizQuestionPublic,
+    QuizSessionResponse,
+    ReviewQueueResponse,
+    SaveAnswersRequest,
+    SaveAnswersResponse,
+    SearchHit,
+    SearchResponse,
     SubmitRequest,
     SubmitResponse,
-    QuestionResult,
-    QuizQuestion,
+    QuizQuestionList,
 )
+from app.quiz import bulk, export, item_stats, reviews, search, sessions, spool
 from app.quiz.generator import generate_quiz
-from app.quiz.llm_gateway import get_provider
+from app.quiz.llm_gateway import provider_from_settings
+from app.quiz.scoring import grade, store_score
+from app.users import profile_cache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/quiz", tags=["Quiz"])
 
 
-def _get_llm_provider():
-    """Build LLM provider from config (deferred import to avoid startup crash during tests)."""
-    from app.core.config import settings
-    return get_provider(
-        settings.llm_provider,
-        settings.llm_api_key,
-        settings.llm_base_url,
-        model=settings.llm_model,
-        health_timeout=settings.llm_health_timeout,
+def _public(questions) -> list[QuizQuestionPublic]:
+    """Questions WITHOUT correct_index / explanation."""
+    return [QuizQuestionPublic(index=i, question=q.question, options=q.options) for i, q in enumerate(questions)]
+
+
+def _timestamp(epoch: float | None) -> datetime | None:
+    return datetime.fromtimestamp(epoch, timezone.utc) if epoch is not None else None
+
+
+def _search_response(index: search.SearchIndex, hits: list[tuple[int, float]], start: float) -> SearchResponse:
+    return SearchResponse(
+        results=[SearchHit(**index.document(doc), score=round(score, 4)) for doc, score in hits],
+        indexed=len(index),
+        took_ms=round((time.perf_counter() - start) * 1000, 2),
+    )
+
+
+def _job_status(job: bulk.BulkJob) -> BulkJobStatus:
+    return BulkJobStatus(
+        job_id=job.job_id,
+        status=job.status,
+        subject=job.subject,
+        difficulty=job.difficulty,
+        count=job.count,
+        pool_size=job.pool_size,
+        students_total=job.students_total,
+        pool_generated=job.pool_generated,
+        source=job.source,
+        variants_built=job.variants_built,
+        stored=job.stored,
+        missing_students=job.missing_students,
+        quizzes=job.quizzes,
+        error=job.error,
+        created_at=_timestamp(job.created_at),
+        finished_at=_timestamp(job.finished_at),
     )
 
 
@@ -56,44 +115,74 @@ async def generate_quiz_endpoint(
 ):
     # Rate limit
     from app.core.config import settings
-    await check_rate_limit(user_id, limit=settings.quiz_rate_limit)
-
-    # Generate via LLM (falls back to question bank if unreachable)
-    provider = _get_llm_provider()
-    try:
-        questions, source = await generate_quiz(provider, body.subject, body.difficulty, body.count)
-    except RuntimeError as exc:
-        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc))
+    quota = await check_rate_limit(user_id, limit=settings.quiz_rate_limit)
+
+    if body.mode is QuizMode.review:
+        # Questions due in the user's review queue — no LLM, no attempts scan
+        try:
+            review, (time_limit, auto_submit) = await asyncio.gather(
+                reviews.due_quiz(user_id, body.count),
+                sessions.quiz_timing(user_id),
+            )
+        except reviews.ReviewsUnavailableError:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Review quizzes are temporarily unavailable.")
+        if review is None:
+            raise HTTPException(status_code=404, detail="No questions are due for review.")
+        questions, source, subject, difficulty = review.questions, "review", review.subject, review.difficulty
+    else:
+        # Generate via LLM (falls back to question bank if unreachable); the
+        # user's time limit is read meanwhile
+        provider = provider_from_settings()
+        try:
+            (questions, source), (time_limit, auto_submit) = await asyncio.gather(
+                generate_quiz(provider, body.subject, body.difficulty, body.count),
+                sessions.quiz_timing(user_id),
+            )
+        except RuntimeError as exc:
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc))
+        subject, difficulty = body.subject, body.difficulty
 
     # Store quiz snapshot in DB
     quiz_id = str(uuid.uuid4())
     pool = get_pool()
-    questions_json = json.dumps([q.model_dump() for q in questions])
+    questions_json = QuizQuestionList.dump_json(questions).decode()
 
-    await pool.execute(
-        """
-        INSERT INTO quiz_attempts (id, user_id, subject, difficulty, questions)
-        VALUES ($1, $2::uuid, $3, $4, $5::jsonb)
-        """,
-        uuid.UUID(quiz_id),
-        uuid.UUID(user_id),
-        body.subject,
-        body.difficulty.value,
-        questions_json,
-    )
-
-    # Return questions WITHOUT correct_index / explanation
-    public_questions = [
-        QuizQuestionPublic(index=i, question=q.question, options=q.options)
-        for i, q in enumerate(questions)
-    ]
-    return GenerateResponse(
+    try:
+        await pool.execute(
+            """
+            INSERT INTO quiz_attempts (id, user_id, subject, difficulty, questions)
+            VALUES ($1, $2::uuid, $3, $4, $5::jsonb)
+            """,
+            uuid.UUID(quiz_id),
+            uuid.UUID(user_id),
+            subject,
+            difficulty.value,
+            questions_json,
+        )
+    except Exception as exc:
+        # Database unreachable: the attempt is written once it is back
+        if not await spool.capture(exc, spool.attempts_entry(user_id, [{
+            "id": quiz_id, "subject": subject, "difficulty": difficulty.value, "questions": questions_json,
+        }])):
+            raise
+    else:
+        await mark_write(user_id)
+
+    # Autosave / resume / auto-submit state lives in Redis until submit
+    session = await sessions.start(quiz_id, user_id, len(questions), time_limit, auto_submit)
+
+    return FastJSONResponse(GenerateResponse(
         quiz_id=quiz_id,
-        questions=public_questions,
-        subject=body.subject,
-        difficulty=body.difficulty,
+        questions=_public(questions),
+        subject=subject,
+        difficulty=difficulty,
         source=source,
-    )
+        time_limit=time_limit,
+        auto_submit=auto_submit,
+        expires_at=_timestamp(session.expires_at) if session else None,
+        resumable=session is not None,
+    ), headers=quota.headers())
 
 
 # --------------------------------------------------------------------------
@@ -107,20 +196,29 @@ async def submit_quiz_endpoint(
 ):
     pool = get_pool()
 
-    # Fetch the quiz from DB
-    row = await pool.fetchrow(
-        "SELECT * FROM quiz_attempts WHERE id = $1 AND user_id = $2::uuid",
-        uuid.UUID(body.quiz_id),
-        uuid.UUID(user_id),
-    )
+    # Fetch the quiz from DB — or from the write spool if it has not reached the DB yet
+    try:
+        row = await pool.fetchrow(
+            "SELECT * FROM quiz_attempts WHERE id = $1 AND user_id = $2::uuid",
+            uuid.UUID(body.quiz_id),
+            uuid.UUID(user_id),
+        )
+    except Exception as exc:
+        if not spool.is_outage(exc):
+            raise
+        row = spool.pending(body.quiz_id, user_id)
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Quizzes cannot be submitted right now — try again shortly.")
+    if not row:
+        row = spool.pending(body.quiz_id, user_id)
     if not row:
         raise HTTPException(status_code=404, detail="Quiz not found.")
+    if row["score"] is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Quiz already submitted.")
 
     # Deserialize stored questions
-    stored_questions_raw = row["questions"]
-    if isinstance(stored_questions_raw, str):
-        stored_questions_raw = json.loads(stored_questions_raw)
-    questions = [QuizQuestion.model_validate(q) for q in stored_questions_raw]
+    questions = QuizQuestionList.validate_json(row["questions"])
 
     # Anti-cheat: answer count must match question count
     if len(body.answers) != len(questions):
@@ -137,45 +235,158 @@ async def submit_quiz_endpoint(
                 detail=f"Answer index {ans} for question {i} is out of range [0, 3].",
             )
 
-    # Server-side score recomputation
-    correct = sum(1 for q, a in zip(questions, body.answers) if q.correct_index == a)
-    total = len(questions)
-    score = round((correct / total) * 100, 2)
-
-    # Build detailed results
-    results = [
-        QuestionResult(
-            question=q.question,
-            options=q.options,
-            selected_index=a,
-            correct_index=q.correct_index,
-            is_correct=(q.correct_index == a),
-            explanation=q.explanation,
-        )
-        for q, a in zip(questions, body.answers)
-    ]
+    # A timed quiz set to auto-submit is graded from its saved answers once time is up
+    session = await sessions.load(body.quiz_id, user_id)
+    if session is not None and session.auto_submit and session.deadline and time.time() > session.deadline:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Time limit exceeded — the quiz is auto-submitted with the saved answers.")
+
+    # Server-side score recomputation, written once (a concurrent submit or auto-submit loses)
+    graded = grade(questions, body.answers)
+    if not await store_score(pool, body.quiz_id, user_id, body.answers, graded.score):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Quiz already submitted.")
+    # Analytics / history read from the replica — make sure this user sees the new score
+    await mark_write(user_id)
+    if session is not None:
+        await sessions.finish(body.quiz_id)
+    await reviews.record(user_id, row["subject"], row["difficulty"], questions, body.answers)
+    item_stats.record(row["subject"], row["difficulty"], questions, body.answers)
+
+    return FastJSONResponse(SubmitResponse(
+        quiz_id=body.quiz_id,
+        score=graded.score,
+        total=graded.total,
+        correct=graded.correct,
+        results=graded.results,
+    ))
 
-    # Update DB with answers and score
-    answers_json = json.dumps(body.answers)
-    await pool.execute(
-        """
-        UPDATE quiz_attempts
-        SET answers = $1::jsonb, score = $2
-        WHERE id = $3 AND user_id = $4::uuid
-        """,
-        answers_json,
-        score,
-        uuid.UUID(body.quiz_id),
-        uuid.UUID(user_id),
+
+# --------------------------------------------------------------------------
+# GET /quiz/review
+# --------------------------------------------------------------------------
+
+@router.get("/review", response_model=ReviewQueueResponse)
+async def review_queue_endpoint(user_id: str = Depends(get_current_user)):
+    try:
+        queue = await reviews.queue_status(user_id)
+    except reviews.ReviewsUnavailableError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Review quizzes are temporarily unavailable.")
+    return FastJSONResponse(ReviewQueueResponse(
+        due=queue.due,
+        scheduled=queue.scheduled,
+        next_due_at=_timestamp(queue.next_due_at),
+    ))
+
+
+# --------------------------------------------------------------------------
+# POST /quiz/bulk, GET /quiz/bulk/{job_id} — quizzes for a class
+# --------------------------------------------------------------------------
+
+@router.post("/bulk", response_model=BulkJobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def bulk_generate_endpoint(
+    body: BulkGenerateRequest,
+    teacher_id: str = Depends(require_teacher),
+):
+    """
+    Start a job that builds one shuffled variant per student from a shared
+    question pool and stores them as the students' quizzes.  Costs the
+    teacher one /quiz/generate call of rate limit, whatever the class size.
+    """
+    from app.core.config import settings
+    quota = await check_rate_limit(teacher_id, limit=settings.quiz_rate_limit)
+
+    job = bulk.submit(
+        provider_from_settings(),
+        teacher_id,
+        body.subject,
+        body.difficulty,
+        body.count,
+        body.effective_pool_size,
+        [str(sid) for sid in body.student_ids],
     )
+    return FastJSONResponse(_job_status(job), status_code=status.HTTP_202_ACCEPTED, headers=quota.headers())
 
-    return SubmitResponse(
-        quiz_id=body.quiz_id,
-        score=score,
-        total=total,
-        correct=correct,
-        results=results,
+
+@router.get("/bulk/{job_id}", response_model=BulkJobStatus)
+async def bulk_job_status_endpoint(
+    job_id: uuid.UUID,
+    teacher_id: str = Depends(require_teacher),
+):
+    job = await bulk.get_job(str(job_id))
+    if job is None or job.teacher_id != teacher_id:
+        raise HTTPException(status_code=404, detail="Bulk job not found.")
+    return FastJSONResponse(_job_status(job))
+
+
+# --------------------------------------------------------------------------
+# PATCH /quiz/{quiz_id}/answers — autosave
+# --------------------------------------------------------------------------
+
+@router.patch("/{quiz_id}/answers", response_model=SaveAnswersResponse)
+async def save_answers_endpoint(
+    quiz_id: uuid.UUID,
+    body: SaveAnswersRequest,
+    user_id: str = Depends(get_current_user),
+):
+    """Store changed answers in the quiz's Redis session — one round trip, no database write."""
+    try:
+        answered = await sessions.save_answers(str(quiz_id), user_id, body.answers)
+    except sessions.SessionNotFoundError:
+        raise HTTPException(status_code=404, detail="No quiz in progress with this id.")
+    except sessions.SessionExpiredError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Time limit exceeded.")
+    except IndexError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    except sessions.SessionsUnavailableError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Autosave is temporarily unavailable.")
+    return FastJSONResponse(SaveAnswersResponse(answered=answered))
+
+
+# --------------------------------------------------------------------------
+# GET /quiz/{quiz_id}/session — resume
+# --------------------------------------------------------------------------
+
+@router.get("/{quiz_id}/session", response_model=QuizSessionResponse)
+async def resume_quiz_endpoint(
+    quiz_id: uuid.UUID,
+    user_id: str = Depends(get_current_user),
+):
+    session = await sessions.load(str(quiz_id), user_id)
+
+    row = await get_pool().fetchrow(
+        "SELECT subject, difficulty, questions, score FROM quiz_attempts WHERE id = $1 AND user_id = $2::uuid",
+        quiz_id,
+        uuid.UUID(user_id),
     )
+    if not row or row["score"] is not None:
+        if session is not None:
+            await sessions.finish(str(quiz_id))
+        raise HTTPException(status_code=404, detail="No quiz in progress with this id.")
+    questions = QuizQuestionList.validate_json(row["questions"])
+
+    if session is None:
+        # A quiz created for the student (POST /quiz/bulk): the clock starts when they open it
+        time_limit, auto_submit = await sessions.quiz_timing(user_id)
+        session = await sessions.start(str(quiz_id), user_id, len(questions), time_limit, auto_submit)
+        if session is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Quiz sessions are temporarily unavailable.")
+    else:
+        metrics.QUIZ_SESSION_EVENTS.inc("resumed")
+
+    return FastJSONResponse(QuizSessionResponse(
+        quiz_id=str(quiz_id),
+        questions=_public(questions),
+        subject=row["subject"],
+        difficulty=row["difficulty"],
+        answers=session.answers,
+        elapsed_seconds=round(session.elapsed, 3),
+        remaining_seconds=round(session.remaining, 3) if session.remaining is not None else None,
+        time_limit=session.time_limit,
+        auto_submit=session.auto_submit,
+        expires_at=_timestamp(session.expires_at),
+    ))
 
 
 # --------------------------------------------------------------------------
@@ -184,7 +395,7 @@ async def submit_quiz_endpoint(
 
 @router.get("/history")
 async def quiz_history(user_id: str = Depends(get_current_user)):
-    pool = get_pool()
+    pool = await get_read_pool(user_id)
     rows = await pool.fetch(
         """
         SELECT id, subject, difficulty, score, created_at
@@ -195,7 +406,7 @@ async def quiz_history(user_id: str = Depends(get_current_user)):
         """,
         uuid.UUID(user_id),
     )
-    return [
+    return FastJSONResponse([
         {
             "id": str(row["id"]),
             "subject": row["subject"],
@@ -204,7 +415,57 @@ async def quiz_history(user_id: str = Depends(get_current_user)):
             "created_at": row["created_at"].isoformat() if row["created_at"] else None,
         }
         for row in rows
-    ]
+    ])
+
+
+# --------------------------------------------------------------------------
+# GET /quiz/history/export
+# --------------------------------------------------------------------------
+
+@router.get("/history/export")
+async def export_history(
+    format: ExportFormat = ExportFormat.ndjson,
+    include_questions: bool = Query(default=False, description="Add each attempt's questions and answers"),
+    user_id: str = Depends(get_current_user),
+):
+    """Every attempt, oldest first, streamed — unlike /quiz/history there is no row limit."""
+    return await export.streaming_response(user_id, format, include_questions)
+
+
+# --------------------------------------------------------------------------
+# GET /quiz/search
+# --------------------------------------------------------------------------
+
+@router.get("/search", response_model=SearchResponse)
+async def search_questions(
+    q: str = Query(..., min_length=1, max_length=500),
+    subject: str | None = Query(default=None, max_length=200),
+    difficulty: Difficulty | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    user_id: str = Depends(get_current_user),
+):
+    start = time.perf_counter()
+    index = search.get_index()
+    hits = index.search(q, limit, subject, difficulty)
+    return FastJSONResponse(_search_response(index, hits, start))
+
+
+@router.get("/search/similar/{question_id}", response_model=SearchResponse)
+async def similar_questions(
+    question_id: str,
+    subject: str | None = Query(default=None, max_length=200),
+    difficulty: Difficulty | None = None,
+    limit: int = Query(default=10, ge=1, le=100),
+    user_id: str = Depends(get_current_user),
+):
+    """More like this: ranked by shared (idf-weighted) terms with the given question."""
+    start = time.perf_counter()
+    index = search.get_index()
+    doc = index.find(question_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Question not found.")
+    hits = index.similar(doc, limit, subject, difficulty)
+    return FastJSONResponse(_search_response(index, hits, start))
 
 
 # --------------------------------------------------------------------------
@@ -230,19 +491,9 @@ async def record_quiz_attempt(
     attempt_id = uuid.uuid4()
     uid = uuid.UUID(user_id)
 
-    # Ensure profile exists (Google OAuth users may not have one yet)
-    await pool.execute(
-        """
-        INSERT INTO profiles (id, email, display_name)
-        VALUES ($1, $2, $3)
-        ON CONFLICT (id) DO NOTHING
-        """,
-        uid,
-        f"{user_id}@oauth",  # placeholder, will be overwritten if trigger runs later
-        "User",
-    )
-
     try:
+        # Ensure profile exists (Google OAuth users may not have one yet)
+        await profile_cache.ensure_profile(pool, user_id)
         await pool.execute(
             """
             INSERT INTO quiz_attempts (id, user_id, subject, difficulty, questions, score)
@@ -256,8 +507,16 @@ async def record_quiz_attempt(
             body.score,
         )
     except Exception as exc:
+        if isinstance(exc, asyncpg.ForeignKeyViolationError):
+            await profile_cache.forget(user_id)  # profile deleted since it was cached
+        if await spool.capture(exc, spool.attempts_entry(user_id, [{
+            "id": attempt_id, "subject": body.subject, "difficulty": body.difficulty,
+            "questions": "[]", "score": body.score,
+        }], profile=True)):
+            return {"status": "queued", "id": str(attempt_id)}
         logger.error("Failed to record quiz attempt: %s", exc)
         raise HTTPException(status_code=500, detail="Failed to record quiz attempt.")
+    await mark_write(user_id)
 
     logger.info("Recorded local quiz attempt %s for user %s: %s/%s (%s%%)",
                 attempt_id, user_id, body.correct, body.total, body.score)
@@ -265,3 +524,89 @@ async def record_quiz_attempt(
     return {"status": "recorded", "id": str(attempt_id)}
 
 
+# --------------------------------------------------------------------------
+# POST /quiz/record/batch — sync many locally-scored attempts at once
+# --------------------------------------------------------------------------
+
+_MAX_BATCH_ATTEMPTS = 1000
+
+
+class RecordBatchItem(RecordAttemptRequest):
+    difficulty: Difficulty
+    client_attempt_id: str = PydanticField(..., min_length=1, max_length=100)
+    completed_at: datetime
+
+
+class RecordBatchRequest(BaseModel):
+    attempts: list[RecordBatchItem] = PydanticField(..., min_length=1, max_length=_MAX_BATCH_ATTEMPTS)
+
+
+@router.post("/record/batch")
+async def record_quiz_attempts_batch(
+    body: RecordBatchRequest,
+    user_id: str = Depends(get_current_user),
+):
+    """
+    Persist attempts that were scored offline by the frontend.
+
+    All rows go in with at most one profile upsert and one INSERT … SELECT FROM unnest().
+    `(client_attempt_id, completed_at)` is the dedupe key, so replaying a batch
+    after a reconnect only inserts the attempts the server hasn't seen yet.
+    """
+    pool = get_pool()
+    uid = uuid.UUID(user_id)
+
+    # Collapse duplicates inside the request itself — ON CONFLICT cannot
+    # resolve two conflicting rows proposed by the same statement.
+    items: dict[str, RecordBatchItem] = {}
+    for item in body.attempts:
+        items.setdefault(item.client_attempt_id, item)
+    attempts = list(items.values())
+
+    ids = [uuid.uuid4() for _ in attempts]
+    try:
+        await profile_cache.ensure_profile(pool, user_id)
+        rows = await pool.fetch(
+            """
+            INSERT INTO quiz_attempts
+                (id, user_id, subject, difficulty, questions, score, client_attempt_id, created_at)
+            SELECT a.id, $1::uuid, a.subject, a.difficulty, '[]'::jsonb, a.score, a.client_attempt_id, a.created_at
+            FROM unnest($2::uuid[], $3::text[], $4::text[], $5::float8[], $6::text[], $7::timestamptz[])
+                AS a(id, subject, difficulty, score, client_attempt_id, created_at)
+            ON CONFLICT (user_id, client_attempt_id, created_at)
+                WHERE client_attempt_id IS NOT NULL
+                DO NOTHING
+            RETURNING id, client_attempt_id
+            """,
+            uid,
+            ids,
+            [a.subject for a in attempts],
+            [a.difficulty.value for a in attempts],
+            [a.score for a in attempts],
+            [a.client_attempt_id for a in attempts],
+            [a.completed_at for a in attempts],
+        )
+    except Exception as exc:
+        if isinstance(exc, asyncpg.ForeignKeyViolationError):
+            await profile_cache.forget(user_id)
+        if await spool.capture(exc, spool.attempts_entry(user_id, [{
+            "id": attempt_id, "subject": a.subject, "difficulty": a.difficulty.value, "questions": "[]",
+            "score": a.score, "client_attempt_id": a.client_attempt_id, "created_at": a.completed_at,
+        } for attempt_id, a in zip(ids, attempts)], profile=True)):
+            # Duplicates are only found on replay; their ids are never used
+            return {"status": "queued", "recorded": {a.client_attempt_id: str(attempt_id)
+                                                     for attempt_id, a in zip(ids, attempts)},
+                    "duplicates": []}
+        logger.error("Failed to record quiz attempt batch: %s", exc)
+        raise HTTPException(status_code=500, detail="Failed to record quiz attempts.")
+    await mark_write(user_id)
+
+    recorded = {row["client_attempt_id"]: str(row["id"]) for row in rows}
+    duplicates = [cid for cid in items if cid not in recorded]
+
+    logger.info("Recorded %d/%d local quiz attempts for user %s (%d duplicates)",
+                len(recorded), len(body.attempts), user_id, len(duplicates))
+
+    return {"status": "recorded", "recorded": recorded, "duplicates": duplicates}
+
+
@@ -0,0 +1,69 @@
+"""
+Server-side grading shared by POST /quiz/submit and session auto-submit.
+"""
+from __future__ import annotations
+
+import json
+import uuid
+from dataclasses import dataclass
+
+from app.quiz import spool
+from app.quiz.models import QuestionResult, QuizQuestion
+
+
+@dataclass(slots=True)
+class Graded:
+    correct: int
+    total: int
+    score: float
+    results: list[QuestionResult]
+
+
+def grade(questions: list[QuizQuestion], answers: list[int | None]) -> Graded:
+    """Score `answers` (None = unanswered, counted wrong) against the stored questions."""
+    correct = sum(1 for q, a in zip(questions, answers) if q.correct_index == a)
+    total = len(questions)
+    results = [
+        QuestionResult(
+            question=q.question,
+            options=q.options,
+            selected_index=a if a is not None else -1,
+            correct_index=q.correct_index,
+            is_correct=(q.correct_index == a),
+            explanation=q.explanation,
+        )
+        for q, a in zip(questions, answers)
+    ]
+    return Graded(correct=correct, total=total, score=round((correct / total) * 100, 2), results=results)
+
+
+async def store_score(pool, quiz_id: str, user_id: str, answers: list[int | None], score: float) -> bool:
+    """
+    Write answers and score to the attempt, once: returns False if it was
+    already scored (a second submit, or the auto-submitter got there first).
+    Spooled instead while the attempt itself is still in the write spool, or
+    if the database cannot be reached.
+    """
+    if spool.pending(quiz_id, user_id) is not None:
+        spooled = await spool.store_score(quiz_id, user_id, answers, score)
+        if spooled is None:
+            raise RuntimeError(f"Could not spool the score of quiz {quiz_id}")
+        return spooled
+    try:
+        status = await pool.execute(
+            """
+            UPDATE quiz_attempts
+            SET answers = $1::jsonb, score = $2
+            WHERE id = $3 AND user_id = $4::uuid AND score IS NULL
+            """,
+            json.dumps(answers),
+            score,
+            uuid.UUID(quiz_id),
+            uuid.UUID(user_id),
+        )
+    except Exception as exc:
+        spooled = await spool.store_score(quiz_id, user_id, answers, score, exc)
+        if spooled is None:
+            raise
+        return spooled
+    return status != "UPDATE 0"
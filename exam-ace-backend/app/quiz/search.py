@@ -0,0 +1,443 @@
+"""
+In-process full-text search over every stored quiz question.
+
+- Corpus: the fallback bank plus the questions of every quiz_attempts row,
+  one document per distinct question text (see question_hash); question and
+  options are indexed, explanations are not
+- Weighting is SMART lnc.ltc TF-IDF: document vectors get log tf and length
+  normalization when they are added, idf is applied on the query side only.
+  A document's weights never change as the corpus grows, so adding
+  documents is append-only and results are plain cosine similarities.
+- Postings are term-major NumPy arrays (a CSC documents × terms matrix).  A
+  query scatters the postings of its few terms into a dense score vector
+  and takes the top k with argpartition.  New documents go to small per-term
+  delta lists, merged into the arrays in a worker thread once
+  SEARCH_MERGE_THRESHOLD postings have piled up; queries read the arrays and
+  the deltas, so they never wait for a merge.
+- Every SEARCH_REFRESH_SECONDS a background task pages in quiz_attempts rows
+  created since the last pass (keyset on created_at, id), so questions
+  generated by any worker are searchable shortly after
+- SEARCH_INDEX_PATH, if set, is an .npz snapshot loaded at startup — by the
+  master before it forks, under app.server — and written at shutdown, so a
+  restart only reads the attempts created since
+
+    python -m app.quiz.search --build    # write a snapshot from the database
+"""
+from __future__ import annotations
+
+import io
+import os
+import re
+import json
+import math
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import argparse
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.quiz.models import Difficulty, QuizQuestionList
+
+logger = logging.getLogger(__name__)
+
+_SNAPSHOT_VERSION = 1
+_PAGE_SIZE = 200  # attempts per catch-up query; each page is tokenized on the event loop
+_COMMIT_LAG = "5 seconds"  # rows younger than this may still have uncommitted neighbours
+_DIFFICULTIES = list(Difficulty)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how if in into is it its of on or that the
+their there these this to was what when where which who whom why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+def question_hash(question: str) -> str:
+    """Stable id of a question: its text, case- and whitespace-insensitive."""
+    return hashlib.sha1(" ".join(question.lower().split()).encode()).hexdigest()[:16]
+
+
+def _merge(merged: tuple[np.ndarray, np.ndarray, np.ndarray], delta: dict[int, tuple[list, list]],
+           n_terms: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """New postings arrays with every delta list appended to its term's block."""
+    indptr, doc_ids, weights = merged
+    old_starts = np.zeros(n_terms, np.int64)
+    old_starts[:len(indptr) - 1] = indptr[:-1]
+    old_counts = np.zeros(n_terms, np.int64)
+    old_counts[:len(indptr) - 1] = np.diff(indptr)
+    add_counts = np.zeros(n_terms, np.int64)
+    for tid, (ids, _) in delta.items():
+        add_counts[tid] = len(ids)
+
+    new_indptr = np.zeros(n_terms + 1, np.int64)
+    np.cumsum(old_counts + add_counts, out=new_indptr[1:])
+    new_ids = np.empty(new_indptr[-1], np.int32)
+    new_weights = np.empty(new_indptr[-1], np.float32)
+
+    # Old blocks keep their order, shifted by what earlier terms gained
+    dest = np.arange(len(doc_ids), dtype=np.int64) + np.repeat(new_indptr[:-1] - old_starts, old_counts)
+    new_ids[dest] = doc_ids
+    new_weights[dest] = weights
+    for tid, (ids, ws) in delta.items():
+        start = new_indptr[tid] + old_counts[tid]
+        new_ids[start:start + len(ids)] = ids
+        new_weights[start:start + len(ws)] = ws
+    return new_indptr, new_ids, new_weights
+
+
+class SearchIndex:
+    def __init__(self) -> None:
+        self.vocab: dict[str, int] = {}
+        self.df: list[int] = []
+        self._merged = (np.zeros(1, np.int64), np.empty(0, np.int32), np.empty(0, np.float32))
+        self._delta: dict[int, tuple[list[int], list[float]]] = {}
+        self._merging: dict[int, tuple[list[int], list[float]]] | None = None
+        self.pending = 0  # postings in the delta lists
+
+        self.hashes: list[str] = []
+        self.questions: list[str] = []
+        self.options: list[list[str]] = []
+        self._by_hash: dict[str, int] = {}
+        self.subjects: list[str] = []
+        self._subject_ids: dict[str, int] = {}
+        self._subject_codes = np.empty(1024, np.int32)
+        self._difficulty_codes = np.empty(1024, np.int8)
+        self.watermark: tuple[datetime, uuid.UUID] | None = None
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    # -- writes --------------------------------------------------------------
+
+    def add(self, question: str, options: list[str], subject: str, difficulty: Difficulty | str) -> bool:
+        """Index one question; False if the same question text is already in."""
+        key = question_hash(question)
+        if key in self._by_hash:
+            return False
+        doc = len(self.hashes)
+        self._by_hash[key] = doc
+        self.hashes.append(key)
+        self.questions.append(question)
+        self.options.append(list(options))
+
+        if doc == len(self._subject_codes):
+            self._subject_codes = np.resize(self._subject_codes, doc * 2)
+            self._difficulty_codes = np.resize(self._difficulty_codes, doc * 2)
+        subject_id = self._subject_ids.get(subject.lower())
+        if subject_id is None:
+            subject_id = self._subject_ids[subject.lower()] = len(self.subjects)
+            self.subjects.append(subject)
+        self._subject_codes[doc] = subject_id
+        self._difficulty_codes[doc] = _DIFFICULTIES.index(Difficulty(difficulty))
+
+        counts = Counter(tokenize(question + " " + " ".join(options)))
+        if counts:
+            tf = {term: 1.0 + math.log(c) for term, c in counts.items()}
+            norm = math.sqrt(sum(w * w for w in tf.values()))
+            for term, w in tf.items():
+                tid = self.vocab.get(term)
+                if tid is None:
+                    tid = self.vocab[term] = len(self.df)
+                    self.df.append(0)
+                self.df[tid] += 1
+                ids, ws = self._delta.setdefault(tid, ([], []))
+                ids.append(doc)
+                ws.append(w / norm)
+            self.pending += len(tf)
+        return True
+
+    async def merge(self) -> None:
+        """Fold the delta lists into the postings arrays, off the event loop."""
+        if self._merging is not None or not self._delta:
+            return
+        self._merging, self._delta, self.pending = self._delta, {}, 0
+        try:
+            self._merged = await asyncio.to_thread(_merge, self._merged, self._merging, len(self.vocab))
+        except BaseException:
+            # Put the postings back so nothing is lost
+            for tid, (ids, ws) in self._delta.items():
+                old_ids, old_ws = self._merging.setdefault(tid, ([], []))
+                old_ids.extend(ids)
+                old_ws.extend(ws)
+            self._delta, self.pending = self._merging, sum(len(ids) for ids, _ in self._merging.values())
+            raise
+        finally:
+            self._merging = None
+
+    # -- reads ---------------------------------------------------------------
+
+    def find(self, key: str) -> int | None:
+        return self._by_hash.get(key)
+
+    def search(self, text: str, limit: int = 10, subject: str | None = None,
+               difficulty: Difficulty | None = None) -> list[tuple[int, float]]:
+        return self._query(Counter(tokenize(text)), limit, subject, difficulty, exclude=None)
+
+    def similar(self, doc: int, limit: int = 10, subject: str | None = None,
+                difficulty: Difficulty | None = None) -> list[tuple[int, float]]:
+        """More like this: the document's own terms as the query, itself excluded."""
+        text = self.questions[doc] + " " + " ".join(self.options[doc])
+        return self._query(Counter(tokenize(text)), limit, subject, difficulty, exclude=doc)
+
+    def _query(self, counts: Counter, limit: int, subject: str | None, difficulty: Difficulty | None,
+               exclude: int | None) -> list[tuple[int, float]]:
+        n = len(self.hashes)
+        if not counts or not n:
+            return []
+        indptr, doc_ids, weights = self._merged
+        scores = np.zeros(n, np.float32)
+        q_norm = 0.0
+        for term, count in counts.items():
+            tid = self.vocab.get(term)
+            if tid is None:
+                continue
+            qw = (1.0 + math.log(count)) * (math.log((n + 1) / (self.df[tid] + 1)) + 1.0)
+            q_norm += qw * qw
+            if tid + 1 < len(indptr):
+                lo, hi = indptr[tid], indptr[tid + 1]
+                scores[doc_ids[lo:hi]] += qw * weights[lo:hi]
+            for delta in (self._merging, self._delta):
+                if delta and tid in delta:
+                    ids, ws = delta[tid]
+                    scores[ids] += qw * np.asarray(ws, np.float32)
+        if not q_norm:
+            return []
+
+        # Filters and top-k only look at the documents that matched at all;
+        # argpartition over a mostly-zero corpus-wide vector is far slower
+        if exclude is not None:
+            scores[exclude] = 0
+        candidates = np.flatnonzero(scores)
+        if subject is not None:
+            subject_id = self._subject_ids.get(subject.lower())
+            if subject_id is None:
+                return []
+            candidates = candidates[self._subject_codes[candidates] == subject_id]
+        if difficulty is not None:
+            candidates = candidates[self._difficulty_codes[candidates] == _DIFFICULTIES.index(difficulty)]
+
+        matched = scores[candidates]
+        if len(candidates) > limit:
+            best = np.argpartition(matched, len(candidates) - limit)[len(candidates) - limit:]
+            candidates, matched = candidates[best], matched[best]
+        order = np.argsort(-matched, kind="stable")
+        q_norm = math.sqrt(q_norm)
+        return [(int(doc), float(score) / q_norm) for doc, score in zip(candidates[order], matched[order])]
+
+    def document(self, doc: int) -> dict:
+        return {
+            "question_id": self.hashes[doc],
+            "question": self.questions[doc],
+            "options": self.options[doc],
+            "subject": self.subjects[self._subject_codes[doc]],
+            "difficulty": _DIFFICULTIES[self._difficulty_codes[doc]],
+        }
+
+    # -- snapshot ------------------------------------------------------------
+
+    def save(self, path: str) -> None:
+        """Write an .npz snapshot with every posting merged in, atomically (temp file + rename)."""
+        indptr, doc_ids, weights = self._merged
+        for delta in (self._merging, self._delta):
+            if delta:
+                indptr, doc_ids, weights = _merge((indptr, doc_ids, weights), delta, len(self.vocab))
+        n = len(self.hashes)
+        meta = {
+            "version": _SNAPSHOT_VERSION,
+            "terms": list(self.vocab),
+            "hashes": self.hashes,
+            "questions": self.questions,
+            "options": self.options,
+            "subjects": self.subjects,
+            "watermark": [self.watermark[0].isoformat(), str(self.watermark[1])] if self.watermark else None,
+        }
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            meta=np.frombuffer(json.dumps(meta).encode(), np.uint8),
+            df=np.asarray(self.df, np.int32),
+            indptr=indptr,
+            doc_ids=doc_ids,
+            weights=weights,
+            subject_codes=self._subject_codes[:n],
+            difficulty_codes=self._difficulty_codes[:n],
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(buffer.getbuffer())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> SearchIndex:
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes())
+            if meta["version"] != _SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported search snapshot version {meta['version']}")
+            index = cls()
+            index.vocab = {term: i for i, term in enumerate(meta["terms"])}
+            index.df = data["df"].tolist()
+            index._merged = (data["indptr"], data["doc_ids"], data["weights"])
+            index._subject_codes = np.concatenate([data["subject_codes"], np.empty(1024, np.int32)])
+            index._difficulty_codes = np.concatenate([data["difficulty_codes"], np.empty(1024, np.int8)])
+        index.hashes = meta["hashes"]
+        index.questions = meta["questions"]
+        index.options = meta["options"]
+        index._by_hash = {key: i for i, key in enumerate(index.hashes)}
+        index.subjects = meta["subjects"]
+        index._subject_ids = {subject.lower(): i for i, subject in enumerate(index.subjects)}
+        if meta["watermark"]:
+            index.watermark = (datetime.fromisoformat(meta["watermark"][0]), uuid.UUID(meta["watermark"][1]))
+        return index
+
+
+# ---------------------------------------------------------------------------
+# Feeding the index
+# ---------------------------------------------------------------------------
+
+def add_fallback_bank(index: SearchIndex) -> int:
+    from app.quiz.fallback_questions import all_questions
+
+    return sum(index.add(q.question, q.options, subject, difficulty) for subject, difficulty, q in all_questions())
+
+
+async def catch_up(index: SearchIndex, conn) -> int:
+    """Index attempts created since the watermark; returns how many new questions were added."""
+    added = 0
+    while True:
+        after_ts, after_id = index.watermark or (_EPOCH, uuid.UUID(int=0))
+        # created_at >= $1 on its own lets the planner skip older partitions
+        rows = await conn.fetch(
+            f"""
+            SELECT id, created_at, subject, difficulty, questions
+            FROM quiz_attempts
+            WHERE created_at >= $1
+              AND (created_at, id) > ($1, $2)
+              AND created_at < now() - interval '{_COMMIT_LAG}'
+            ORDER BY created_at, id
+            LIMIT {_PAGE_SIZE}
+            """,
+            after_ts,
+            after_id,
+        )
+        for row in rows:
+            for q in QuizQuestionList.validate_json(row["questions"]):
+                added += index.add(q.question, q.options, row["subject"], row["difficulty"])
+        if rows:
+            index.watermark = (rows[-1]["created_at"], rows[-1]["id"])
+        if len(rows) < _PAGE_SIZE:
+            return added
+
+
+def _settings():
+    from app.core.config import settings
+    return settings
+
+
+_index: SearchIndex | None = None
+_refresh_task: asyncio.Task | None = None
+
+
+def get_index() -> SearchIndex:
+    return preload()
+
+
+def preload() -> SearchIndex:
+    """Build the process's index from the snapshot (if any) and the fallback bank."""
+    global _index
+    if _index is None:
+        path = _settings().search_index_path
+        index = None
+        if path and os.path.exists(path):
+            start = time.perf_counter()
+            try:
+                index = SearchIndex.load(path)
+                logger.info("Search index loaded from %s: %d questions in %.0fms",
+                            path, len(index), (time.perf_counter() - start) * 1000)
+            except Exception as exc:
+                logger.warning("Ignoring search snapshot %s: %s", path, exc)
+        _index = index or SearchIndex()
+        add_fallback_bank(_index)
+    return _index
+
+
+async def _refresh_loop(index: SearchIndex, interval: float) -> None:
+    from app.core.database import get_read_pool
+
+    while True:
+        try:
+            added = await catch_up(index, await get_read_pool())
+            if added:
+                logger.info("Search index: %d new questions (%d total)", added, len(index))
+            if index.pending >= _settings().search_merge_threshold:
+                await index.merge()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Search index refresh failed: %s", exc)
+        await asyncio.sleep(interval)
+
+
+def start_search_index() -> None:
+    global _refresh_task
+    if _refresh_task is None:
+        _refresh_task = asyncio.get_running_loop().create_task(
+            _refresh_loop(get_index(), _settings().search_refresh_seconds))
+
+
+async def close_search_index() -> None:
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
+    path = _settings().search_index_path
+    if path and _index is not None:
+        try:
+            await asyncio.to_thread(_index.save, path)
+        except Exception as exc:
+            logger.warning("Could not write search snapshot %s: %s", path, exc)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+async def _build(path: str) -> None:
+    import asyncpg
+
+    conn = await asyncpg.connect(_settings().database_url)
+    try:
+        index = SearchIndex.load(path) if os.path.exists(path) else SearchIndex()
+        start = time.perf_counter()
+        added = add_fallback_bank(index) + await catch_up(index, conn)
+    finally:
+        await conn.close()
+    index.save(path)
+    logger.info("Search snapshot %s: %d new, %d questions, %d terms (%.1fs)",
+                path, added, len(index), len(index.vocab), time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(name)s | %(levelname)s | %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--build", action="store_true", help="Bring the snapshot up to date with the database")
+    parser.add_argument("--path", default=None, help="Snapshot file (default: SEARCH_INDEX_PATH)")
+    args = parser.parse_args()
+    target = args.path or _settings().search_index_path
+    if not args.build or not target:
+        parser.error("--build and a snapshot path (--path or SEARCH_INDEX_PATH) are required")
+    asyncio.run(_build(target))
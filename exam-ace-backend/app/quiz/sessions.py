@@ -0,0 +1,394 @@
+"""
+In-progress quiz sessions in Redis, between /quiz/generate and /quiz/submit.
+
+- /quiz/generate opens a session: a hash `quizsession:{quiz_id}` with the
+  owner, question count, start time and the user's time_limit / auto_submit
+  settings; saved answers are fields `a:<index>` beside them
+- PATCH /quiz/{quiz_id}/answers writes changed answers with one Lua call
+  (ownership, deadline and index checks included) — no Postgres involved
+- GET /quiz/{quiz_id}/session returns questions, saved answers and the
+  remaining time so a refreshed client can resume
+- With a time limit and auto_submit, the session's deadline (limit plus
+  QUIZ_SESSION_GRACE_SECONDS) is queued in the `quizsession:deadlines`
+  sorted set.  Every process runs an ExpiryWorker; whichever one claims an
+  expired entry grades the saved answers and writes the attempt, once.  A
+  claim moves the entry to `quizsession:claimed` with a lease in one Lua
+  call; a failed or cancelled auto-submit puts it back, and claims whose
+  lease ran out (the worker died) are put back by the next pass anywhere.
+
+Without Redis, quizzes still work — they just cannot be autosaved or resumed,
+and time limits are left to the client.
+"""
+from __future__ import annotations
+
+import time
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from app.core import metrics
+from app.core import redis as redis_mod
+
+logger = logging.getLogger(__name__)
+
+_DEADLINES_KEY = "quizsession:deadlines"
+_CLAIMS_KEY = "quizsession:claimed"
+_META_FIELDS = 6  # u, n, s, l, d, as — everything else in the hash is an answer
+_EXPIRY_POLL_INTERVAL = 1.0
+_EXPIRY_BATCH = 50
+_EXPIRY_RETRY_DELAY = 5.0
+_CLAIM_LEASE = 60.0  # seconds a claimed auto-submit may take before another pass retries it
+
+# KEYS[1] = session hash
+# ARGV = user_id, now, then index/answer pairs ("" clears the answer)
+# Returns {answered} or {error}: -1 not found / not yours, -2 past the deadline, -3 bad index
+_SAVE_ANSWERS_LUA = """
+local meta = redis.call('HMGET', KEYS[1], 'u', 'n', 'd')
+if not meta[1] or meta[1] ~= ARGV[1] then return {-1} end
+if meta[3] ~= '' and tonumber(ARGV[2]) > tonumber(meta[3]) then return {-2} end
+local n = tonumber(meta[2])
+for i = 3, #ARGV, 2 do
+  if tonumber(ARGV[i]) >= n then return {-3} end
+end
+for i = 3, #ARGV, 2 do
+  if ARGV[i + 1] == '' then
+    redis.call('HDEL', KEYS[1], 'a:' .. ARGV[i])
+  else
+    redis.call('HSET', KEYS[1], 'a:' .. ARGV[i], ARGV[i + 1])
+  end
+end
+return {redis.call('HLEN', KEYS[1]) - %d}
+""" % _META_FIELDS
+
+# KEYS = deadlines, claims; ARGV = quiz_id, lease expiry.  Returns 1 if this call claimed it
+_CLAIM_LUA = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then return 0 end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return 1
+"""
+
+# KEYS = deadlines, claims; ARGV = due time, then quiz ids ("" = every claim whose lease is before ARGV[1])
+# Moves claims back onto the deadline queue; returns how many
+_REQUEUE_LUA = """
+local ids = {}
+if ARGV[2] == '' then
+  ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, 100)
+else
+  for i = 2, #ARGV do ids[#ids + 1] = ARGV[i] end
+end
+local moved = 0
+for _, id in ipairs(ids) do
+  if redis.call('ZREM', KEYS[2], id) == 1 then
+    redis.call('ZADD', KEYS[1], ARGV[1], id)
+    moved = moved + 1
+  end
+end
+return moved
+"""
+
+_registered: dict[tuple[int, str], object] = {}
+
+
+class SessionsUnavailableError(Exception):
+    """Redis is down, so answers cannot be autosaved."""
+
+
+class SessionNotFoundError(Exception):
+    """No open session for this quiz and user (never opened, submitted or expired)."""
+
+
+class SessionExpiredError(Exception):
+    """The session's time limit (plus grace) has passed."""
+
+
+@dataclass(slots=True)
+class QuizSession:
+    quiz_id: str
+    user_id: str
+    answers: list[int | None]
+    started_at: float
+    time_limit: int | None  # minutes, as in UserSettings
+    auto_submit: bool
+    deadline: float | None  # epoch seconds after which answers are refused
+
+    @property
+    def expires_at(self) -> float | None:
+        return self.started_at + self.time_limit * 60 if self.time_limit else None
+
+    @property
+    def elapsed(self) -> float:
+        return max(0.0, time.time() - self.started_at)
+
+    @property
+    def remaining(self) -> float | None:
+        return max(0.0, self.expires_at - time.time()) if self.expires_at else None
+
+
+def _settings():
+    from app.core.config import settings
+    return settings
+
+
+def _key(quiz_id: str) -> str:
+    return f"quizsession:{quiz_id}"
+
+
+def _script(client, lua: str = _SAVE_ANSWERS_LUA):
+    script = _registered.get((id(client), lua))
+    if script is None:
+        script = _registered[(id(client), lua)] = client.register_script(lua)
+    return script
+
+
+def _parse(quiz_id: str, fields: dict) -> QuizSession:
+    total = int(fields["n"])
+    answers: list[int | None] = [None] * total
+    for name, value in fields.items():
+        if name.startswith("a:"):
+            index = int(name[2:])
+            if index < total:
+                answers[index] = int(value)
+    return QuizSession(
+        quiz_id=quiz_id,
+        user_id=fields["u"],
+        answers=answers,
+        started_at=float(fields["s"]),
+        time_limit=int(fields["l"]) if fields["l"] else None,
+        auto_submit=fields["as"] == "1",
+        deadline=float(fields["d"]) if fields["d"] else None,
+    )
+
+
+async def quiz_timing(user_id: str) -> tuple[int | None, bool]:
+    """The user's (time_limit, auto_submit) settings, defaults if none are saved or the database is down."""
+    from app.core.database import get_read_pool
+    from app.quiz import spool
+
+    try:
+        row = await (await get_read_pool(user_id)).fetchrow(
+            "SELECT time_limit, auto_submit FROM user_settings WHERE user_id = $1::uuid",
+            uuid.UUID(user_id),
+        )
+    except Exception as exc:
+        if not spool.is_outage(exc):
+            raise
+        # The quiz can still be served (and spooled) while the database is down, untimed
+        logger.warning("Could not read quiz timing for user %s: %s", user_id, exc)
+        return None, False
+    if row is None:
+        return None, False
+    return row["time_limit"], row["auto_submit"]
+
+
+async def start(quiz_id: str, user_id: str, total: int, time_limit: int | None,
+                auto_submit: bool) -> QuizSession | None:
+    """Open the session for a freshly generated quiz; None if Redis is unavailable."""
+    client = redis_mod.get_redis()
+    if client is None:
+        return None
+    cfg = _settings()
+    now = time.time()
+    deadline = now + time_limit * 60 + cfg.quiz_session_grace_seconds if time_limit else None
+    ttl = cfg.quiz_session_ttl + (time_limit or 0) * 60
+
+    pipe = client.pipeline(transaction=True)
+    pipe.hset(_key(quiz_id), mapping={
+        "u": user_id, "n": total, "s": repr(now), "l": time_limit or "",
+        "d": repr(deadline) if deadline else "", "as": int(auto_submit),
+    })
+    pipe.expire(_key(quiz_id), ttl)
+    if deadline and auto_submit:
+        pipe.zadd(_DEADLINES_KEY, {quiz_id: deadline})
+    try:
+        await redis_mod.call("quiz_session_start", pipe.execute())
+    except Exception as exc:
+        logger.warning("Could not open quiz session %s: %s", quiz_id, exc)
+        return None
+    metrics.QUIZ_SESSION_EVENTS.inc("started")
+    return QuizSession(quiz_id, user_id, [None] * total, now, time_limit, auto_submit, deadline)
+
+
+async def save_answers(quiz_id: str, user_id: str, answers: dict[int, int | None]) -> int:
+    """Apply changed answers; returns how many questions are now answered."""
+    client = redis_mod.get_redis()
+    if client is None:
+        raise SessionsUnavailableError("Redis unavailable")
+    args: list = [user_id, repr(time.time())]
+    for index, answer in answers.items():
+        args += [index, "" if answer is None else answer]
+    try:
+        (result,) = await redis_mod.call("quiz_session_save", _script(client)(keys=[_key(quiz_id)], args=args))
+    except Exception as exc:
+        raise SessionsUnavailableError(str(exc)) from exc
+    if result == -1:
+        raise SessionNotFoundError(quiz_id)
+    if result == -2:
+        raise SessionExpiredError(quiz_id)
+    if result == -3:
+        raise IndexError("Answer index out of range.")
+    metrics.QUIZ_SESSION_EVENTS.inc("autosaved")
+    return result
+
+
+async def load(quiz_id: str, user_id: str) -> QuizSession | None:
+    """The open session for this quiz, if it exists and belongs to `user_id`."""
+    client = redis_mod.get_redis()
+    if client is None:
+        return None
+    try:
+        fields = await redis_mod.call("quiz_session_load", client.hgetall(_key(quiz_id)))
+    except Exception as exc:
+        logger.warning("Could not load quiz session %s: %s", quiz_id, exc)
+        return None
+    if not fields or fields.get("u") != user_id:
+        return None
+    return _parse(quiz_id, fields)
+
+
+async def finish(quiz_id: str) -> None:
+    """Drop the session and its deadline once the attempt has been scored."""
+    client = redis_mod.get_redis()
+    if client is None:
+        return
+    pipe = client.pipeline(transaction=True)
+    pipe.delete(_key(quiz_id))
+    pipe.zrem(_DEADLINES_KEY, quiz_id)
+    pipe.zrem(_CLAIMS_KEY, quiz_id)
+    try:
+        await redis_mod.call("quiz_session_finish", pipe.execute())
+    except Exception as exc:
+        logger.warning("Could not close quiz session %s: %s", quiz_id, exc)
+
+
+# ---------------------------------------------------------------------------
+# Auto-submit on expiry
+# ---------------------------------------------------------------------------
+
+class ExpiryWorker:
+    """Polls the deadline queue and auto-submits expired sessions."""
+
+    def __init__(self, poll_interval: float = _EXPIRY_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.submitted = 0
+        self.errors = 0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.run_once()
+            except Exception as exc:
+                self.errors += 1
+                logger.warning("Quiz session expiry pass failed: %s", exc)
+
+    async def run_once(self) -> int:
+        """Auto-submit every session past its deadline that this process claims."""
+        client = redis_mod.get_redis()
+        if client is None:
+            return 0
+        keys = [_DEADLINES_KEY, _CLAIMS_KEY]
+        now = time.time()
+        recovered = await redis_mod.call("quiz_session_recover", _script(client, _REQUEUE_LUA)(
+            keys=keys, args=[repr(now), ""]))
+        if recovered:
+            logger.warning("Requeued %d quiz auto-submits whose claim ran out.", recovered)
+        due = await redis_mod.call("quiz_session_due", client.zrangebyscore(
+            _DEADLINES_KEY, "-inf", repr(now), start=0, num=_EXPIRY_BATCH))
+        done = 0
+        for quiz_id in due:
+            # Exactly one process gets 1 back
+            if not await redis_mod.call("quiz_session_claim", _script(client, _CLAIM_LUA)(
+                    keys=keys, args=[quiz_id, repr(time.time() + _CLAIM_LEASE)])):
+                continue
+            submitted = False
+            try:
+                await self._auto_submit(client, quiz_id)
+                submitted = True
+                done += 1
+            except Exception as exc:
+                self.errors += 1
+                logger.warning("Auto-submit of quiz %s failed (%s) — retrying in %.0fs.",
+                               quiz_id, exc, _EXPIRY_RETRY_DELAY)
+            finally:
+                # Also on cancellation (shutdown mid-pass).  If this fails too, the
+                # lease runs out and a later pass requeues the claim.
+                try:
+                    if submitted:
+                        await redis_mod.call("quiz_session_release", client.zrem(_CLAIMS_KEY, quiz_id))
+                    else:
+                        await redis_mod.call("quiz_session_requeue", _script(client, _REQUEUE_LUA)(
+                            keys=keys, args=[repr(time.time() + _EXPIRY_RETRY_DELAY), quiz_id]))
+                except Exception as exc:
+                    logger.warning("Could not release the auto-submit claim on quiz %s: %s", quiz_id, exc)
+        return done
+
+    async def _auto_submit(self, client, quiz_id: str) -> None:
+        from app.core.database import get_pool, mark_write
+        from app.quiz import item_stats, reviews, spool
+        from app.quiz.models import QuizQuestionList
+        from app.quiz.scoring import grade, store_score
+
+        fields = await redis_mod.call("quiz_session_load", client.hgetall(_key(quiz_id)))
+        if not fields:
+            logger.warning("Quiz session %s expired before it could be auto-submitted.", quiz_id)
+            return
+        session = _parse(quiz_id, fields)
+        pool = get_pool()
+        try:
+            row = await pool.fetchrow(
+                "SELECT subject, difficulty, questions, score FROM quiz_attempts WHERE id = $1 AND user_id = $2::uuid",
+                uuid.UUID(quiz_id),
+                uuid.UUID(session.user_id),
+            )
+        except Exception as exc:
+            # Still gradable if the attempt is in this process's write spool; retried otherwise
+            row = spool.pending(quiz_id, session.user_id)
+            if row is None or not spool.is_outage(exc):
+                raise
+        row = row or spool.pending(quiz_id, session.user_id)
+        if row is not None and row["score"] is None:
+            questions = QuizQuestionList.validate_json(row["questions"])
+            graded = grade(questions, session.answers[:len(questions)])
+            if await store_score(pool, quiz_id, session.user_id, session.answers[:len(questions)], graded.score):
+                await mark_write(session.user_id)
+                self.submitted += 1
+                metrics.QUIZ_SESSION_EVENTS.inc("auto_submitted")
+                logger.info("Auto-submitted quiz %s for user %s: %d/%d",
+                            quiz_id, session.user_id, graded.correct, graded.total)
+                await reviews.record(session.user_id, row["subject"], row["difficulty"], questions,
+                                     session.answers[:len(questions)])
+                item_stats.record(row["subject"], row["difficulty"], questions, session.answers[:len(questions)])
+        await redis_mod.call("quiz_session_finish", client.delete(_key(quiz_id)))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_worker: ExpiryWorker | None = None
+
+
+def start_expiry_worker() -> ExpiryWorker:
+    global _worker
+    if _worker is None:
+        _worker = ExpiryWorker()
+        _worker.start()
+    return _worker
+
+
+async def close_expiry_worker() -> None:
+    global _worker
+    if _worker is not None:
+        await _worker.close()
+        _worker = None
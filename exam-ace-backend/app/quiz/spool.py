@@ -0,0 +1,480 @@
+"""
+Local write-ahead spool for quiz_attempts writes made while Postgres is down.
+
+- When an attempt insert (POST /quiz/generate, /quiz/record, /quiz/record/batch)
+  or a score update (POST /quiz/submit, session auto-submit) fails because the
+  database cannot be reached — connection errors, pool or statement timeouts,
+  see is_outage() — the write is appended to a log under SPOOL_DIR and the
+  user gets their answer as usual.  Constraint and data errors still fail.
+- One entry per line, `<crc32> <json>`: a line torn by a crash fails its
+  checksum and is dropped
+- SPOOL_FSYNC: `always` fsyncs before the request is acknowledged (concurrent
+  appends share one fsync), `everysec` once a second in the background,
+  `no` leaves it to the OS
+- Every SPOOL_REPLAY_SECONDS the log is replayed in order, each entry in its
+  own transaction, stopping at the first outage.  Replay is idempotent:
+  inserts skip ids already in quiz_attempts, score updates only touch
+  unscored attempts — an entry applied twice (crash between commit and
+  delete), or a write that did commit before its connection failed, changes
+  nothing.  An entry the database rejects is logged and
+  dropped so it cannot block the ones behind it.
+- Replayed attempts without a client_attempt_id get created_at = now(), so
+  the search index's catch-up (which only reads forward) still sees them
+- Attempts still waiting in this process's spool can be submitted (pending())
+- Each process appends to its own segment files and holds an flock on them;
+  segments no live process holds (their writer died) are adopted and replayed
+  by whichever process finds them first
+- Entries and bytes waiting are exported as examace_spool_* at /metrics
+
+SPOOL_DIR must be on local disk; the spool only survives restarts if the
+directory does.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import zlib
+import fcntl
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+import asyncpg
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+_OUTAGE_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.OperatorInterventionError,  # admin shutdown, cannot connect now, statement timeout
+    asyncpg.TooManyConnectionsError,
+)
+
+_INSERT_ATTEMPTS = """
+INSERT INTO quiz_attempts (id, user_id, subject, difficulty, questions, score, client_attempt_id, created_at)
+SELECT a.id, $1::uuid, a.subject, a.difficulty, a.questions::jsonb, a.score, a.client_attempt_id,
+       -- Generated quizzes are stamped at replay, or the search index's (created_at, id)
+       -- watermark may already be past them; client records keep theirs (part of their key)
+       CASE WHEN a.client_attempt_id IS NULL THEN now() ELSE a.created_at END
+FROM unnest($2::uuid[], $3::text[], $4::text[], $5::text[], $6::float8[], $7::text[], $8::timestamptz[])
+    AS a(id, subject, difficulty, questions, score, client_attempt_id, created_at)
+-- The key is (id, created_at), and a live insert that timed out after
+-- committing got the database's created_at, not the spooled one
+WHERE NOT EXISTS (SELECT 1 FROM quiz_attempts q WHERE q.id = a.id)
+ON CONFLICT DO NOTHING
+"""
+
+_STORE_SCORE = """
+UPDATE quiz_attempts
+SET answers = $1::jsonb, score = $2
+WHERE id = $3 AND user_id = $4::uuid AND score IS NULL
+"""
+
+
+def is_outage(exc: BaseException) -> bool:
+    """True if `exc` means the database could not be reached, rather than that it rejected the write."""
+    return isinstance(exc, _OUTAGE_ERRORS)
+
+
+def _encode(entry: dict) -> bytes:
+    data = json.dumps(entry, separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(data), data)
+
+
+def _decode(line: bytes) -> dict | None:
+    """The entry on `line`, or None if it is torn or corrupt."""
+    if not line.endswith(b"\n") or len(line) < 10 or line[8:9] != b" ":
+        return None
+    data = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(data):
+            return None
+        return json.loads(data)
+    except ValueError:
+        return None
+
+
+class _Segment:
+    """One log file, flocked by this process until it has been replayed and deleted."""
+
+    __slots__ = ("path", "fd", "entries", "size", "offset", "applied", "synced")
+
+    def __init__(self, path: str, fd: int, entries: int = 0, size: int = 0):
+        self.path = path
+        self.fd = fd
+        self.entries = entries  # written
+        self.size = size
+        self.offset = 0  # bytes replayed
+        self.applied = 0  # entries replayed (or dropped)
+        self.synced = entries  # entries known to be on disk
+
+
+class Spool:
+    def __init__(self, directory: str, fsync: str, replay_interval: float):
+        self.directory = directory
+        self.fsync = fsync
+        self.replay_interval = replay_interval
+        self._active: _Segment | None = None
+        self._sealed: list[_Segment] = []  # oldest first
+        self._seq = 0
+        self._sync_lock = asyncio.Lock()
+        self._replay_lock = asyncio.Lock()
+        # quiz_id -> attempt (or score) written to this process's spool and not yet replayed
+        self._pending: dict[str, dict] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._outage_logged = False
+
+    # -- depth ---------------------------------------------------------------
+
+    def _segments(self) -> list[_Segment]:
+        return self._sealed + ([self._active] if self._active is not None else [])
+
+    @property
+    def entries(self) -> int:
+        """Entries waiting to be replayed."""
+        return sum(s.entries - s.applied for s in self._segments())
+
+    @property
+    def bytes(self) -> int:
+        return sum(s.size - s.offset for s in self._segments())
+
+    # -- writing -------------------------------------------------------------
+
+    def _open_segment(self) -> _Segment:
+        self._seq += 1
+        name = f"spool-{time.time_ns() // 1_000_000}-{os.getpid()}-{self._seq}.log"
+        path = os.path.join(self.directory, name)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return _Segment(path, fd)
+
+    async def append(self, entry: dict) -> None:
+        """Write `entry` to the log; with SPOOL_FSYNC=always, returns once it is on disk."""
+        line = _encode(entry)
+        if self._active is None:
+            self._active = self._open_segment()
+        segment = self._active
+        os.write(segment.fd, line)  # O_APPEND, and nothing else writes between awaits
+        segment.entries += 1
+        segment.size += len(line)
+        self._index(entry)
+        metrics.SPOOL_EVENTS.inc(entry["op"], "spooled")
+        if self.fsync == "always":
+            await self._sync(segment, segment.entries)
+
+    async def _sync(self, segment: _Segment, upto: int) -> None:
+        """fsync `segment` unless a sync that started after entry `upto` was written already did."""
+        async with self._sync_lock:
+            if segment.synced >= upto or segment.fd < 0:
+                return
+            written = segment.entries
+            await asyncio.to_thread(os.fsync, segment.fd)
+            segment.synced = written
+
+    def _index(self, entry: dict) -> None:
+        if entry["op"] == "attempts":
+            for row in entry["rows"]:
+                self._pending[row["id"]] = {
+                    "user_id": entry["user_id"],
+                    "subject": row["subject"],
+                    "difficulty": row["difficulty"],
+                    "questions": row["questions"],
+                    "score": row["score"],
+                }
+        elif entry["op"] == "score":
+            # Kept until this update is replayed too, so a second submit still gets a 409
+            attempt = self._pending.setdefault(entry["id"], {"user_id": entry["user_id"]})
+            attempt.update(score=entry["score"], score_spooled=True)
+
+    def pending(self, quiz_id: str, user_id: str) -> dict | None:
+        attempt = self._pending.get(quiz_id)
+        if attempt is None or attempt["user_id"] != user_id:
+            return None
+        return attempt
+
+    # -- replay --------------------------------------------------------------
+
+    def _adopt(self) -> None:
+        """Take over segments whose writer is gone (nobody holds their flock)."""
+        mine = {s.path for s in self._segments()}
+        try:
+            names = sorted(n for n in os.listdir(self.directory) if n.startswith("spool-") and n.endswith(".log"))
+        except FileNotFoundError:
+            return
+        adopted = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if path in mine:
+                continue
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue  # replayed and deleted by another process meanwhile
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            if not os.path.exists(path):
+                os.close(fd)  # deleted between listdir and flock
+                continue
+            with open(path, "rb") as f:
+                entries = sum(1 for _ in f)
+            adopted.append(_Segment(path, fd, entries, os.fstat(fd).st_size))
+            logger.warning("Adopted spool segment %s (%d entries) from a process that is gone", name, entries)
+        # Older than anything this process has written since it started
+        self._sealed[:0] = adopted
+
+    async def _rotate(self) -> None:
+        """Seal the active segment so new appends go to a fresh one while it is replayed."""
+        segment = self._active
+        if segment is None or segment.entries == 0:
+            return
+        self._active = None
+        if self.fsync != "no":
+            await self._sync(segment, segment.entries)
+        self._sealed.append(segment)
+
+    async def _drop(self, segment: _Segment) -> None:
+        async with self._sync_lock:
+            os.unlink(segment.path)
+            os.close(segment.fd)
+            segment.fd = -1
+        self._sealed.remove(segment)
+
+    async def _apply(self, conn, entry: dict) -> None:
+        from app.users import profile_cache
+
+        if entry["op"] == "attempts":
+            rows = entry["rows"]
+            async with conn.transaction():
+                if entry.get("profile"):
+                    await profile_cache.ensure_profile(conn, entry["user_id"])
+                await conn.execute(
+                    _INSERT_ATTEMPTS,
+                    uuid.UUID(entry["user_id"]),
+                    [uuid.UUID(r["id"]) for r in rows],
+                    [r["subject"] for r in rows],
+                    [r["difficulty"] for r in rows],
+                    [r["questions"] for r in rows],
+                    [r["score"] for r in rows],
+                    [r["client_attempt_id"] for r in rows],
+                    [datetime.fromisoformat(r["created_at"]) for r in rows],
+                )
+        elif entry["op"] == "score":
+            await conn.execute(_STORE_SCORE, json.dumps(entry["answers"]), entry["score"],
+                               uuid.UUID(entry["id"]), uuid.UUID(entry["user_id"]))
+        else:
+            raise ValueError(f"unknown spool op {entry['op']!r}")
+
+    def _forget(self, entry: dict) -> None:
+        if entry["op"] == "attempts":
+            for row in entry["rows"]:
+                if not self._pending.get(row["id"], {}).get("score_spooled"):
+                    self._pending.pop(row["id"], None)
+        elif entry["op"] == "score":
+            self._pending.pop(entry["id"], None)
+
+    async def _replay_segment(self, conn, segment: _Segment) -> int:
+        from app.core.database import mark_write
+
+        applied = 0
+        with open(segment.path, "rb") as f:
+            f.seek(segment.offset)
+            for line in f:
+                entry = _decode(line)
+                if entry is None:
+                    if line.endswith(b"\n"):
+                        logger.error("Dropping corrupt spool entry in %s at byte %d", segment.path, segment.offset)
+                    else:
+                        logger.warning("Dropping torn last spool entry in %s", segment.path)
+                    metrics.SPOOL_EVENTS.inc("unknown", "corrupt")
+                else:
+                    try:
+                        await self._apply(conn, entry)
+                    except Exception as exc:
+                        if is_outage(exc):
+                            raise
+                        logger.error("Dropping spool entry the database rejected (%s): %s",
+                                     exc, line[9:-1][:500].decode(errors="replace"))
+                        metrics.SPOOL_EVENTS.inc(entry.get("op", "unknown"), "rejected")
+                    else:
+                        metrics.SPOOL_EVENTS.inc(entry["op"], "replayed")
+                        await mark_write(entry["user_id"])
+                        applied += 1
+                    self._forget(entry)
+                segment.offset += len(line)
+                segment.applied += 1
+        return applied
+
+    async def replay(self) -> int:
+        """Replay every waiting entry, oldest first; returns how many were applied."""
+        from app.core.database import get_pool
+
+        async with self._replay_lock:
+            self._adopt()
+            await self._rotate()
+            if not self._sealed:
+                return 0
+            applied = 0
+            async with get_pool().acquire() as conn:
+                for segment in list(self._sealed):
+                    applied += await self._replay_segment(conn, segment)
+                    await self._drop(segment)
+            if applied:
+                logger.info("Replayed %d spooled writes (%d still waiting)", applied, self.entries)
+            return applied
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        if not self._tasks:
+            self._tasks.append(loop.create_task(self._replay_loop()))
+            if self.fsync == "everysec":
+                self._tasks.append(loop.create_task(self._sync_loop()))
+
+    async def _replay_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.replay_interval)
+            try:
+                await self.replay()
+                self._outage_logged = False
+            except Exception as exc:
+                # Still down: log once per outage, retry next pass
+                if not is_outage(exc) or not self._outage_logged:
+                    logger.warning("Spool replay stopped with %d entries waiting: %s", self.entries, exc)
+                self._outage_logged = is_outage(exc)
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(1.0)
+            segment = self._active
+            if segment is not None and segment.synced < segment.entries:
+                try:
+                    await self._sync(segment, segment.entries)
+                except OSError as exc:
+                    logger.error("Spool fsync failed: %s", exc)
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Stop the background tasks, try a last replay, then release the segments."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self.entries:
+            try:
+                await asyncio.wait_for(self.replay(), timeout)
+            except Exception as exc:
+                logger.warning("Spool not drained at shutdown (%s): %d entries left in %s",
+                               exc, self.entries, self.directory)
+        for segment in self._segments():
+            if self.fsync != "no":
+                os.fsync(segment.fd)
+            os.close(segment.fd)  # releases the flock; the next process adopts the file
+        self._active = None
+        self._sealed = []
+
+
+_spool: Spool | None = None
+
+
+async def _append(entry: dict, reason: str) -> bool:
+    try:
+        await _spool.append(entry)
+    except OSError as exc:
+        logger.error("Could not spool a %s write (%s): %s", entry["op"], reason, exc)
+        return False
+    logger.warning("%s — %s write spooled (%d waiting)", reason, entry["op"], _spool.entries)
+    return True
+
+
+async def capture(exc: BaseException, entry: dict) -> bool:
+    """
+    Spool `entry` if `exc` is an outage and the spool is running; False means
+    the caller should fail as it would have without a spool.
+    """
+    if _spool is None or not is_outage(exc):
+        return False
+    return await _append(entry, f"Database unavailable ({exc.__class__.__name__})")
+
+
+def attempts_entry(user_id: str, rows: list[dict], profile: bool = False) -> dict:
+    """
+    Spool entry inserting attempts for `user_id`.  Each row has id, subject,
+    difficulty, questions (JSON text), score, client_attempt_id and created_at
+    (defaults: no client id, now; only rows with a client id keep it at
+    replay); `profile` upserts the user's profile first.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        "op": "attempts",
+        "user_id": user_id,
+        "profile": profile,
+        "rows": [{
+            "id": str(r["id"]),
+            "subject": r["subject"],
+            "difficulty": r["difficulty"],
+            "questions": r["questions"],
+            "score": r.get("score"),
+            "client_attempt_id": r.get("client_attempt_id"),
+            "created_at": r["created_at"].isoformat() if r.get("created_at") else now,
+        } for r in rows],
+    }
+
+
+def pending(quiz_id: str, user_id: str) -> dict | None:
+    """The attempt as spooled (subject, difficulty, questions, score) if it has not reached the database yet."""
+    return _spool.pending(quiz_id, user_id) if _spool is not None else None
+
+
+async def store_score(quiz_id: str, user_id: str, answers: list[int | None], score: float,
+                      exc: BaseException | None = None) -> bool | None:
+    """
+    Spool a score update, for an attempt that is itself still spooled or
+    after the UPDATE failed with `exc`.  False if the spooled attempt is
+    already scored; None if nothing was spooled.
+    """
+    attempt = pending(quiz_id, user_id)
+    if attempt is not None and attempt["score"] is not None:
+        return False
+    entry = {"op": "score", "id": quiz_id, "user_id": user_id, "answers": answers, "score": score}
+    if attempt is not None:
+        # Queued behind its own insert, whatever the database's state
+        spooled = await _append(entry, "Attempt not in the database yet")
+    else:
+        spooled = exc is not None and await capture(exc, entry)
+    return True if spooled else None
+
+
+def stats() -> dict | None:
+    if _spool is None:
+        return None
+    return {"entries": _spool.entries, "bytes": _spool.bytes, "segments": len(_spool._segments())}
+
+
+def start_spool() -> Spool | None:
+    from app.core.config import settings
+
+    global _spool
+    if _spool is None and settings.spool_dir:
+        _spool = Spool(settings.spool_dir, settings.spool_fsync, settings.spool_replay_seconds)
+        _spool.start()
+    return _spool
+
+
+async def close_spool() -> None:
+    global _spool
+    if _spool is not None:
+        await _spool.close()
+        _spool = None
@@ -0,0 +1,212 @@
+"""
+Production entry point: one preloaded master, WEB_CONCURRENCY forked workers.
+
+    python -m app.server --host 0.0.0.0 --port 8000 --workers 4
+
+The master imports app.main and materializes the fallback question bank,
+then freezes the GC (so collections in the workers never write to the
+inherited objects) and forks.  Workers share those pages copy-on-write
+instead of each importing FastAPI, pydantic and the app on its own as
+`uvicorn --workers` does.  The master binds the listening socket; every
+worker accepts on it and runs its own lifespan — DB pool, Redis client,
+JWKS cache and rate limiter are per process, since connections cannot
+cross a fork.  Anything workers must agree on (read-your-writes pins for the
+replica, quiz sessions, job status) goes through Redis.
+
+- DB_CONNECTION_BUDGET caps connections per pool across all workers: each
+  worker's DB_POOL_MAX_SIZE becomes budget // workers
+- METRICS_PORT, if set, becomes METRICS_PORT + worker index: scrape each
+  worker's port.  Without it /metrics is on the shared socket, where every
+  scrape reaches whichever worker accepts it, so with more than one worker
+  the master warns at start
+- A worker that dies is replaced; one whose lifespan startup fails (bad
+  config, database down) shuts the server down instead
+- SIGTERM / SIGINT stop the workers gracefully; SIGUSR1 logs RSS / PSS / USS
+  per worker
+"""
+from __future__ import annotations
+
+import gc
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import argparse
+
+logger = logging.getLogger("app.server")
+
+_STARTUP_FAILED = 3  # uvicorn's exit status for a failed lifespan startup
+_RESPAWN_BACKOFF = 1.0  # seconds before replacing a worker that died right after starting
+
+
+def memory_usage(pid: int) -> dict[str, int]:
+    """RSS, PSS and USS (private pages) of `pid` in KiB, from /proc/<pid>/smaps_rollup."""
+    fields = {"Rss": "rss", "Pss": "pss", "Private_Clean": "uss", "Private_Dirty": "uss"}
+    usage = {"rss": 0, "pss": 0, "uss": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    usage[fields[name]] += int(rest.split()[0])
+    except OSError:
+        pass
+    return usage
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _preload():
+    """Everything the workers should inherit instead of building themselves."""
+    from app.main import app
+    from app.quiz import fallback_questions, search
+
+    fallback_questions.preload()
+    search.preload()
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def _configure_worker(index: int, workers: int) -> None:
+    from app.core.config import settings
+
+    if settings.db_connection_budget is not None:
+        max_size = max(1, settings.db_connection_budget // workers)
+        settings.db_pool_max_size = max_size
+        settings.db_pool_min_size = min(settings.db_pool_min_size, max_size)
+    if settings.metrics_port is not None:
+        settings.metrics_port += index
+
+
+def _run_worker(app, sock: socket.socket, index: int, args) -> None:
+    """Child process body; never returns."""
+    import uvicorn
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+    status = 0
+    try:
+        _configure_worker(index, args.workers)
+        config = uvicorn.Config(app, log_level=args.log_level, proxy_headers=args.proxy_headers,
+                                forwarded_allow_ips=args.forwarded_allow_ips,
+                                timeout_graceful_shutdown=args.graceful_timeout)
+        server = uvicorn.Server(config)
+        server.run(sockets=[sock])
+        if not server.started:
+            status = _STARTUP_FAILED
+    except BaseException:
+        logger.exception("Worker %d crashed", index)
+        status = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+
+class Master:
+    def __init__(self, app, sock: socket.socket, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers: dict[int, tuple[int, float]] = {}  # pid -> (index, started)
+        self.stopping = False
+        self.exit_status = 0
+
+    def spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(self.app, self.sock, index, self.args)
+        self.workers[pid] = (index, time.monotonic())
+        logger.info("Started worker %d (pid %d)", index, pid)
+
+    def stop(self, signum=None, _frame=None) -> None:
+        if not self.stopping:
+            logger.info("Stopping %d workers …", len(self.workers))
+        self.stopping = True
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report_memory(self, _signum=None, _frame=None) -> None:
+        master = memory_usage(os.getpid())
+        lines = [f"master pid {os.getpid()}: rss {master['rss']} KiB, pss {master['pss']} KiB"]
+        totals = {"rss": 0, "pss": 0, "uss": 0}
+        for pid, (index, _) in sorted(self.workers.items(), key=lambda item: item[1][0]):
+            usage = memory_usage(pid)
+            for key in totals:
+                totals[key] += usage[key]
+            lines.append(f"worker {index} pid {pid}: rss {usage['rss']} KiB, pss {usage['pss']} KiB, "
+                         f"uss {usage['uss']} KiB")
+        lines.append(f"workers total: rss {totals['rss']} KiB, pss {totals['pss']} KiB, uss {totals['uss']} KiB")
+        logger.info("Memory:\n  %s", "\n  ".join(lines))
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGUSR1, self.report_memory)
+        for index in range(self.args.workers):
+            self.spawn(index)
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index, started = self.workers.pop(pid, (None, 0.0))
+            if index is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code == _STARTUP_FAILED:
+                logger.error("Worker %d (pid %d) failed to start — shutting down.", index, pid)
+                self.exit_status = 1
+                self.stop()
+                continue
+            logger.warning("Worker %d (pid %d) exited with %d — restarting.", index, pid, code)
+            if time.monotonic() - started < _RESPAWN_BACKOFF:
+                time.sleep(_RESPAWN_BACKOFF)
+            self.spawn(index)
+        logger.info("All workers stopped.")
+        return self.exit_status
+
+
+def main(argv: list[str] | None = None) -> int:
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=settings.web_concurrency)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--proxy-headers", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--forwarded-allow-ips", default=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"))
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="Seconds a stopping worker waits for in-flight requests")
+    args = parser.parse_args(argv)
+
+    sock = _bind(args.host, args.port)
+    app = _preload()
+    logger.info("Preloaded app in master (pid %d); forking %d workers on %s:%d",
+                os.getpid(), args.workers, args.host, args.port)
+    if args.workers > 1 and settings.metrics_port is None:
+        logger.warning("METRICS_PORT is not set: with %d workers each /metrics scrape on port %d reaches "
+                       "one of them at random. Set METRICS_PORT and scrape METRICS_PORT … METRICS_PORT+%d.",
+                       args.workers, args.port, args.workers - 1)
+    return Master(app, sock, args).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,7 +11,7 @@ import logging
 from fastapi import APIRouter, Depends, HTTPException
 
 from app.auth.dependencies import get_current_user
-from app.core.database import get_pool
+from app.core.database import get_pool, get_read_pool, mark_write
 from app.settings.models import UserSettings
 
 logger = logging.getLogger(__name__)
@@ -21,7 +21,7 @@ router = APIRouter(prefix="/settings", tags=["Settings"])
 
 @router.get("", response_model=UserSettings)
 async def get_settings(user_id: str = Depends(get_current_user)):
-    pool = get_pool()
+    pool = await get_read_pool(user_id)
     row = await pool.fetchrow(
         "SELECT * FROM user_settings WHERE user_id = $1::uuid",
         uuid.UUID(user_id),
@@ -67,4 +67,5 @@ async def update_settings(
         body.auto_submit,
         body.show_explanations,
     )
+    await mark_write(user_id)
     return body
@@ -0,0 +1,102 @@
+"""
+Known-profile cache — remembers which user ids already have a `profiles` row
+so `/quiz/record` only runs its profile upsert the first time it sees a user.
+
+- Bounded in-process LRU (always on)
+- Optional Redis tier shared across processes (PROFILE_CACHE_SHARED=true)
+
+Only ids taken from verified JWTs are ever cached, and only after the database
+has confirmed the row exists (a `/users/me` hit or a completed upsert).
+"""
+from __future__ import annotations
+
+import uuid
+import logging
+from collections import OrderedDict
+
+from app.core import redis as redis_mod
+
+logger = logging.getLogger(__name__)
+
+_known: OrderedDict[str, None] = OrderedDict()
+
+
+def _settings():
+    from app.core.config import settings
+    return settings
+
+
+def _redis_key(user_id: str) -> str:
+    return f"profile:known:{user_id}"
+
+
+def _remember_local(user_id: str) -> None:
+    _known[user_id] = None
+    _known.move_to_end(user_id)
+    while len(_known) > _settings().profile_cache_size:
+        _known.popitem(last=False)
+
+
+async def mark_known(user_id: str) -> None:
+    """Record that `user_id` has a profile row."""
+    _remember_local(user_id)
+    cfg = _settings()
+    client = redis_mod.get_redis()
+    if client is None or not cfg.profile_cache_shared:
+        return
+    try:
+        await redis_mod.call("profile_mark", client.set(_redis_key(user_id), 1, ex=cfg.profile_cache_ttl))
+    except Exception as exc:
+        logger.warning("Could not share known profile %s via Redis: %s", user_id, exc)
+
+
+async def forget(user_id: str) -> None:
+    """Drop `user_id` — call when an insert proves the profile is gone."""
+    _known.pop(user_id, None)
+    client = redis_mod.get_redis()
+    if client is None or not _settings().profile_cache_shared:
+        return
+    try:
+        await redis_mod.call("profile_forget", client.delete(_redis_key(user_id)))
+    except Exception as exc:
+        logger.warning("Could not evict known profile %s from Redis: %s", user_id, exc)
+
+
+async def _is_known(user_id: str) -> bool:
+    if user_id in _known:
+        _known.move_to_end(user_id)
+        return True
+
+    client = redis_mod.get_redis()
+    if client is None or not _settings().profile_cache_shared:
+        return False
+    try:
+        found = await redis_mod.call("profile_lookup", client.exists(_redis_key(user_id)))
+    except Exception as exc:
+        logger.warning("Known-profile lookup in Redis failed: %s", exc)
+        return False
+    if found:
+        _remember_local(user_id)
+    return bool(found)
+
+
+async def ensure_profile(conn, user_id: str) -> None:
+    """
+    Make sure a profile row exists for `user_id` (Google OAuth users may not
+    have one yet).  `conn` is a pool or a connection; the upsert is skipped
+    for users already known to have a profile.
+    """
+    if await _is_known(user_id):
+        return
+
+    await conn.execute(
+        """
+        INSERT INTO profiles (id, email, display_name)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (id) DO NOTHING
+        """,
+        uuid.UUID(user_id),
+        f"{user_id}@oauth",  # placeholder, will be overwritten if trigger runs later
+        "User",
+    )
+    await mark_known(user_id)
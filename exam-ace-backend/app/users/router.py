@@ -8,20 +8,22 @@ import uuid
 from fastapi import APIRouter, Depends, HTTPException
 
 from app.auth.dependencies import get_current_user
-from app.core.database import get_pool
+from app.core.database import get_read_pool
+from app.users import profile_cache
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 
 @router.get("/me")
 async def get_me(user_id: str = Depends(get_current_user)):
-    pool = get_pool()
+    pool = await get_read_pool(user_id)
     row = await pool.fetchrow(
         "SELECT id, email, display_name, created_at FROM profiles WHERE id = $1::uuid",
         uuid.UUID(user_id),
     )
     if not row:
         raise HTTPException(status_code=404, detail="Profile not found.")
+    await profile_cache.mark_known(user_id)
     return {
         "id": str(row["id"]),
         "email": row["email"],
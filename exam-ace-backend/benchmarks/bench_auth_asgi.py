@@ -0,0 +1,85 @@
+"""
+Pure-ASGI JWTAuthMiddleware vs. the same authentication run inside Starlette's
+BaseHTTPMiddleware (the previous implementation), on a trivial authenticated
+endpoint under concurrent load.  Reports throughput and latency percentiles.
+
+    python -m benchmarks.bench_auth_asgi --requests 5000 --concurrency 50
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from fastapi import Depends, FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from app.auth.dependencies import get_current_user
+from app.auth.middleware import JWTAuthMiddleware
+from benchmarks.common import asgi_client, mint_token, summarize
+
+_SECRET = "bench-secret"
+
+
+class BaseHTTPAuthMiddleware(BaseHTTPMiddleware):
+    """The pre-ASGI shape: identical checks, wrapped in BaseHTTPMiddleware.dispatch."""
+
+    def __init__(self, app, **kwargs):
+        super().__init__(app)
+        self.auth = JWTAuthMiddleware(app, **kwargs)
+
+    async def dispatch(self, request, call_next):
+        header = request.headers.get("authorization", "")
+        if not header.startswith("Bearer "):
+            return JSONResponse({"detail": "Missing or malformed Authorization header."}, status_code=401)
+        request.state.user_id = await self.auth.authenticate(header[7:])
+        return await call_next(request)
+
+
+def _build_app(middleware_cls) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware_cls, jwt_secret=_SECRET)
+
+    @app.get("/ping")
+    async def ping(user_id: str = Depends(get_current_user)):
+        return {"user_id": user_id}
+
+    return app
+
+
+async def _load(app: FastAPI, token: str, requests: int, concurrency: int) -> tuple[float, dict]:
+    latencies: list[float] = []
+    remaining = iter(range(requests))
+
+    async with asgi_client(app, token) as client:
+        async def worker() -> None:
+            for _ in remaining:
+                start = time.perf_counter()
+                resp = await client.get("/ping")
+                latencies.append(time.perf_counter() - start)
+                resp.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return requests / elapsed, summarize(latencies)
+
+
+async def main(requests: int, concurrency: int) -> None:
+    token = mint_token(str(uuid.uuid4()), _SECRET)
+    await _load(_build_app(JWTAuthMiddleware), token, min(requests, 500), concurrency)  # warm-up
+
+    for name, cls in (("BaseHTTPMiddleware", BaseHTTPAuthMiddleware), ("pure ASGI", JWTAuthMiddleware)):
+        rps, latency = await _load(_build_app(cls), token, requests, concurrency)
+        print(f"{name:>18}: {rps:9.1f} req/s   p50={latency['p50_ms']:.2f}ms "
+              f"p95={latency['p95_ms']:.2f}ms p99={latency['p99_ms']:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,74 @@
+"""
+Requests/sec through JWTAuthMiddleware for a trivial authenticated endpoint,
+with the verified-token and per-kid key caches on and off, for HS256 and
+ES256 (JWKS) tokens.  No network or database needed.
+
+    python -m benchmarks.bench_auth_middleware --requests 5000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from app.auth import middleware as auth_mw
+from app.auth.dependencies import get_current_user
+from app.auth.jwks import get_jwks_cache
+from benchmarks.common import asgi_client, mint_token
+from benchmarks.fake_jwks import SigningKey
+
+_SECRET = "bench-secret"
+_SUPABASE_URL = "https://bench.invalid"
+
+
+def _build_app(token_cache_size: int) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(auth_mw.JWTAuthMiddleware, jwt_secret=_SECRET, supabase_url=_SUPABASE_URL,
+                       token_cache_size=token_cache_size)
+
+    @app.get("/ping")
+    async def ping(user_id: str = Depends(get_current_user)):
+        return {"user_id": user_id}
+
+    return app
+
+
+async def _run(token: str, cached: bool, requests: int) -> float:
+    app = _build_app(token_cache_size=10000 if cached else 0)
+    async with asgi_client(app, token) as client:
+        start = time.perf_counter()
+        for _ in range(requests):
+            if not cached:
+                get_jwks_cache(_SUPABASE_URL)._public_keys.clear()  # rebuild the key every time
+            resp = await client.get("/ping")
+            resp.raise_for_status()
+        return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int) -> None:
+    hs_token = mint_token(str(uuid.uuid4()), _SECRET)
+    signing_key = SigningKey()
+    es_token = signing_key.sign(str(uuid.uuid4()))
+    jwks = {"keys": [signing_key.jwk()]}
+    # Serve the JWKS in-process instead of from Supabase
+    get_jwks_cache(_SUPABASE_URL)._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json=jwks))
+    )
+
+    await _run(hs_token, cached=False, requests=min(requests, 200))  # warm-up
+    for name, token in (("HS256", hs_token), ("ES256", es_token)):
+        uncached = await _run(token, cached=False, requests=requests)
+        cached = await _run(token, cached=True, requests=requests)
+        print(f"{name}: {uncached:9.1f} req/s uncached   {cached:9.1f} req/s cached   ({cached / uncached:.2f}x)")
+    print(auth_mw.auth_cache_stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
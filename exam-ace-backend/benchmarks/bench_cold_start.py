@@ -0,0 +1,119 @@
+"""
+Cold start: time from spawning `uvicorn app.main:app` to the first successful
+authenticated request, with FAST_BOOT off and on.  Each run is a fresh
+process; the probe is GET /settings with an ES256 token, so it needs the
+JWKS (benchmarks.fake_jwks, run in-process with --jwks-latency standing in for
+the round trip to Supabase), a pooled DB connection and a query.
+
+    docker compose -f docker-compose.local.yml up -d
+    python -m benchmarks.bench_cold_start --runs 5 --jwks-latency 0.1
+
+Reports the median time-to-first-success per mode and the startup phases the
+app exported (examace_startup_phase_seconds) on its last run.  Connection
+settings default to the docker-compose ports, as in benchmarks.harness.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+
+import httpx
+
+from benchmarks import fake_jwks
+from benchmarks.harness import _DEFAULT_ENV
+
+
+async def _start_fake_jwks(port: int, latency: float):
+    import uvicorn
+
+    config = uvicorn.Config(fake_jwks.create_app(latency=latency), host="127.0.0.1", port=port,
+                            log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()  # surface bind errors
+        await asyncio.sleep(0.01)
+    return server, task
+
+
+def _startup_phases(metrics_text: str) -> dict[str, float]:
+    phases = {}
+    for line in metrics_text.splitlines():
+        if line.startswith("examace_startup_phase_seconds{"):
+            labels, value = line.rsplit(" ", 1)
+            phases[labels.split('"')[1]] = float(value)
+    return phases
+
+
+async def _cold_start(env: dict, port: int, token: str, timeout: float) -> tuple[float, dict]:
+    """Spawn the app and poll until an authenticated request succeeds."""
+    start = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+        env=env, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while True:
+                if time.perf_counter() - start > timeout:
+                    raise TimeoutError(f"no successful request within {timeout}s")
+                if proc.returncode is not None:
+                    raise RuntimeError(f"app exited with status {proc.returncode}")
+                try:
+                    resp = await client.get("/settings", headers={"Authorization": f"Bearer {token}"})
+                    if resp.status_code == 200:
+                        elapsed = time.perf_counter() - start
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.005)
+            metrics = await client.get("/metrics", headers={"Authorization": f"Bearer {env['METRICS_TOKEN']}"})
+            phases = _startup_phases(metrics.text)
+    finally:
+        proc.terminate()
+        await proc.wait()
+    return elapsed, phases
+
+
+async def run(args) -> None:
+    jwks_server, jwks_task = await _start_fake_jwks(args.jwks_port, args.jwks_latency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.jwks_port}") as client:
+            token = (await client.get("/token", params={"sub": str(uuid.uuid4())})).json()["access_token"]
+
+        base_env = {**os.environ, "SUPABASE_URL": f"http://127.0.0.1:{args.jwks_port}"}
+        for name, value in _DEFAULT_ENV.items():
+            base_env.setdefault(name, value)
+
+        print(f"{'mode':<12}{'median ms':>11}{'min ms':>9}{'max ms':>9}   startup phases (last run, ms)")
+        for fast_boot in ("false", "true"):
+            env = {**base_env, "FAST_BOOT": fast_boot}
+            times, phases = [], {}
+            for _ in range(args.runs):
+                elapsed, phases = await _cold_start(env, args.port, token, args.timeout)
+                times.append(elapsed * 1000)
+            breakdown = ", ".join(f"{phase} {seconds * 1000:.0f}" for phase, seconds in phases.items())
+            print(f"{'FAST_BOOT=' + fast_boot:<12}{statistics.median(times):>11.1f}"
+                  f"{min(times):>9.1f}{max(times):>9.1f}   {breakdown}")
+    finally:
+        jwks_server.should_exit = True
+        await jwks_task
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts per mode")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the spawned app")
+    parser.add_argument("--jwks-port", type=int, default=54329)
+    parser.add_argument("--jwks-latency", type=float, default=0.1, help="Seconds the fake JWKS takes to answer")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Give up on a start after this long")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
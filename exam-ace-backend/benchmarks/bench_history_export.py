@@ -0,0 +1,145 @@
+"""
+History export at scale: one user with --rows attempts (default 100k),
+exported through GET /quiz/history/export from a real `uvicorn app.main:app`
+process while its RSS is sampled.  Checks that every row arrives and that the
+server grew by less than --max-growth-mb, however big the export.
+
+    docker compose -f docker-compose.local.yml up -d
+    python -m benchmarks.bench_history_export --rows 100000
+
+Runs NDJSON with questions and answers, CSV, and a slow client that reads in
+small pieces with pauses (the server must wait for it rather than buffer the
+export).  The attempts are inserted with one generate_series statement and
+deleted afterwards.  Connection settings default to the docker-compose ports,
+as in benchmarks.harness.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import subprocess
+
+import asyncpg
+import httpx
+
+from app.server import memory_usage
+from benchmarks.common import mint_token
+from benchmarks.harness import _DEFAULT_ENV
+
+_QUESTIONS = json.dumps([{
+    "question": f"Benchmark question {i}: which statement about the topic is correct?",
+    "options": [f"Option {c}, a plausible distractor" for c in "ABCD"],
+    "correct_index": i % 4,
+    "explanation": "A reasonably long explanation of why the keyed option is the right one.",
+} for i in range(10)])
+
+
+async def _seed(conn, user_id: uuid.UUID, rows: int) -> None:
+    await conn.execute("INSERT INTO profiles (id, email) VALUES ($1, $2)", user_id, f"{user_id}@bench.local")
+    await conn.execute(
+        """
+        INSERT INTO quiz_attempts (user_id, subject, difficulty, questions, answers, score, created_at)
+        SELECT $1, 'Physics', 'intermediate', $2::jsonb, '[0,1,2,3,0,1,2,3,0,1]'::jsonb,
+               round((random() * 100)::numeric, 2), now() - g * interval '1 second'
+        FROM generate_series(1, $3) AS g
+        """,
+        user_id, _QUESTIONS, rows,
+    )
+
+
+async def _export(client: httpx.AsyncClient, pid: int, params: dict, slow: bool) -> dict:
+    baseline = memory_usage(pid)["rss"]
+    peak = baseline
+    received = lines = 0
+    start = time.perf_counter()
+    first_byte = None
+    async with client.stream("GET", "/quiz/history/export", params=params) as resp:
+        resp.raise_for_status()
+        async for chunk in resp.aiter_raw(4096 if slow else 65536):
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            received += len(chunk)
+            lines += chunk.count(b"\n")
+            peak = max(peak, memory_usage(pid)["rss"])
+            if slow:
+                await asyncio.sleep(0.0005)
+    return {
+        "seconds": time.perf_counter() - start,
+        "first_byte_ms": (first_byte or 0) * 1000,
+        "mb": received / 1e6,
+        "lines": lines,
+        "growth_mb": (peak - baseline) / 1024,
+    }
+
+
+async def main(args) -> int:
+    env = dict(os.environ)
+    for name, value in _DEFAULT_ENV.items():
+        env.setdefault(name, value)
+    user_id = uuid.uuid4()
+    conn = await asyncpg.connect(env["DATABASE_URL"])
+    start = time.perf_counter()
+    await _seed(conn, user_id, args.rows)
+    print(f"seeded {args.rows} attempts in {time.perf_counter() - start:.1f}s")
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env,
+    )
+    failed = False
+    try:
+        token = mint_token(str(user_id), env["SUPABASE_JWT_SECRET"])
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=120,
+                                     headers={"Authorization": f"Bearer {token}"}) as client:
+            deadline = time.perf_counter() + args.timeout
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"server exited with status {proc.returncode}")
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"server did not become healthy within {args.timeout}s")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            # Warm up: the first export pays for imports and pool connections
+            await _export(client, proc.pid, {"format": "csv"}, slow=False)
+
+            runs = [
+                ("ndjson + questions", {"format": "ndjson", "include_questions": "true"}, False, args.rows),
+                ("csv", {"format": "csv"}, False, args.rows + 1),  # header line
+                ("ndjson, slow client", {"format": "ndjson"}, True, args.rows),
+            ]
+            for name, params, slow, expected in runs:
+                result = await _export(client, proc.pid, params, slow)
+                ok = result["lines"] == expected and result["growth_mb"] < args.max_growth_mb
+                failed |= not ok
+                print(f"{name:<20} {result['lines']} lines, {result['mb']:.1f}MB in {result['seconds']:.2f}s "
+                      f"(first byte {result['first_byte_ms']:.0f}ms), server RSS +{result['growth_mb']:.1f}MB  "
+                      f"{'ok' if ok else 'FAIL'}")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        await conn.execute("DELETE FROM profiles WHERE id = $1", user_id)  # cascades to the attempts
+        await conn.close()
+
+    print(f"\n{'FAIL' if failed else 'PASS'}: {args.rows} rows per export, RSS ceiling +{args.max_growth_mb}MB")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--max-growth-mb", type=float, default=32.0, help="Allowed server RSS growth per export")
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
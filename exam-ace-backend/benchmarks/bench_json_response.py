@@ -0,0 +1,134 @@
+"""
+CPU per request spent encoding quiz payloads: FastAPI's default path
+(response_model re-validation → jsonable_encoder → JSONResponse) plus
+json.dumps/json.loads for the stored questions, vs. FastJSONResponse and the
+QuizQuestionList adapter.  Runs the real route response fields, no DB.
+
+    python -m benchmarks.bench_json_response --questions 30 --iterations 2000
+"""
+from __future__ import annotations
+
+import json
+import time
+import uuid
+import argparse
+from datetime import datetime, timezone
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from app.core.responses import FastJSONResponse
+from app.quiz.models import (
+    Difficulty, GenerateResponse, QuestionResult, QuizQuestion, QuizQuestionList, QuizQuestionPublic,
+    SubmitResponse,
+)
+from app.quiz.router import router
+
+_QUIZ_ID = str(uuid.uuid4())
+
+
+def _questions(n: int) -> list[QuizQuestion]:
+    return [QuizQuestion(
+        question=f"Question {i}: which of the following statements about topic {i} is correct?",
+        options=[f"Option {c} for question {i}, a plausible-looking distractor" for c in "ABCD"],
+        correct_index=i % 4,
+        explanation=f"Option {'ABCD'[i % 4]} is correct because of a reasonably long explanation {i}.",
+    ) for i in range(n)]
+
+
+def _response_field(path: str):
+    route = next(r for r in router.routes if isinstance(r, APIRoute) and r.path == path)
+    return route.secure_cloned_response_field
+
+
+async def _legacy_generate(field, questions):
+    stored = json.dumps([q.model_dump() for q in questions])
+    content = GenerateResponse(
+        quiz_id=_QUIZ_ID, subject="Physics", difficulty=Difficulty.advanced, source="ai",
+        questions=[QuizQuestionPublic(index=i, question=q.question, options=q.options)
+                   for i, q in enumerate(questions)])
+    body = JSONResponse(await serialize_response(field=field, response_content=content)).body
+    return stored, body
+
+
+async def _fast_generate(field, questions):
+    stored = QuizQuestionList.dump_json(questions).decode()
+    content = GenerateResponse(
+        quiz_id=_QUIZ_ID, subject="Physics", difficulty=Difficulty.advanced, source="ai",
+        questions=[QuizQuestionPublic(index=i, question=q.question, options=q.options)
+                   for i, q in enumerate(questions)])
+    return stored, FastJSONResponse(content).body
+
+
+def _results(questions):
+    return [QuestionResult(question=q.question, options=q.options, selected_index=0,
+                           correct_index=q.correct_index, is_correct=q.correct_index == 0,
+                           explanation=q.explanation) for q in questions]
+
+
+async def _legacy_submit(field, stored):
+    questions = [QuizQuestion.model_validate(q) for q in json.loads(stored)]
+    content = SubmitResponse(quiz_id="q", score=25.0, total=len(questions), correct=1, results=_results(questions))
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def _fast_submit(field, stored):
+    questions = QuizQuestionList.validate_json(stored)
+    content = SubmitResponse(quiz_id="q", score=25.0, total=len(questions), correct=1, results=_results(questions))
+    return FastJSONResponse(content).body
+
+
+def _history(n: int) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    return [{"id": str(uuid.uuid4()), "subject": "Physics", "difficulty": "advanced", "score": 72.5,
+             "created_at": now.isoformat()} for _ in range(n)]
+
+
+async def _legacy_history(_field, rows):
+    return JSONResponse(await serialize_response(response_content=rows)).body
+
+
+async def _fast_history(_field, rows):
+    return FastJSONResponse(rows).body
+
+
+def _decoded(result):
+    if isinstance(result, tuple):
+        return tuple(json.loads(part) for part in result)
+    return json.loads(result)
+
+
+async def _time(fn, field, arg, iterations: int) -> float:
+    await fn(field, arg)  # warm-up
+    start = time.process_time()
+    for _ in range(iterations):
+        await fn(field, arg)
+    return (time.process_time() - start) / iterations * 1e6
+
+
+async def main(args) -> None:
+    questions = _questions(args.questions)
+    stored = QuizQuestionList.dump_json(questions).decode()
+    assert json.loads(stored) == json.loads(json.dumps([q.model_dump() for q in questions]))
+
+    cases = [
+        ("generate (store + respond)", _legacy_generate, _fast_generate, _response_field("/quiz/generate"), questions),
+        ("submit (load + respond)", _legacy_submit, _fast_submit, _response_field("/quiz/submit"), stored),
+        ("history (50 rows)", _legacy_history, _fast_history, None, _history(50)),
+    ]
+    print(f"{args.questions}-question quizzes, {args.iterations} iterations, CPU µs per request")
+    print(f"{'':<28}{'default':>10}{'fast':>10}{'saved':>10}")
+    for name, legacy, fast, field, arg in cases:
+        assert _decoded(await legacy(field, arg)) == _decoded(await fast(field, arg)), name
+        before = await _time(legacy, field, arg, args.iterations)
+        after = await _time(fast, field, arg, args.iterations)
+        print(f"{name:<28}{before:>10.1f}{after:>10.1f}{(1 - after / before) * 100:>9.0f}%")
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--iterations", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
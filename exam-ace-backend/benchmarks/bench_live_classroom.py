@@ -0,0 +1,203 @@
+"""
+Live classroom load test: one host and --clients players in one room, over
+real WebSockets against `python -m app.server` with --workers processes (so
+broadcasts have to cross processes through Redis pub/sub).
+
+    docker compose -f docker-compose.local.yml up -d
+    python -m benchmarks.bench_live_classroom --clients 300 --workers 2 --questions 10
+
+Players answer each question after a random think time of up to --think
+seconds; the room moves on as soon as everyone has answered.  Reports how
+long joining took, the fan-out latency of every broadcast (server send → each
+client's receipt, p50/p95/p99 and the spread between the first and the last
+client), answer round trips, and checks that every player got the final
+leaderboard and has exactly one stored attempt.  Connection settings default
+to the docker-compose ports, as in benchmarks.harness.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import subprocess
+
+import asyncpg
+import httpx
+from websockets.asyncio.client import connect
+
+from benchmarks import fake_llm
+from benchmarks.common import mint_token, summarize
+from benchmarks.harness import _DEFAULT_ENV, _start_fake_llm
+
+
+class Player:
+    def __init__(self, user_id: str, token: str, rng: random.Random):
+        self.user_id = user_id
+        self.token = token
+        self.rng = rng
+        self.joined = 0.0
+        self.fanout: dict[str, list[float]] = {}  # message type -> receipt delays
+        self.received: dict[tuple[str, int], float] = {}  # (type, index) -> receipt time
+        self.acks: list[float] = []
+        self.rejected = 0
+        self.ended = False
+
+
+async def _play(player: Player, url: str, think: float, ready: asyncio.Event, joined: list) -> None:
+    start = time.perf_counter()
+    pending: dict[int, float] = {}
+    async with connect(url, subprotocols=["bearer", player.token], max_queue=None, open_timeout=60) as ws:
+        async for raw in ws:
+            now = time.time()
+            message = json.loads(raw)
+            kind = message["type"]
+            if kind == "welcome":
+                player.joined = time.perf_counter() - start
+                joined.append(player)
+                ready.set()
+            elif kind in ("question", "reveal", "progress", "ended"):
+                player.fanout.setdefault(kind, []).append(now - message["ts"])
+                player.received[(kind, message.get("index", -1))] = now
+            if kind == "question":
+                index = message["index"]
+                asyncio.create_task(_answer(ws, player, index, think, pending))
+            elif kind == "answer_ack":
+                sent = pending.pop(message["index"], None)
+                if sent is not None:
+                    player.acks.append(time.perf_counter() - sent)
+                if not message["accepted"]:
+                    player.rejected += 1
+            elif kind == "ended":
+                player.ended = bool(message["leaderboard"])
+                return
+
+
+async def _answer(ws, player: Player, index: int, think: float, pending: dict) -> None:
+    await asyncio.sleep(player.rng.uniform(0, think))
+    pending[index] = time.perf_counter()
+    await ws.send(json.dumps({"type": "answer", "index": index, "answer": player.rng.randrange(4)}))
+
+
+async def _wait_healthy(base: str, proc: subprocess.Popen, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base, timeout=5) as client:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with status {proc.returncode}")
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"server did not become healthy within {timeout}s")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+
+
+async def main(args) -> None:
+    env = dict(os.environ)
+    for name, value in _DEFAULT_ENV.items():
+        env.setdefault(name, value)
+    env.setdefault("LLM_BASE_URL", f"http://127.0.0.1:{args.llm_port}/v1")
+    host_id = str(uuid.uuid4())
+    env["TEACHER_USER_IDS"] = host_id
+    env["LIVE_REVEAL_SECONDS"] = str(args.reveal)
+    env["LIVE_MAX_PLAYERS"] = str(max(args.clients, 1))
+
+    rng = random.Random(args.seed)
+    secret = env["SUPABASE_JWT_SECRET"]
+    players = [Player(uid, mint_token(uid, secret), random.Random(rng.random()))
+               for uid in (str(uuid.uuid4()) for _ in range(args.clients))]
+
+    # Profiles, so every player's attempt can be stored
+    conn = await asyncpg.connect(env["DATABASE_URL"])
+    ids = [uuid.UUID(p.user_id) for p in players] + [uuid.UUID(host_id)]
+    await conn.execute(
+        "INSERT INTO profiles (id, email) SELECT u, u::text || '@bench.local' FROM unnest($1::uuid[]) AS u",
+        ids,
+    )
+
+    llm_server, llm_task = await _start_fake_llm(args)
+    base = f"http://127.0.0.1:{args.port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--port", str(args.port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        await _wait_healthy(base, proc, args.timeout)
+        async with httpx.AsyncClient(base_url=base, timeout=60,
+                                     headers={"Authorization": f"Bearer {mint_token(host_id, secret)}"}) as client:
+            resp = await client.post("/live", json={"subject": "Physics", "difficulty": "intermediate",
+                                                    "count": args.questions, "question_seconds": args.question_seconds})
+            resp.raise_for_status()
+            room = resp.json()
+        url = f"ws://127.0.0.1:{args.port}{room['socket_path']}"
+        print(f"room {room['code']}: {room['total']} questions ({room['source']}), {args.clients} players, "
+              f"{args.workers} workers")
+
+        # Join everyone, then start
+        joined: list[Player] = []
+        join_start = time.perf_counter()
+        ready = asyncio.Event()
+        tasks = [asyncio.create_task(_play(p, url, args.think, ready, joined)) for p in players]
+        while len(joined) < len(players):
+            if any(t.done() and t.exception() for t in tasks):
+                next(t for t in tasks if t.done() and t.exception()).result()
+            await asyncio.sleep(0.05)
+        join_seconds = time.perf_counter() - join_start
+
+        run_start = time.perf_counter()
+        async with connect(url, subprotocols=["bearer", mint_token(host_id, secret)]) as host:
+            await host.send(json.dumps({"type": "start"}))
+            await asyncio.wait_for(asyncio.gather(*tasks), timeout=args.questions * (args.question_seconds + args.reveal) + 60)
+        run_seconds = time.perf_counter() - run_start
+
+        stored = await conn.fetchval(
+            "SELECT count(*) FROM quiz_attempts WHERE user_id = ANY($1::uuid[]) AND score IS NOT NULL", ids)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        llm_server.should_exit = True
+        await llm_task
+        await conn.close()
+
+    print(f"join: {args.clients} sockets in {join_seconds:.2f}s  {summarize([p.joined for p in players])}")
+    for kind in ("question", "progress", "reveal", "ended"):
+        delays = [d for p in players for d in p.fanout.get(kind, [])]
+        if delays:
+            print(f"fan-out {kind:<9} {summarize(delays)}")
+    spreads = []
+    for index in range(args.questions):
+        times = [p.received[("question", index)] for p in players if ("question", index) in p.received]
+        if times:
+            spreads.append(max(times) - min(times))
+    print(f"first → last client per question: {summarize(spreads)}")
+    print(f"answer round trip {summarize([a for p in players for a in p.acks])}, "
+          f"rejected {sum(p.rejected for p in players)}")
+    complete = sum(1 for p in players if p.ended)
+    print(f"quiz ran {run_seconds:.2f}s; final leaderboard received by {complete}/{args.clients}; "
+          f"attempts stored {stored}/{args.clients} (one INSERT)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--question-seconds", type=int, default=20)
+    parser.add_argument("--reveal", type=float, default=0.5, help="LIVE_REVEAL_SECONDS for the run")
+    parser.add_argument("--think", type=float, default=2.0, help="Max seconds a player takes to answer")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--llm-port", type=int, default=1235)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    fake_llm.add_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+"""
+Memory of N workers: `python -m app.server` (preloaded master, forked
+workers sharing pages copy-on-write) vs. `uvicorn app.main:app --workers N`
+(every worker imports the app on its own).
+
+    docker compose -f docker-compose.local.yml up -d
+    python -m benchmarks.bench_prefork_memory --workers 4
+
+Each layout is started, sent --requests requests so the workers are warm, and
+then measured: RSS double-counts shared pages, PSS splits them between the
+processes sharing them (the number that adds up to real usage), USS is what
+each process holds alone.  Connection settings default to the docker-compose
+ports, as in benchmarks.harness.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+from app.server import memory_usage
+from benchmarks.harness import _DEFAULT_ENV
+
+
+def _process_tree(pid: int) -> list[int]:
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(p) for p in f.read().split()]
+    except OSError:
+        children = []
+    for child in children:
+        pids.extend(_process_tree(child))
+    return pids
+
+
+async def _measure(name: str, cmd: list[str], env: dict, port: int, args) -> dict:
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            deadline = time.perf_counter() + args.timeout
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"{name} exited with status {proc.returncode}")
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"{name} did not become healthy within {args.timeout}s")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            await asyncio.sleep(args.settle)  # let the remaining workers finish starting
+            for _ in range(args.requests // 50):
+                await asyncio.gather(*(client.get("/health") for _ in range(50)))
+
+        pids = _process_tree(proc.pid)
+        usages = [memory_usage(pid) for pid in pids]
+        return {
+            "processes": len(pids),
+            **{key: sum(u[key] for u in usages) // 1024 for key in ("rss", "pss", "uss")},
+        }
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def main(args) -> None:
+    env = dict(os.environ)
+    for name, value in _DEFAULT_ENV.items():
+        env.setdefault(name, value)
+
+    layouts = [
+        ("uvicorn --workers", [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+                               "--workers", str(args.workers), "--log-level", "warning"]),
+        ("app.server (prefork)", [sys.executable, "-m", "app.server", "--port", str(args.port),
+                                  "--workers", str(args.workers), "--log-level", "warning"]),
+    ]
+    print(f"{args.workers} workers, MiB summed over master + workers")
+    print(f"{'layout':<24}{'procs':>7}{'RSS':>8}{'PSS':>8}{'USS':>8}")
+    for name, cmd in layouts:
+        result = await _measure(name, cmd, env, args.port, args)
+        print(f"{name:<24}{result['processes']:>7}{result['rss']:>8}{result['pss']:>8}{result['uss']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--requests", type=int, default=1000, help="Warm-up requests before measuring")
+    parser.add_argument("--settle", type=float, default=3.0, help="Seconds to wait after the first healthy reply")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(main(parser.parse_args()))
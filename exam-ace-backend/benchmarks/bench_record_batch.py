@@ -0,0 +1,74 @@
+"""
+Throughput of syncing offline-scored attempts: N x POST /quiz/record vs. one POST /quiz/record/batch.
+
+Needs DATABASE_URL (plus the usual app env vars) pointing at a Postgres with the
+migrations applied.  Rows are written for a throwaway user id.
+
+    python -m benchmarks.bench_record_batch --attempts 1000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+
+from benchmarks.common import asgi_client, mint_token
+
+
+def _attempt(i: int, base: datetime) -> dict:
+    return {
+        "subject": "General Knowledge",
+        "difficulty": "beginner",
+        "score": 70.0,
+        "total": 10,
+        "correct": 7,
+        "client_attempt_id": f"bench-{i}",
+        "completed_at": (base + timedelta(seconds=i)).isoformat(),
+    }
+
+
+async def main(attempts: int) -> None:
+    from app.core.config import settings
+    from app.core.database import init_db, close_db
+    from app.main import app
+
+    await init_db(settings.database_url)
+    user_id = str(uuid.uuid4())
+    base = datetime.now(timezone.utc)
+    payload = [_attempt(i, base) for i in range(attempts)]
+
+    try:
+        async with asgi_client(app, mint_token(user_id, settings.supabase_jwt_secret)) as client:
+            start = time.perf_counter()
+            for item in payload:
+                resp = await client.post("/quiz/record", json=item)
+                resp.raise_for_status()
+            single = time.perf_counter() - start
+
+            batch_user = str(uuid.uuid4())
+            client.headers["Authorization"] = f"Bearer {mint_token(batch_user, settings.supabase_jwt_secret)}"
+            start = time.perf_counter()
+            resp = await client.post("/quiz/record/batch", json={"attempts": payload})
+            resp.raise_for_status()
+            batch = time.perf_counter() - start
+
+            start = time.perf_counter()
+            replay = await client.post("/quiz/record/batch", json={"attempts": payload})
+            replay.raise_for_status()
+            replay_time = time.perf_counter() - start
+    finally:
+        await close_db()
+
+    print(f"{attempts} attempts via /quiz/record:       {single:8.3f}s  ({attempts / single:10.1f} attempts/s)")
+    print(f"{attempts} attempts via /quiz/record/batch: {batch:8.3f}s  ({attempts / batch:10.1f} attempts/s)")
+    print(f"replayed batch (all duplicates):      {replay_time:8.3f}s  "
+          f"duplicates={len(replay.json()['duplicates'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attempts", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.attempts))
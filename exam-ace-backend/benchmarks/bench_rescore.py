@@ -0,0 +1,213 @@
+"""
+Re-scoring after an answer-key fix, at scale: --attempts synthetic attempts
+(default 1M) of five questions each, a share of them (--affected) serving a
+mis-keyed question, re-keyed by the same job POST /admin/questions/{hash}/rescore
+runs.  Reports throughput and checks the result:
+- every graded bench attempt's score matches its (corrected) keys
+- shuffled copies of the question were fixed in their own option order
+- a copy of the same text keyed differently (a different item) was not touched
+
+    docker compose -f docker-compose.local.yml up -d
+    python -m benchmarks.bench_rescore --attempts 1000000
+
+--baseline N times the row-by-row alternative (read, grade in Python, UPDATE
+one attempt at a time) on N affected attempts, rolled back, and extrapolates.
+Needs migrations 006 and 007.  Bench data is deleted afterwards.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+
+import asyncpg
+
+from benchmarks.harness import _DEFAULT_ENV
+
+_POOL = 200
+_USERS = 1000
+_CHUNK = 100_000
+
+
+def _question(i: int, options: list[str] | None = None, key: int | None = None) -> dict:
+    opts = options or [f"Option {c} for bench question {i}" for c in "ABCD"]
+    return {"question": f"Bench rescore question {i}: which option is right?", "options": opts,
+            "correct_index": i % 4 if key is None else key, "explanation": "Bench."}
+
+
+async def _seed(conn, users: list[uuid.UUID], attempts: int, affected: float) -> tuple[dict, dict]:
+    """Returns the mis-keyed item (original order) and the decoy keyed differently."""
+    target = _question(0)  # keyed 0; "really" 1
+    shuffled = _question(0, options=target["options"][::-1], key=3)  # same item, reversed options
+    decoy = _question(0, key=2)  # same text, keyed 2: a different item
+    pool = [target, shuffled, decoy] + [_question(i) for i in range(3, _POOL)]
+    await conn.executemany("INSERT INTO profiles (id, email) VALUES ($1, $2)",
+                           [(u, f"{u}@bench.local") for u in users])
+    await conn.execute("CREATE TEMP TABLE bench_pool (i int PRIMARY KEY, q jsonb, key int)")
+    await conn.executemany("INSERT INTO bench_pool VALUES ($1, $2::jsonb, $3)",
+                           [(i, json.dumps(q), q["correct_index"]) for i, q in enumerate(pool)])
+    every = max(1, round(1 / affected))
+    for lo in range(0, attempts, _CHUNK):
+        hi = min(attempts, lo + _CHUNK)
+        # Slot 0 serves the target (or its shuffled copy, or the decoy) in every `every`-th
+        # attempt; 1 in 50 attempts is still in progress (no answers, no score)
+        await conn.execute(
+            """
+            INSERT INTO quiz_attempts (user_id, subject, difficulty, questions, answers, score, created_at)
+            SELECT ($1::uuid[])[1 + g % $4], 'Bench', 'beginner', x.questions,
+                   CASE WHEN g % 50 <> 0 THEN x.answers END,
+                   CASE WHEN g % 50 <> 0 THEN x.score END,
+                   now() - g * interval '1 second'
+            FROM generate_series($2::int, $3::int - 1) AS g
+            CROSS JOIN LATERAL (
+                SELECT jsonb_agg(p.q ORDER BY s.k) AS questions,
+                       jsonb_agg(s.ans ORDER BY s.k) AS answers,
+                       round((100.0 * count(*) FILTER (WHERE s.ans = p.key) / 5)::numeric, 2)::float8 AS score
+                FROM (
+                    SELECT k, (g * 31 + k * 7) % 4 AS ans,
+                           CASE WHEN k = 0 AND g % $5 = 0 THEN (g / $5) % 3
+                                ELSE 3 + (g * (7 + 2 * k) + k * 13) % ($6 - 3) END AS idx
+                    FROM generate_series(0, 4) AS k
+                ) s
+                JOIN bench_pool p ON p.i = s.idx
+            ) x
+            """,
+            users, lo, hi, len(users), every, _POOL,
+        )
+        print(f"  seeded {hi}/{attempts}", end="\r", flush=True)
+    print()
+    return target, decoy
+
+
+async def _baseline(conn, question: str, item: str, sample: int, correct_index: int) -> float:
+    """Seconds per attempt for the row-by-row approach (rolled back)."""
+    from app.quiz.item_stats import canonical
+    from app.quiz.models import QuizQuestion
+
+    ids = await conn.fetch(
+        "SELECT id, created_at FROM quiz_attempts WHERE questions @> $1::jsonb AND score IS NOT NULL LIMIT $2",
+        json.dumps([{"question": question}]), sample)
+    tr = conn.transaction()
+    await tr.start()
+    start = time.perf_counter()
+    try:
+        for row in ids:
+            attempt = await conn.fetchrow("SELECT questions, answers FROM quiz_attempts WHERE id = $1 AND created_at = $2",
+                                          row["id"], row["created_at"])
+            questions, answers = json.loads(attempt["questions"]), json.loads(attempt["answers"])
+            for q in questions:
+                key, position = canonical(QuizQuestion(**q))
+                if key == item:
+                    q["correct_index"] = position.index(correct_index)
+            score = round(sum(q["correct_index"] == a for q, a in zip(questions, answers)) / len(questions) * 100, 2)
+            await conn.execute("UPDATE quiz_attempts SET questions = $1::jsonb, score = $2 WHERE id = $3 AND created_at = $4",
+                               json.dumps(questions), score, row["id"], row["created_at"])
+    finally:
+        await tr.rollback()
+    return (time.perf_counter() - start) / max(1, len(ids))
+
+
+async def main(args) -> int:
+    from app.admin import rescore
+    from app.core.database import close_db, init_db
+    from app.quiz.item_stats import canonical
+    from app.quiz.models import QuizQuestion
+
+    dsn = os.environ["DATABASE_URL"]
+    conn = await asyncpg.connect(dsn)
+    users = [uuid.uuid4() for _ in range(_USERS)]
+    failed = False
+    try:
+        start = time.perf_counter()
+        target, decoy = await _seed(conn, users, args.attempts, args.affected)
+        print(f"seeded {args.attempts} attempts in {time.perf_counter() - start:.1f}s")
+
+        item, _ = canonical(QuizQuestion(**target))
+        canonical_options = sorted(target["options"], key=lambda o: " ".join(o.lower().split()))
+        old_key = canonical_options.index(target["options"][0])
+        new_key = canonical_options.index(target["options"][1])
+        await conn.execute(
+            """
+            INSERT INTO question_stats (question_hash, question, options, correct_index, subject, difficulty, served)
+            VALUES ($1, $2, $3::jsonb, $4, 'Bench', 'beginner', 1) ON CONFLICT (question_hash) DO NOTHING
+            """,
+            item, target["question"], json.dumps(canonical_options), old_key)
+        # Exact match on slot 0 (jsonb array containment would ignore option order)
+        slot0 = """
+            SELECT count(*) FROM quiz_attempts WHERE user_id = ANY($1::uuid[]) AND questions->0 = $2::jsonb
+        """
+        decoy_before = await conn.fetchval(slot0, users, json.dumps(decoy))
+
+        if args.baseline:
+            per_row = await _baseline(conn, target["question"], item, args.baseline, new_key)
+            print(f"row-by-row: {per_row * 1000:.2f}ms per attempt")
+
+        await init_db(dsn)
+        row = await conn.fetchrow("SELECT question, options, correct_index FROM question_stats WHERE question_hash = $1", item)
+        job = await rescore.submit("bench", item, row, new_key)
+        while job.finished_at is None:
+            await asyncio.sleep(1)
+            print(f"  {job.status}: {job.scanned}/{job.candidates} scanned, {job.matched} matched, "
+                  f"{job.rescored} rescored", end="\r", flush=True)
+        elapsed = job.finished_at - job.created_at
+        print()
+        await close_db()
+        if job.status != "done":
+            print(f"job {job.status}: {job.error}")
+            return 1
+        print(f"rescore job: {job.matched} attempts re-keyed ({job.rescored} scores changed) out of "
+              f"{job.candidates} candidates in {elapsed:.1f}s — {job.matched / elapsed:,.0f} attempts/s, "
+              f"{job.batches} batches")
+        if args.baseline:
+            print(f"row-by-row estimate for the same attempts: {per_row * job.matched:.0f}s "
+                  f"({per_row * job.matched / elapsed:.0f}x slower)")
+
+        # Every graded bench attempt's score agrees with its stored keys
+        wrong = await conn.fetchval(
+            """
+            SELECT count(*) FROM quiz_attempts a
+            WHERE a.user_id = ANY($1::uuid[]) AND a.score IS NOT NULL
+              AND a.score <> (SELECT round((100.0 * count(*) FILTER (WHERE (q->>'correct_index')::int = (a.answers->>(o - 1)::int)::int)
+                                           / jsonb_array_length(a.questions))::numeric, 2)::float8
+                              FROM jsonb_array_elements(a.questions) WITH ORDINALITY e(q, o))
+            """,
+            users)
+        fixed = await conn.fetchval(slot0, users, json.dumps({**target, "correct_index": 1}))
+        fixed_shuffled = await conn.fetchval(
+            slot0, users, json.dumps({**target, "options": target["options"][::-1], "correct_index": 2}))
+        decoy_after = await conn.fetchval(slot0, users, json.dumps(decoy))
+        stats = await conn.fetchval("SELECT correct_index FROM question_stats WHERE question_hash = $1", job.new_question_hash)
+        checks = {
+            "scores consistent": wrong == 0,
+            "all copies re-keyed": fixed + fixed_shuffled == job.matched,
+            "decoy untouched": decoy_after == decoy_before,
+            "question_stats re-keyed": stats == new_key,
+            "no conflicts": job.conflicts == 0,
+        }
+        for name, ok in checks.items():
+            print(f"  {name:<24} {'ok' if ok else 'FAIL'}")
+        failed = not all(checks.values())
+        print(f"  ({wrong} inconsistent scores, {fixed}+{fixed_shuffled} fixed copies, decoy {decoy_before}->{decoy_after})")
+    finally:
+        start = time.perf_counter()
+        await conn.execute("DELETE FROM profiles WHERE id = ANY($1::uuid[])", users)  # cascades to the attempts
+        await conn.execute("DELETE FROM question_stats WHERE subject = 'Bench'")
+        await conn.close()
+        print(f"cleaned up in {time.perf_counter() - start:.1f}s")
+    print("FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attempts", type=int, default=1_000_000)
+    parser.add_argument("--affected", type=float, default=0.1, help="Share of attempts serving the question")
+    parser.add_argument("--baseline", type=int, default=2000, help="Attempts to time row by row (0 = skip)")
+    args = parser.parse_args()
+    for name, value in _DEFAULT_ENV.items():
+        os.environ.setdefault(name, value)
+    sys.exit(asyncio.run(main(args)))
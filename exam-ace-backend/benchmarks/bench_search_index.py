@@ -0,0 +1,138 @@
+"""
+Question search index at corpus scale: build time, /quiz/search and "more
+like this" latency (with and without subject / difficulty filters) against
+the 10ms target, the cost of incremental adds and of a merge, and snapshot
+save / load.  The corpus is synthetic — Zipf-distributed words from a fixed
+vocabulary, question-like lengths — so it needs no database.
+
+    python -m benchmarks.bench_search_index --questions 100000 --queries 2000
+"""
+from __future__ import annotations
+
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+import numpy as np
+
+from app.quiz.models import Difficulty
+from app.quiz.search import SearchIndex
+from benchmarks.common import summarize
+
+_TARGET_MS = 10.0
+_SUBJECTS = ["Physics", "Chemistry", "Biology", "Mathematics", "History", "Geography", "Economics",
+             "Computer Science", "Literature", "Philosophy", "Astronomy", "Psychology"]
+
+
+class Corpus:
+    def __init__(self, vocabulary: int, seed: int):
+        self.rng = random.Random(seed)
+        self.words = [self._word(i) for i in range(vocabulary)]
+        ranks = np.arange(1, vocabulary + 1)
+        weights = 1.0 / ranks ** 1.05
+        self.cum = np.cumsum(weights / weights.sum())
+        self.np_rng = np.random.default_rng(seed)
+
+    def _word(self, i: int) -> str:
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        return "".join(self.rng.choice(letters) for _ in range(self.rng.randint(3, 10))) + str(i % 7)
+
+    def text(self, n: int) -> str:
+        picks = np.searchsorted(self.cum, self.np_rng.random(n))
+        return " ".join(self.words[i] for i in picks)
+
+    def question(self) -> tuple[str, list[str], str, Difficulty]:
+        return (
+            f"Which of these {self.text(self.rng.randint(8, 18))}?",
+            [self.text(self.rng.randint(1, 5)) for _ in range(4)],
+            self.rng.choice(_SUBJECTS),
+            self.rng.choice(list(Difficulty)),
+        )
+
+
+def _time(fn, runs: int) -> list[float]:
+    samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _report(name: str, samples: list[float]) -> bool:
+    stats = summarize(samples)
+    ok = stats["p99_ms"] < _TARGET_MS
+    print(f"{name:<34} p50 {stats['p50_ms']:7.3f}ms  p99 {stats['p99_ms']:7.3f}ms  "
+          f"{'ok' if ok else 'OVER ' + str(_TARGET_MS) + 'ms'}")
+    return ok
+
+
+def main(args) -> None:
+    corpus = Corpus(args.vocabulary, args.seed)
+    docs = [corpus.question() for _ in range(args.questions + args.incremental)]
+    base, extra = docs[:args.questions], docs[args.questions:]
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for doc in base:
+        index.add(*doc)
+    added = time.perf_counter() - start
+    start = time.perf_counter()
+    asyncio.run(index.merge())
+    merged = time.perf_counter() - start
+    postings = len(index._merged[1])
+    print(f"build: {len(index)} questions, {len(index.vocab)} terms, {postings} postings "
+          f"(add {added:.2f}s, merge {merged * 1000:.0f}ms)")
+
+    queries = [corpus.text(corpus.rng.randint(1, 5)) for _ in range(args.queries)]
+    subjects = [corpus.rng.choice(_SUBJECTS) for _ in range(args.queries)]
+    difficulties = [corpus.rng.choice(list(Difficulty)) for _ in range(args.queries)]
+    targets = [corpus.rng.randrange(len(index)) for _ in range(args.queries)]
+
+    def searches(label: str) -> bool:
+        ok = _report(f"search {label}", _time(lambda i: index.search(queries[i], 20), args.queries))
+        ok &= _report(f"search + filters {label}", _time(
+            lambda i: index.search(queries[i], 20, subjects[i], difficulties[i]), args.queries))
+        ok &= _report(f"similar {label}", _time(lambda i: index.similar(targets[i], 10), args.queries))
+        return ok
+
+    ok = searches("(merged)")
+
+    # New questions arrive between merges: queries read the arrays plus the deltas
+    start = time.perf_counter()
+    for doc in extra:
+        index.add(*doc)
+    per_add = (time.perf_counter() - start) / max(len(extra), 1)
+    print(f"incremental: {len(extra)} adds, {per_add * 1e6:.1f}µs each, {index.pending} pending postings")
+    ok &= searches("(+ deltas)")
+    start = time.perf_counter()
+    asyncio.run(index.merge())
+    print(f"merge of {len(extra)} new questions into {len(index)}: {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "search.npz")
+        start = time.perf_counter()
+        index.save(path)
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = SearchIndex.load(path)
+        load_seconds = time.perf_counter() - start
+        same = all(loaded.search(q, 20) == index.search(q, 20) for q in queries[:50])
+        print(f"snapshot: {os.path.getsize(path) / 1e6:.1f}MB, save {saved:.2f}s, load {load_seconds:.2f}s, "
+              f"results identical after load: {same}")
+
+    print(f"\n{'PASS' if ok else 'FAIL'}: every p99 under {_TARGET_MS}ms at {len(index)} questions")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=100_000)
+    parser.add_argument("--incremental", type=int, default=2_000,
+                        help="Questions added after the initial merge (~SEARCH_MERGE_THRESHOLD postings)")
+    parser.add_argument("--vocabulary", type=int, default=30_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
@@ -0,0 +1,45 @@
+"""
+Shared helpers for the benchmark scripts.
+Run every benchmark from exam-ace-backend/, e.g. `python -m benchmarks.bench_record_batch`.
+"""
+from __future__ import annotations
+
+import time
+import statistics
+
+import httpx
+from jose import jwt
+
+
+def mint_token(user_id: str, secret: str, ttl: int = 3600) -> str:
+    """Sign an HS256 token shaped like the ones Supabase issues."""
+    now = int(time.time())
+    claims = {"sub": user_id, "aud": "authenticated", "role": "authenticated", "iat": now, "exp": now + ttl}
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile; `samples` need not be sorted."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: list[float]) -> dict:
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ms = [s * 1000 for s in samples]
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+    }
+
+
+def asgi_client(app, token: str | None = None) -> httpx.AsyncClient:
+    """In-process client — no sockets, so numbers reflect app + DB cost only."""
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers)
@@ -0,0 +1,96 @@
+"""
+Local stand-in for Supabase's JWKS endpoint, for exercising ES256 auth,
+key rotation and JWKS refresh without a Supabase project.
+
+    python -m benchmarks.fake_jwks --port 54321 --max-age 60 --latency 0.1
+    SUPABASE_URL=http://127.0.0.1:54321 uvicorn app.main:app
+
+Endpoints:
+  GET  /auth/v1/.well-known/jwks.json  — current keys (Cache-Control: max-age)
+  GET  /token?sub=<uuid>               — ES256 token signed with the newest key
+  POST /rotate                         — add a new key; keep the previous one
+  POST /revoke-old                     — drop every key except the newest
+"""
+from __future__ import annotations
+
+import asyncio
+import argparse
+import base64
+import time
+import uuid
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from jose import jwt
+
+
+def _b64url(n: int) -> str:
+    return base64.urlsafe_b64encode(n.to_bytes(32, "big")).rstrip(b"=").decode()
+
+
+class SigningKey:
+    """A P-256 key pair with its kid."""
+
+    def __init__(self, kid: str | None = None):
+        self.kid = kid or uuid.uuid4().hex[:12]
+        self._private = ec.generate_private_key(ec.SECP256R1())
+        self._pem = self._private.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+
+    def jwk(self) -> dict:
+        numbers = self._private.public_key().public_numbers()
+        return {"kty": "EC", "crv": "P-256", "alg": "ES256", "use": "sig", "kid": self.kid,
+                "x": _b64url(numbers.x), "y": _b64url(numbers.y)}
+
+    def sign(self, sub: str, ttl: int = 3600) -> str:
+        now = int(time.time())
+        claims = {"sub": sub, "aud": "authenticated", "role": "authenticated", "iat": now, "exp": now + ttl}
+        return jwt.encode(claims, self._pem, algorithm="ES256", headers={"kid": self.kid})
+
+
+def create_app(max_age: int = 600, latency: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Fake Supabase JWKS")
+    keys: list[SigningKey] = [SigningKey()]
+    app.state.jwks_requests = 0
+
+    @app.get("/auth/v1/.well-known/jwks.json")
+    async def jwks():
+        app.state.jwks_requests += 1
+        if latency > 0:  # round trip to a real Supabase project
+            await asyncio.sleep(latency)
+        return JSONResponse({"keys": [k.jwk() for k in keys]},
+                            headers={"Cache-Control": f"public, max-age={max_age}"})
+
+    @app.get("/token")
+    async def token(sub: str | None = None):
+        return {"access_token": keys[-1].sign(sub or str(uuid.uuid4())), "kid": keys[-1].kid}
+
+    @app.post("/rotate")
+    async def rotate():
+        keys.append(SigningKey())
+        return {"kids": [k.kid for k in keys]}
+
+    @app.post("/revoke-old")
+    async def revoke_old():
+        del keys[:-1]
+        return {"kids": [k.kid for k in keys]}
+
+    @app.get("/stats")
+    async def stats():
+        return {"jwks_requests": app.state.jwks_requests, "kids": [k.kid for k in keys]}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--max-age", type=int, default=600)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the key set is returned")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.max_age, args.latency), host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,151 @@
+"""
+Local stand-in for LM Studio / any OpenAI-compatible chat endpoint, with
+controllable latency, token rate and fault injection.
+
+    python -m benchmarks.fake_llm --port 1234 --latency 0.2 --tokens-per-second 80 \
+        --failure-rate 0.02 --malformed-rate 0.05
+    LLM_PROVIDER=local LLM_BASE_URL=http://127.0.0.1:1234/v1 uvicorn app.main:app
+
+Endpoints:
+  GET  /v1/models            — health check target (LocalProvider.check_health)
+  POST /v1/chat/completions  — EXACTLY-N quiz questions as a JSON array
+  GET  /stats                — requests served, failures and malformed replies injected
+
+Reply time = latency + (completion tokens / tokens-per-second), with a token
+counted as ~4 characters.  Failures are HTTP 500s; malformed replies are
+invalid JSON, the wrong question count, or a question missing a field — the
+cases the validator/retry loop exists for.
+"""
+from __future__ import annotations
+
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+_COUNT_RE = re.compile(r"Generate EXACTLY (\d+)")
+_SUBJECT_RE = re.compile(r"Subject: (.+)")
+_MALFORMED_KINDS = ("not_json", "wrong_count", "bad_schema")
+
+
+@dataclass
+class FakeLLMConfig:
+    latency: float = 0.0            # seconds before the first token
+    tokens_per_second: float = 0.0  # 0 = unlimited
+    failure_rate: float = 0.0       # share of requests answered with HTTP 500
+    malformed_rate: float = 0.0     # share of 200s whose content fails validation
+    seed: int | None = None
+
+
+def _questions(subject: str, count: int, rng: random.Random) -> list[dict]:
+    out = []
+    for i in range(count):
+        correct = rng.randrange(4)
+        out.append({
+            "question": f"[{subject}] Synthetic question {i + 1}: which option is marked correct?",
+            "options": [f"Option {chr(65 + j)}{' (correct)' if j == correct else ''}" for j in range(4)],
+            "correct_index": correct,
+            "explanation": f"Option {chr(65 + correct)} is the one generated as correct.",
+        })
+    return out
+
+
+def _malformed(questions: list[dict], kind: str) -> str:
+    if kind == "not_json":
+        return json.dumps(questions)[: len(json.dumps(questions)) // 2]
+    if kind == "wrong_count":
+        return json.dumps(questions[:-1] if len(questions) > 1 else questions * 2)
+    broken = [dict(q) for q in questions]
+    del broken[0]["explanation"]
+    return json.dumps(broken)
+
+
+def create_app(config: FakeLLMConfig | None = None) -> FastAPI:
+    config = config or FakeLLMConfig()
+    rng = random.Random(config.seed)
+    app = FastAPI(title="Fake OpenAI-compatible LLM")
+    app.state.stats = {"requests": 0, "failures": 0, "malformed": 0, "health_checks": 0}
+
+    @app.get("/v1/models")
+    async def models():
+        app.state.stats["health_checks"] += 1
+        return {"object": "list", "data": [{"id": "fake-llm", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        stats = app.state.stats
+        stats["requests"] += 1
+        body = await request.json()
+        prompt = next((m["content"] for m in body.get("messages", []) if m.get("role") == "user"), "")
+        count_match = _COUNT_RE.search(prompt)
+        subject_match = _SUBJECT_RE.search(prompt)
+        count = int(count_match.group(1)) if count_match else 5
+        subject = subject_match.group(1).strip() if subject_match else "General"
+
+        questions = _questions(subject, count, rng)
+        content = json.dumps(questions)
+        if rng.random() < config.malformed_rate:
+            stats["malformed"] += 1
+            content = _malformed(questions, rng.choice(_MALFORMED_KINDS))
+
+        completion_tokens = max(1, len(content) // 4)
+        delay = config.latency
+        if config.tokens_per_second > 0:
+            delay += completion_tokens / config.tokens_per_second
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if rng.random() < config.failure_rate:
+            stats["failures"] += 1
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=500)
+
+        return {
+            "id": f"chatcmpl-{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake-llm"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": completion_tokens,
+                      "total_tokens": len(prompt) // 4 + completion_tokens},
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return app.state.stats
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the reply starts")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Generation speed (0 = instant)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of replies that fail validation")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible runs")
+
+
+def config_from_args(args: argparse.Namespace) -> FakeLLMConfig:
+    return FakeLLMConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        failure_rate=args.failure_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=1234)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host="127.0.0.1", port=args.port, log_level="warning")
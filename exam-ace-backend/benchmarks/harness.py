@@ -0,0 +1,274 @@
+"""
+End-to-end load test.  Boots the app in-process against the local Postgres and
+Redis from docker-compose.local.yml plus the fake LLM (benchmarks.fake_llm),
+then runs virtual users through generate → submit → analytics flows (with a
+history fetch every few flows).
+
+    docker compose -f docker-compose.local.yml up -d
+    python -m benchmarks.harness --users 50 --duration 60 --latency 0.2 --malformed-rate 0.05
+    python -m benchmarks.harness --users 50 --duration 60 --compare benchmarks/results/<earlier>.json
+
+Reports throughput and p50/p95/p99 per endpoint, error counts and the share of
+quizzes that fell back to the question bank.  Every run is written to
+benchmarks/results/<timestamp>.json; with --compare, latency percentiles and
+throughput are diffed against an earlier run and the exit status is 1 if any
+endpoint regressed by more than --threshold percent.
+
+--base-url drives an already-running server over HTTP instead (e.g. uvicorn
+with several workers started with LLM_BASE_URL pointing at this fake LLM).
+Connection settings default to the docker-compose ports; anything already set
+in the environment wins.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import logging
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks import fake_llm
+from benchmarks.common import asgi_client, mint_token, summarize
+
+_RESULTS_DIR = Path(__file__).parent / "results"
+
+_DEFAULT_ENV = {
+    "DATABASE_URL": "postgresql://postgres@localhost:5432/examace",
+    "REDIS_URL": "redis://localhost:6379",
+    "SUPABASE_URL": "http://127.0.0.1:54321",
+    "SUPABASE_JWT_SECRET": "bench-secret",
+    "LLM_PROVIDER": "local",
+    "CORS_ORIGINS": "http://localhost",
+    "QUIZ_RATE_LIMIT": "1000000",  # measure capacity, not the limiter
+    "METRICS_TOKEN": "bench-metrics",
+}
+
+_SUBJECTS = ("Mathematics", "Physics", "Computer Science", "History", "Biology", "Chemistry")
+_DIFFICULTIES = ("beginner", "intermediate", "advanced")
+
+
+class Recorder:
+    """Per-endpoint latencies and status codes."""
+
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {}
+        self.statuses: dict[str, Counter] = {}
+        self.sources: Counter = Counter()
+        self.flows = 0
+
+    async def request(self, client: httpx.AsyncClient, method: str, path: str, **kwargs) -> httpx.Response | None:
+        key = f"{method} {path}"
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, path, **kwargs)
+        except httpx.HTTPError as exc:
+            self.statuses.setdefault(key, Counter())[type(exc).__name__] += 1
+            return None
+        self.latencies.setdefault(key, []).append(time.perf_counter() - start)
+        self.statuses.setdefault(key, Counter())[str(resp.status_code)] += 1
+        return resp
+
+
+async def _virtual_user(client, headers: dict, deadline: float, rec: Recorder, rng: random.Random,
+                        count: int, think: float) -> None:
+    flows = 0
+    while time.perf_counter() < deadline:
+        gen = await rec.request(client, "POST", "/quiz/generate", headers=headers, json={
+            "subject": rng.choice(_SUBJECTS), "difficulty": rng.choice(_DIFFICULTIES), "count": count,
+        })
+        if gen is None or gen.status_code != 200:
+            await asyncio.sleep(max(think, 0.05))
+            continue
+        quiz = gen.json()
+        rec.sources[quiz.get("source", "?")] += 1
+
+        await rec.request(client, "POST", "/quiz/submit", headers=headers, json={
+            "quiz_id": quiz["quiz_id"], "answers": [rng.randrange(4) for _ in quiz["questions"]],
+        })
+        await rec.request(client, "GET", "/analytics/performance", headers=headers)
+        flows += 1
+        if flows % 5 == 0:
+            await rec.request(client, "GET", "/quiz/history", headers=headers)
+        rec.flows += 1
+        if think:
+            await asyncio.sleep(rng.uniform(0, 2 * think))
+
+
+async def _start_fake_llm(args):
+    import uvicorn
+
+    config = uvicorn.Config(fake_llm.create_app(fake_llm.config_from_args(args)),
+                            host="127.0.0.1", port=args.llm_port, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()  # surface bind errors
+        await asyncio.sleep(0.01)
+    return server, task
+
+
+async def _llm_stats(port: int) -> dict:
+    try:
+        async with httpx.AsyncClient(timeout=5) as client:
+            return (await client.get(f"http://127.0.0.1:{port}/stats")).json()
+    except httpx.HTTPError:
+        return {}
+
+
+async def run(args) -> dict:
+    secret = os.environ["SUPABASE_JWT_SECRET"]
+    llm_server, llm_task = await _start_fake_llm(args)
+    rec = Recorder()
+    rng = random.Random(args.seed)
+    users = [str(uuid.uuid4()) for _ in range(args.users)]
+    headers = [{"Authorization": f"Bearer {mint_token(u, secret, ttl=args.duration + 3600)}"} for u in users]
+
+    try:
+        if args.base_url:
+            client = httpx.AsyncClient(base_url=args.base_url, timeout=120,
+                                       limits=httpx.Limits(max_connections=args.users))
+            lifespan = None
+        else:
+            from app.main import app
+            client = asgi_client(app)
+            client.timeout = httpx.Timeout(120)
+            lifespan = app.router.lifespan_context(app)
+            await lifespan.__aenter__()
+
+        try:
+            # Each user needs a profile row before /quiz/generate can store attempts
+            for h in headers:
+                resp = await client.post("/quiz/record", headers=h, json={
+                    "subject": "Warm-up", "difficulty": "beginner", "score": 0.0, "total": 1, "correct": 0})
+                resp.raise_for_status()
+
+            deadline = time.perf_counter() + args.duration
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                _virtual_user(client, h, deadline, rec, random.Random(rng.random()), args.count, args.think)
+                for h in headers
+            ))
+            elapsed = time.perf_counter() - start
+        finally:
+            await client.aclose()
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+        llm = await _llm_stats(args.llm_port)
+    finally:
+        llm_server.should_exit = True
+        await llm_task
+
+    endpoints = {}
+    for key, statuses in sorted(rec.statuses.items()):
+        samples = rec.latencies.get(key, [])
+        total = sum(statuses.values())
+        endpoints[key] = {
+            "requests": total,
+            "rps": round(total / elapsed, 2),
+            "errors": sum(n for code, n in statuses.items() if not code.startswith("2")),
+            "status": dict(statuses),
+            **summarize(samples),
+        }
+    requests = sum(e["requests"] for e in endpoints.values())
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        "duration_s": round(elapsed, 3),
+        "flows": rec.flows,
+        "flows_per_s": round(rec.flows / elapsed, 2),
+        "requests": requests,
+        "requests_per_s": round(requests / elapsed, 2),
+        "quiz_sources": dict(rec.sources),
+        "fake_llm": llm,
+        "endpoints": endpoints,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_report(result: dict) -> None:
+    print(f"\n{result['flows']} flows in {result['duration_s']:.1f}s — {result['flows_per_s']:.1f} flows/s, "
+          f"{result['requests_per_s']:.1f} req/s   sources={result['quiz_sources']}   llm={result['fake_llm']}")
+    print(f"{'endpoint':<28}{'req':>8}{'req/s':>9}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for key, e in result["endpoints"].items():
+        print(f"{key:<28}{e['requests']:>8}{e['rps']:>9.1f}{e['errors']:>6}"
+              f"{e['p50_ms']:>10.2f}{e['p95_ms']:>10.2f}{e['p99_ms']:>10.2f}")
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print deltas against `baseline`; return the regressions beyond `threshold` percent."""
+    regressions = []
+    print(f"\nvs. baseline {baseline.get('started_at')} ({baseline.get('git_commit')}), threshold {threshold:.0f}%")
+    for key, e in result["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(key)
+        if base is None:
+            continue
+        cells = []
+        for metric, higher_is_worse in (("p50_ms", True), ("p95_ms", True), ("p99_ms", True), ("rps", False)):
+            before, after = base.get(metric, 0), e.get(metric, 0)
+            if not before:
+                continue
+            change = (after - before) / before * 100
+            cells.append(f"{metric} {change:+6.1f}%")
+            if (change > threshold) if higher_is_worse else (change < -threshold):
+                regressions.append(f"{key} {metric}: {before} → {after} ({change:+.1f}%)")
+        print(f"  {key:<28}" + "  ".join(cells))
+    for line in regressions:
+        print(f"  REGRESSION {line}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--count", type=int, default=10, help="Questions per quiz")
+    parser.add_argument("--think", type=float, default=0.0, help="Mean think time between flows (seconds)")
+    parser.add_argument("--base-url", default=None, help="Drive a running server instead of the in-process app")
+    parser.add_argument("--llm-port", type=int, default=11434)
+    parser.add_argument("--out", type=Path, default=None, help="Results file (default benchmarks/results/<ts>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="Earlier results file to diff against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    llm = parser.add_argument_group("fake LLM")
+    fake_llm.add_arguments(llm)
+    args = parser.parse_args()
+
+    for name, value in _DEFAULT_ENV.items():
+        os.environ.setdefault(name, value)
+    os.environ.setdefault("LLM_BASE_URL", f"http://127.0.0.1:{args.llm_port}/v1")
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    result = asyncio.run(run(args))
+    _print_report(result)
+
+    out = args.out or _RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+    print(f"\nresults written to {out}")
+
+    if args.compare:
+        if compare(result, json.loads(args.compare.read_text()), args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+#!/bin/sh
+# Runs once when the local primary's data directory is created:
+# Supabase stand-ins first, then every migration in order.
+set -e
+psql -v ON_ERROR_STOP=1 -U "$POSTGRES_USER" -d "$POSTGRES_DB" -f /exam-ace/local/supabase_stubs.sql
+for f in /exam-ace/migrations/*.sql; do
+    echo "Applying $f"
+    psql -v ON_ERROR_STOP=1 -U "$POSTGRES_USER" -d "$POSTGRES_DB" -f "$f"
+done
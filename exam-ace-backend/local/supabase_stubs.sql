@@ -0,0 +1,17 @@
+-- ============================================================
+-- ExamAce — Minimal Supabase stand-ins for a plain local Postgres
+-- Lets migrations/*.sql apply outside Supabase.  NOT for production.
+-- ============================================================
+
+CREATE SCHEMA IF NOT EXISTS auth;
+
+CREATE TABLE IF NOT EXISTS auth.users (
+    id                  UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    email               TEXT,
+    raw_user_meta_data  JSONB DEFAULT '{}'::jsonb
+);
+
+-- RLS policies call auth.uid(); the backend connects as the table owner,
+-- so policies never apply to it and NULL is a safe answer here.
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS UUID
+    LANGUAGE sql STABLE AS $$ SELECT NULL::uuid $$;
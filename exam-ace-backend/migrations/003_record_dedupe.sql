@@ -0,0 +1,15 @@
+-- ============================================================
+-- ExamAce — Dedupe keys for offline-scored quiz attempts
+-- Run this in the Supabase SQL Editor AFTER 002_rls_policies.sql
+-- ============================================================
+
+-- Client-generated id for attempts scored locally by the frontend and synced
+-- through POST /quiz/record/batch.  NULL for server-generated quizzes.
+ALTER TABLE quiz_attempts ADD COLUMN IF NOT EXISTS client_attempt_id TEXT;
+
+-- Replays of the same attempt (e.g. after a reconnect) hit this index and are
+-- skipped.  created_at is part of the key so the index stays valid once
+-- quiz_attempts is partitioned by created_at.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_quiz_attempts_client_dedupe
+    ON quiz_attempts (user_id, client_attempt_id, created_at)
+    WHERE client_attempt_id IS NOT NULL;
@@ -0,0 +1,109 @@
+-- ============================================================
+-- ExamAce — Monthly range partitioning for quiz_attempts
+-- Run this in the Supabase SQL Editor AFTER 003_record_dedupe.sql
+--
+-- Rebuilds quiz_attempts as a table partitioned by created_at (one partition
+-- per calendar month, UTC) and copies existing rows across.  Writes are
+-- blocked while it runs.  The old table is kept as quiz_attempts_legacy;
+-- drop it once the new one is verified:
+--     DROP TABLE quiz_attempts_legacy;
+--
+-- Partitions for upcoming months and compaction of old ones are handled by
+-- the retention job:  python -m app.quiz.retention
+-- ============================================================
+
+BEGIN;
+
+LOCK TABLE quiz_attempts IN EXCLUSIVE MODE;
+
+-- 1. Move the unpartitioned table out of the way
+ALTER TABLE quiz_attempts RENAME TO quiz_attempts_legacy;
+ALTER TABLE quiz_attempts_legacy RENAME CONSTRAINT quiz_attempts_pkey TO quiz_attempts_legacy_pkey;
+ALTER INDEX idx_quiz_attempts_user_created RENAME TO idx_quiz_attempts_legacy_user_created;
+ALTER INDEX idx_quiz_attempts_client_dedupe RENAME TO idx_quiz_attempts_legacy_client_dedupe;
+
+-- 2. Partitioned parent — the primary key must include the partition key
+CREATE TABLE quiz_attempts (
+    id                  UUID NOT NULL DEFAULT gen_random_uuid(),
+    user_id             UUID NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    subject             TEXT NOT NULL,
+    difficulty          TEXT NOT NULL
+                        CHECK (difficulty IN ('beginner', 'intermediate', 'advanced')),
+    questions           JSONB NOT NULL,
+    answers             JSONB,
+    score               FLOAT,
+    client_attempt_id   TEXT,
+    created_at          TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Rows outside every monthly partition land here; the retention job keeps
+-- partitions created ahead of time so this should stay empty.
+CREATE TABLE IF NOT EXISTS quiz_attempts_default PARTITION OF quiz_attempts DEFAULT;
+
+-- 3. Partition helper — creates any missing monthly partitions in [start, end]
+CREATE OR REPLACE FUNCTION create_quiz_attempt_partitions(start_month DATE, end_month DATE)
+RETURNS INT AS $$
+DECLARE
+    m       DATE := date_trunc('month', start_month)::date;
+    created INT := 0;
+    part    TEXT;
+BEGIN
+    WHILE m <= end_month LOOP
+        part := format('quiz_attempts_p%s', to_char(m, 'YYYY_MM'));
+        IF to_regclass(part) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF quiz_attempts FOR VALUES FROM (%L) TO (%L)',
+                part,
+                m::text || ' 00:00:00+00',
+                (m + interval '1 month')::date::text || ' 00:00:00+00'
+            );
+            created := created + 1;
+        END IF;
+        m := (m + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_quiz_attempt_partitions(
+    COALESCE((SELECT min(created_at) FROM quiz_attempts_legacy)::date, current_date),
+    (current_date + interval '3 months')::date
+);
+
+-- 4. Copy existing attempts
+INSERT INTO quiz_attempts (id, user_id, subject, difficulty, questions, answers, score, client_attempt_id, created_at)
+SELECT id, user_id, subject, difficulty, questions, answers, score, client_attempt_id, COALESCE(created_at, now())
+FROM quiz_attempts_legacy;
+
+-- 5. Indexes (created on every partition, present and future)
+
+-- History: latest attempts for a user
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_created
+    ON quiz_attempts (user_id, created_at DESC);
+
+-- Analytics: every /analytics/performance query filters on score IS NOT NULL
+-- and only reads these columns, so it can be answered from the index alone
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_scored
+    ON quiz_attempts (user_id, created_at DESC)
+    INCLUDE (subject, difficulty, score)
+    WHERE score IS NOT NULL;
+
+-- Offline sync dedupe (see 003_record_dedupe.sql)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_quiz_attempts_client_dedupe
+    ON quiz_attempts (user_id, client_attempt_id, created_at)
+    WHERE client_attempt_id IS NOT NULL;
+
+-- 6. Row Level Security (same policies as 002_rls_policies.sql)
+ALTER TABLE quiz_attempts ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY quiz_select_own ON quiz_attempts
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY quiz_insert_own ON quiz_attempts
+    FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY quiz_update_own ON quiz_attempts
+    FOR UPDATE USING (auth.uid() = user_id);
+
+COMMIT;
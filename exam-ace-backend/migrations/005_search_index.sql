@@ -0,0 +1,10 @@
+-- ============================================================
+-- ExamAce — Keyset index for the question search index
+-- Run this in the Supabase SQL Editor AFTER 004_partition_quiz_attempts.sql
+-- ============================================================
+
+-- app.quiz.search pages through attempts created since its last pass,
+-- ordered by (created_at, id); without this every refresh would scan and
+-- sort the current partition.
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_created_id
+    ON quiz_attempts (created_at, id);
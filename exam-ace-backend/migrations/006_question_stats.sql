@@ -0,0 +1,33 @@
+-- ============================================================
+-- ExamAce — Per-question item statistics
+-- Run this in the Supabase SQL Editor AFTER 005_search_index.sql
+-- ============================================================
+
+-- One row per distinct question across every user's attempts, written by
+-- app.quiz.item_stats in periodic batched upserts (never per submit).
+-- Options are stored in a canonical order (sorted by text) so shuffled
+-- copies of a question share a row; correct_index and picks_0..picks_3
+-- follow that order.  The keyed answer is part of question_hash, so a copy
+-- of the question keyed differently gets a row of its own.
+CREATE TABLE IF NOT EXISTS question_stats (
+    question_hash   TEXT PRIMARY KEY,
+    question        TEXT NOT NULL,
+    options         JSONB NOT NULL,
+    correct_index   SMALLINT NOT NULL CHECK (correct_index BETWEEN 0 AND 3),
+    subject         TEXT NOT NULL,
+    difficulty      TEXT NOT NULL,
+    served          BIGINT NOT NULL DEFAULT 0,
+    unanswered      BIGINT NOT NULL DEFAULT 0,
+    picks_0         BIGINT NOT NULL DEFAULT 0,
+    picks_1         BIGINT NOT NULL DEFAULT 0,
+    picks_2         BIGINT NOT NULL DEFAULT 0,
+    picks_3         BIGINT NOT NULL DEFAULT 0,
+    updated_at      TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+-- Outlier reports only look at questions served often enough to judge
+CREATE INDEX IF NOT EXISTS idx_question_stats_served
+    ON question_stats (served DESC);
+
+-- Read and written by the backend only; no policies for end users
+ALTER TABLE question_stats ENABLE ROW LEVEL SECURITY;
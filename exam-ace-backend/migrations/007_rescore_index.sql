@@ -0,0 +1,14 @@
+-- ============================================================
+-- ExamAce — Find the attempts that served a given question
+-- Run this in the Supabase SQL Editor AFTER 006_question_stats.sql
+-- ============================================================
+
+-- POST /admin/questions/{question_hash}/rescore looks attempts up by
+-- containment, `questions @> '[{"question": "..."}]'`.  jsonb_path_ops only
+-- supports @>, which is all it needs, and is a fraction of the size of the
+-- default GIN operator class.  Created on every partition, present and
+-- future.  Writes to quiz_attempts are blocked while it builds; on a large
+-- table, build it partition by partition with CREATE INDEX CONCURRENTLY and
+-- attach the indexes instead.
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_questions
+    ON quiz_attempts USING GIN (questions jsonb_path_ops);
@@ -91,13 +91,74 @@ export function getQuizHistory() {
     return request<QuizHistoryItem[]>('/quiz/history');
 }
 
-export function recordQuizAttempt(subject: string, difficulty: string, score: number, total: number, correct: number) {
-    return request<{ status: string; id: string }>('/quiz/record', {
+export interface RecordBatchItem {
+    subject: string;
+    difficulty: string;
+    score: number;
+    total: number;
+    correct: number;
+    client_attempt_id: string;
+    completed_at: string;
+}
+
+export interface RecordBatchResponse {
+    status: string;
+    recorded: Record<string, string>;
+    duplicates: string[];
+}
+
+export function recordQuizAttemptsBatch(attempts: RecordBatchItem[]) {
+    return request<RecordBatchResponse>('/quiz/record/batch', {
         method: 'POST',
-        body: JSON.stringify({ subject, difficulty, score, total, correct }),
+        body: JSON.stringify({ attempts }),
     });
 }
 
+// Locally scored attempts wait in localStorage until /quiz/record/batch has them,
+// so ones finished offline are synced later; the client id makes resending harmless
+const PENDING_ATTEMPTS_KEY = 'examace.pendingAttempts';
+const MAX_BATCH_ATTEMPTS = 1000; // the server's limit per request
+
+function loadPendingAttempts(): RecordBatchItem[] {
+    try {
+        return JSON.parse(localStorage.getItem(PENDING_ATTEMPTS_KEY) ?? '[]');
+    } catch {
+        return [];
+    }
+}
+
+function savePendingAttempts(attempts: RecordBatchItem[]) {
+    if (attempts.length) localStorage.setItem(PENDING_ATTEMPTS_KEY, JSON.stringify(attempts));
+    else localStorage.removeItem(PENDING_ATTEMPTS_KEY);
+}
+
+export function queueLocalAttempt(subject: string, difficulty: string, score: number, total: number, correct: number) {
+    savePendingAttempts([...loadPendingAttempts(), {
+        subject, difficulty, score, total, correct,
+        client_attempt_id: crypto.randomUUID(),
+        completed_at: new Date().toISOString(),
+    }]);
+    return syncLocalAttempts();
+}
+
+let syncing: Promise<void> | null = null;
+
+/** Send every pending local attempt in batches; the ones not accepted stay for the next call. */
+export function syncLocalAttempts(): Promise<void> {
+    syncing ??= (async () => {
+        for (;;) {
+            const batch = loadPendingAttempts().slice(0, MAX_BATCH_ATTEMPTS);
+            if (!batch.length) return;
+            const res = await recordQuizAttemptsBatch(batch);
+            const done = new Set([...Object.keys(res.recorded), ...res.duplicates]);
+            if (!done.size) return;
+            // Re-read: attempts queued while this batch was in flight are kept
+            savePendingAttempts(loadPendingAttempts().filter(a => !done.has(a.client_attempt_id)));
+        }
+    })().finally(() => { syncing = null; });
+    return syncing;
+}
+
 // --- Settings ---
 export interface UserSettings {
     subject: string;
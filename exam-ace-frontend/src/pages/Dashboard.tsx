@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
-import { getQuizHistory, getSettings, type QuizHistoryItem, type UserSettings } from '../api/client';
+import { getQuizHistory, getSettings, syncLocalAttempts, type QuizHistoryItem, type UserSettings } from '../api/client';
 import { useAuth } from '../hooks/useAuth';
 
 export default function Dashboard() {
@@ -10,10 +10,12 @@ export default function Dashboard() {
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
-        Promise.all([
-            getQuizHistory().catch(() => [] as QuizHistoryItem[]),
-            getSettings().catch(() => null),
-        ])
+        // Attempts scored offline go in first, so the history includes them
+        syncLocalAttempts().catch(() => { /* still pending; retried later */ })
+            .then(() => Promise.all([
+                getQuizHistory().catch(() => [] as QuizHistoryItem[]),
+                getSettings().catch(() => null),
+            ]))
             .then(([h, s]) => { setHistory(h); setSettings(s); })
             .finally(() => setLoading(false));
     }, []);
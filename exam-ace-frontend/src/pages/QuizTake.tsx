@@ -1,6 +1,6 @@
 import { useState, useEffect, useRef, useCallback, useMemo } from 'react';
 import { useParams, useLocation, useNavigate } from 'react-router-dom';
-import { submitQuiz, recordQuizAttempt, type GenerateResponse, type QuizQuestionPublic } from '../api/client';
+import { submitQuiz, queueLocalAttempt, type GenerateResponse, type QuizQuestionPublic } from '../api/client';
 
 interface QuizQuestion extends QuizQuestionPublic {
     correct_index: number;
@@ -94,8 +94,8 @@ export default function QuizTake() {
                 correct: correctCount,
                 results,
             };
-            recordQuizAttempt(quiz.subject, quiz.difficulty, localResult.score, localResult.total, localResult.correct)
-                .catch(() => { /* silently ignore */ });
+            queueLocalAttempt(quiz.subject, quiz.difficulty, localResult.score, localResult.total, localResult.correct)
+                .catch(() => { /* kept and retried on the next sync */ });
 
             navigate(`/results/${quiz.quiz_id}`, { state: { result: localResult }, replace: true });
             return;